@@ -0,0 +1,20 @@
+#ifndef QUERY_SERVER_H
+#define QUERY_SERVER_H
+#include "satellite.h"
+
+#include <iostream>
+#include <map>
+#include <string>
+
+namespace QueryServer
+{
+    //常駐查詢模式(./sattrack --serve)：星群只建立一次，之後從in逐行讀取查詢、每個查詢在out回覆一行
+    //  state <time>                                   -> OK {"time","sats","edges":[[satId1,satId2,距離km],...]}
+    //  cover <lat> <lon> <time>                       -> OK [satId,...]
+    //  hop <lat1> <lon1> <lat2> <lon2> <time>         -> OK {"availableSatsList1","availableSatsList2","pathlist"}(與printStationHopcountPath相同)
+    //  ping -> OK "pong"；quit -> 結束
+    //錯誤時回覆 ERR <訊息>，其餘參數(ISL、PAT、地面站仰角/距離限制等)沿用啟動時的parameter.txt
+    void serve(long unsigned int satCountPerOrbit, long unsigned int totalSatCount, std::map<int, satellite::satellite> &satellites, std::map<std::string, std::string> &parameterTable, std::istream &in, std::ostream &out);
+}
+
+#endif
@@ -27,6 +27,7 @@
 #include "groundStation.h"
 #include "InfoProcessing.h"
 #include "util.h"
+#include "QueryServer.h"
 
 #include <iostream>
 #include <iomanip>
@@ -38,6 +39,7 @@
 #include <algorithm>
 #include <bitset>
 #include <set>
+#include <cstring>
 
 //for using std::string type in switch statement
 constexpr unsigned int str2int(const char* str, int h = 0){
@@ -46,7 +48,7 @@ constexpr unsigned int str2int(const char* str, int h = 0){
 
 
 
-int main()
+int main(int argc, char *argv[])
 {
     // std::cout<<sizeof(satellite::satellite)<<"\n";
     clock_t start, End;
@@ -89,6 +91,11 @@ int main()
     for(auto &sat:satellites){
         sat.second.buildNeighborSats(satellites);
     }
+    //常駐查詢模式：星群只建立一次，之後由stdin逐行讀取查詢並由stdout回覆(見QueryServer.h)
+    if(argc > 1 && std::strcmp(argv[1], "--serve") == 0){
+        QueryServer::serve(satCountPerOrbit, totalSatCount, satellites, parameterTable, std::cin, std::cout);
+        return 0;
+    }
     mainFunction::printParameter(parameterTable);
     std::cout<<"running function "<<parameterTable["execute_function"]<<"...\n";
 
@@ -115,6 +122,9 @@ int main()
         case str2int("printConstellationStateFile"):
             mainFunction::printConstellationStateFile(satCountPerOrbit, totalSatCount, satellites,parameterTable);
             break; 
+        case str2int("printConstellationStateSeries"):
+            mainFunction::printConstellationStateSeries(satCountPerOrbit, totalSatCount, satellites,parameterTable);
+            break; 
         case str2int("printConstellationHopCountFile"):
             mainFunction::printConstellationHopCountFile(satCountPerOrbit, totalSatCount, satellites,parameterTable);
             break;                  
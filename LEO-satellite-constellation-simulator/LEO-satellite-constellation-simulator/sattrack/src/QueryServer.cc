@@ -0,0 +1,135 @@
+#include "QueryServer.h"
+#include "groundStation.h"
+#include "AER.h"
+#include "json.hpp"
+
+#include <deque>
+#include <sstream>
+#include <stdexcept>
+#include <vector>
+using json = nlohmann::json;
+
+namespace QueryServer
+{
+    //同一時刻的計算結果保留在記憶體中，重複查詢同一時刻時不必重新計算(先進先出淘汰)
+    template <typename T>
+    class TimeCache{
+    public:
+        explicit TimeCache(size_t _capacity): capacity(_capacity){}
+        T* find(int time){
+            auto it = entries.find(time);
+            return it == entries.end() ? nullptr : &it->second;
+        }
+        T& insert(int time, T value){
+            if(entries.size() >= capacity && !order.empty()){
+                entries.erase(order.front());
+                order.pop_front();
+            }
+            order.push_back(time);
+            return entries[time] = std::move(value);
+        }
+    private:
+        size_t capacity;
+        std::map<int, T> entries;
+        std::deque<int> order;
+    };
+
+    struct HopState{
+        std::vector<std::vector<int>> hopCount;
+        std::vector<std::vector<int>> medium;
+    };
+
+    void serve(long unsigned int satCountPerOrbit, long unsigned int totalSatCount, std::map<int, satellite::satellite> &satellites, std::map<std::string, std::string> &parameterTable, std::istream &in, std::ostream &out){
+        double acceptableAzimuthDif = std::stod(parameterTable.at("acceptableAzimuthDif"));
+        double acceptableElevationDif = std::stod(parameterTable.at("acceptableElevationDif"));
+        double acceptableRange = std::stod(parameterTable.at("acceptableRange"));
+        AER acceptableAER_diff("acceptableAER_diff", acceptableAzimuthDif, acceptableElevationDif, acceptableRange);
+        int PAT_time = std::stoi(parameterTable.at("PAT_time"));
+        int groundStationAcceptableElevation = std::stoi(parameterTable.at("groundStationAcceptableElevation"));
+        int groundStationAcceptableDistance = std::stoi(parameterTable.at("groundStationAcceptableDistance"));
+        bool round = parameterTable.at("round") == "Y";
+        size_t cacheSize = parameterTable.count("serveCacheSize") ? std::stoul(parameterTable.at("serveCacheSize")) : 64;
+
+        std::vector<int> satIds;
+        for(size_t i = 0; i < totalSatCount; ++i){
+            satIds.push_back(satellite::indexToSatId(i, satCountPerOrbit));
+        }
+        TimeCache<json> stateCache(cacheSize);
+        TimeCache<HopState> hopCache(cacheSize);
+
+        auto coverSats = [&](double latitude, double longitude, const std::string &altitudeKey, int time){
+            groundStation::groundStation station(latitude, longitude, std::stod(parameterTable.at(altitudeKey)));
+            return station.getSecondCoverSatsList(satellites, time, groundStationAcceptableElevation, groundStationAcceptableDistance, round);
+        };
+
+        std::string line;
+        while(std::getline(in, line)){
+            std::istringstream request(line);
+            std::string command;
+            if(!(request >> command)){
+                continue;
+            }
+            try{
+                json response;
+                if(command == "quit"){
+                    break;
+                }
+                else if(command == "ping"){
+                    response = "pong";
+                }
+                else if(command == "state"){
+                    int time;
+                    if(!(request >> time)) throw std::invalid_argument("usage: state <time>");
+                    json *cached = stateCache.find(time);
+                    if(cached == nullptr){
+                        std::vector<std::vector<int>> constellationState = satellite::getConstellationState(satCountPerOrbit, totalSatCount, time, PAT_time, acceptableAER_diff, satellites);
+                        json edges = json::array();
+                        for(size_t i = 0; i < constellationState.size(); ++i){
+                            for(size_t j = i + 1; j < constellationState.size(); ++j){
+                                if(constellationState[i][j] != 0){
+                                    edges.push_back({satIds[i], satIds[j], constellationState[i][j]});
+                                }
+                            }
+                        }
+                        cached = &stateCache.insert(time, json{{"time", time}, {"sats", satIds}, {"edges", edges}});
+                    }
+                    response = *cached;
+                }
+                else if(command == "cover"){
+                    double latitude, longitude;
+                    int time;
+                    if(!(request >> latitude >> longitude >> time)) throw std::invalid_argument("usage: cover <lat> <lon> <time>");
+                    response = coverSats(latitude, longitude, "stationAltitude", time);
+                }
+                else if(command == "hop"){
+                    double latitude1, longitude1, latitude2, longitude2;
+                    int time;
+                    if(!(request >> latitude1 >> longitude1 >> latitude2 >> longitude2 >> time)) throw std::invalid_argument("usage: hop <lat1> <lon1> <lat2> <lon2> <time>");
+                    std::vector<int> availableSatsList1 = coverSats(latitude1, longitude1, "stationAltitude1", time);
+                    std::vector<int> availableSatsList2 = coverSats(latitude2, longitude2, "stationAltitude2", time);
+                    HopState *hop = hopCache.find(time);
+                    if(hop == nullptr){
+                        HopState state;
+                        state.medium.assign(totalSatCount, std::vector<int>(totalSatCount, -1));
+                        state.hopCount = satellite::getConstellationHopCountRecordMedium(satCountPerOrbit, totalSatCount, time, PAT_time, acceptableAER_diff, satellites, state.medium);
+                        hop = &hopCache.insert(time, std::move(state));
+                    }
+                    std::vector<std::vector<int>> pathlist;
+                    for(auto i: availableSatsList1){
+                        for(auto j: availableSatsList2){
+                            pathlist.push_back(satellite::getPath(satCountPerOrbit, (size_t)i, (size_t)j, hop->medium, hop->hopCount));
+                        }
+                    }
+                    response = {{"availableSatsList1", availableSatsList1}, {"availableSatsList2", availableSatsList2}, {"pathlist", pathlist}};
+                }
+                else{
+                    throw std::invalid_argument("unknown command: " + command);
+                }
+                out<<"OK "<<response.dump()<<"\n"<<std::flush;
+            }
+            catch(const std::exception &e){
+                out<<"ERR "<<e.what()<<"\n"<<std::flush;
+            }
+        }
+    }
+}
@@ -199,6 +199,41 @@ namespace mainFunction
         output.close();
     }
 
+    //印出timeList中每個時刻的行星群連線狀態(稀疏的edge list，每條link只印一次)到sattrack/output.txt中，一次執行即可取得多個時間點的拓樸
+    //格式: 第一行"#sats"後接所有衛星編號，之後每個時刻以"#t 時間"開頭，接著每行一條link "satId1 satId2 距離(km)"
+    void printConstellationStateSeries(long unsigned int satCountPerOrbit, long unsigned int totalSatCount, std::map<int, satellite::satellite> &satellites, std::map<std::string, std::string> &parameterTable){
+        std::ofstream output("./" + parameterTable.at("outputFileName"));
+        double acceptableAzimuthDif = std::stod(parameterTable.at("acceptableAzimuthDif"));
+        double acceptableElevationDif = std::stod(parameterTable.at("acceptableElevationDif"));
+        double acceptableRange = std::stod(parameterTable.at("acceptableRange"));
+        AER acceptableAER_diff("acceptableAER_diff", acceptableAzimuthDif, acceptableElevationDif, acceptableRange);
+        int PAT_time = std::stoi(parameterTable.at("PAT_time"));
+        std::vector<std::string> timeList = util::splitString(',', parameterTable.at("timeList"));
+        output<<"#sats";
+        for(size_t i = 0; i < totalSatCount; ++i){
+            output<<" "<<satellite::indexToSatId(i, satCountPerOrbit);
+        }
+        output<<"\n";
+        for(auto &timeStr: timeList){
+            if(timeStr.find_first_not_of(" ") == std::string::npos){
+                continue;
+            }
+            int time = std::stoi(timeStr);
+            std::vector<std::vector<int>> constellationState = satellite::getConstellationState(satCountPerOrbit, totalSatCount, time, PAT_time, acceptableAER_diff, satellites);
+            output<<"#t "<<time<<"\n";
+            for(size_t i = 0; i < constellationState.size(); ++i){
+                for(size_t j = i + 1; j < constellationState.size(); ++j){
+                    if(constellationState[i][j] != 0){
+                        output<<satellite::indexToSatId(i, satCountPerOrbit)<<" "<<satellite::indexToSatId(j, satCountPerOrbit)<<" "<<constellationState[i][j]<<"\n";
+                    }
+                }
+            }
+            //每個時刻算完就寫出，讀取端可以邊跑邊讀
+            output<<std::flush;
+        }
+        output.close();
+    }
+
     //印出某個特定時刻，行星群的hop count狀態(totalSatCount*totalSatCount的對稱二維vetcor，內容意義為衛星最少要經過幾個ISL才會抵達另一個衛星)到sattrack/output.txt中，並且在文件最後印出hopCount的統計數據
     void printConstellationHopCountFile(long unsigned int satCountPerOrbit, long unsigned int totalSatCount, std::map<int, satellite::satellite> &satellites, std::map<std::string, std::string> &parameterTable){
         std::ofstream output("./" + parameterTable.at("outputFileName"));
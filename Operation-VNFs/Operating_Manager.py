@@ -2,14 +2,20 @@ import sys
 import subprocess
 import json
 import os
-import random
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
+from Resource_cache import ResourceCache
+from Synthetic_cluster import SyntheticCluster, DEFAULT_SEED
 
 CONFIG_FILE = "ns_vnf_config.json"
 remote_user="stack"
 remote_ip="192.168.100.148"
 ENABLE_Deployment_MAPPING = False      # True: 啟動sat_id映射(有建出對應衛星節點) / False: 單純部署，不對應sat_id
+current_hosts = [1, 2]                 # 已建出實體 compute node 的衛星 id，其餘衛星使用模擬資料
+HOST_SEPARATOR = "==HOST=="            # resource_snapshot 批次查詢時，分隔各主機輸出的標記
+resource_cache = ResourceCache()       # 跨行程共用的主機資源快取（resource_cache.json）
+synthetic_cluster = SyntheticCluster(int(os.environ.get("SYNTHETIC_SEED", DEFAULT_SEED)))  # 非實體衛星的模擬叢集（可用環境變數 SYNTHETIC_SEED 指定種子）
 
 YELLOW = '\033[93m'
 GREEN = '\033[38;5;82m'
@@ -27,6 +33,28 @@ def load_config():
     except FileNotFoundError:
         return {}
 
+def save_config(config):
+    """先寫入暫存檔再 os.replace，其他程式（例如 MigrationController）不會讀到寫一半的內容"""
+    tmp_path = f"{CONFIG_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, CONFIG_FILE)
+
+def record_migration(ns_name, vnf_name, sat_id):
+    """遷移成功後把 VNF 的新衛星寫回 config（vnfs[].sat_id 與 path 中該 VNF 的位置）"""
+    config = load_config()
+    ns = config.get(ns_name)
+    if ns is None:
+        return
+    for vnf in ns.get("vnfs", []):
+        if vnf.get("vnf_name") != vnf_name:
+            continue
+        vnf["sat_id"] = int(sat_id)
+        path = ns.get("path")
+        if path and 0 < vnf.get("id", 0) < len(path) - 1:
+            path[vnf["id"]] = int(sat_id)
+    save_config(config)
+
 def build_osm_pkg_targz(pkgfolder):
     """
     將指定的 pkgfolder（放在 OSM_pkg/ 下）打包成 .tar.gz 格式，
@@ -169,9 +197,13 @@ def deploy(ns_name):
             check=True
         )
         print(f"{GREEN}[完成]{NC} NS {ns_name} 部署成功。")
+        synthetic_cluster.reserve(ns_name, vnf_list, is_simulated)
     except subprocess.CalledProcessError as e:
         print(f"{RED}部署 NS 失敗：\n{e.stderr}{NC}")
         return
+    finally:
+        # 不論成功與否，NS 所在主機的資源都可能已變動
+        invalidate_resource_cache([vnf.get("sat_id") for vnf in vnf_list if vnf.get("sat_id", -1) != -1])
     
     # [T5] 部署完成 (Finish)
     # ==========================================
@@ -388,10 +420,15 @@ def scale():
     try:
         subprocess.run(cmd, check=True)
         print(f"{GREEN}[完成]{NC} {action} 操作已執行完畢。")
+        synthetic_cluster.scale(ns_name, vnfs[selected_vnf_idx]["vnfd_name"], 1 if op == 0 else -1)
     except subprocess.CalledProcessError as e:
         print(f"{RED}[錯誤]{NC} 無法完成 {action} 操作！\n{e.stderr}")
+    finally:
+        # scale 後新的 VM 落在哪台主機無從得知，直接清空整個資源快取
+        invalidate_resource_cache()
 
 def migrate(ns_name, vnf_name, sat_id):
+    """將 VNF 遷移至衛星 sat_id 對應的 compute node；成功回傳 True 並更新 config，失敗回傳 False"""
     print(f"{GREEN}[遷移中] 將 {vnf_name} 從 NS {ns_name} 遷移至衛星 {sat_id}...{NC}")
     
     # Step 1: 透過 ssh 執行 openstack server list
@@ -404,7 +441,7 @@ def migrate(ns_name, vnf_name, sat_id):
         vm_list = json.loads(list_result.stdout)
     except subprocess.CalledProcessError as e:
         print(f"{RED}[錯誤]{NC} 查詢 VM 清單失敗：{e.stderr}")
-        return
+        return False
 
     vm_name = None
     for vm in vm_list:
@@ -415,7 +452,7 @@ def migrate(ns_name, vnf_name, sat_id):
 
     if not vm_name:
         print(f"{RED}[錯誤]{NC} 找不到對應 VM 名稱。")
-        return
+        return False
 
     print(f"{GREEN}[發現] VM 名稱：{vm_name}{NC}")
 
@@ -427,44 +464,73 @@ def migrate(ns_name, vnf_name, sat_id):
         f'ssh {remote_user}@{remote_ip} '
         f'". ~/devstack/openrc admin demo && openstack server migrate {vm_name} --host {hostname}  --wait"'
     )
+    # 來源主機（遷移前的衛星）
+    source_sat_ids = [
+        vnf.get("sat_id") for vnf in load_config().get(ns_name, {}).get("vnfs", [])
+        if vnf.get("vnf_name") == vnf_name and vnf.get("sat_id", -1) != -1
+    ]
     try:
         subprocess.run(cmd_migrate, shell=True, check=True)
         print(f"{GREEN}[成功]{NC} 遷移完成！")
+        for vnf in load_config().get(ns_name, {}).get("vnfs", []):
+            if vnf.get("vnf_name") == vnf_name:
+                synthetic_cluster.move(ns_name, vnf, sat_id, is_simulated)
+        record_migration(ns_name, vnf_name, sat_id)
+        return True
     except subprocess.CalledProcessError as e:
         print(f"{RED}[錯誤]{NC} 遷移失敗：{e.stderr}")
+        return False
+    finally:
+        # 來源與目標主機的資源都已改變
+        invalidate_resource_cache(source_sat_ids + [sat_id])
 
 
 
-def resource(sat_id):
-    current_hosts = [1, 2]
+def is_simulated(sat_id):
+    """沒有實體 compute node 的衛星，資源由 synthetic_cluster 模擬"""
+    return int(sat_id) not in current_hosts
 
-    def generate_consistent_resource():
-        total_cpu = random.choice([4, 8, 16, 32])
-        total_mem = total_cpu * random.choice([2048, 4096])
-        total_disk = random.randint(100, 500)
-
-        used_now_cpu = random.randint(0, total_cpu)
-        used_now_mem = random.randint(0, total_mem)
-        used_now_disk = random.randint(0, total_disk)
+def simulated_resources(sat_ids):
+    """
+    一次取得多顆模擬衛星的資源紀錄（固定種子產生的容量 + deploy / migrate / scale 的預留），
+    同一顆衛星不論由 placement 或 migration 查詢，結果都相同。
+    """
+    records = synthetic_cluster.resources(sat_ids)
+    return {
+        sat_id: {
+            "hostname": f"openstackcompute{sat_id}",
+            "warning": f"ID {sat_id} is not in the valid host list, using simulated data.",
+            "resource": records[sat_id]
+        }
+        for sat_id in sat_ids
+    }
 
-        used_max_cpu = max(used_now_cpu, random.randint(used_now_cpu, total_cpu))
-        used_max_mem = max(used_now_mem, random.randint(used_now_mem, total_mem))
-        used_max_disk = max(used_now_disk, random.randint(used_now_disk, total_disk))
+def simulated_resource(sat_id):
+    return simulated_resources([sat_id])[sat_id]
 
-        return {
-            "total": {"CPU": total_cpu, "Memory_MB": total_mem, "Disk_GB": total_disk},
-            "used_now": {"CPU": used_now_cpu, "Memory_MB": used_now_mem, "Disk_GB": used_now_disk},
-            "used_max": {"CPU": used_max_cpu, "Memory_MB": used_max_mem, "Disk_GB": used_max_disk},
-        }
+def parse_host_show(data):
+    """
+    將 `openstack host show -f json` 的輸出整理成 total / used_now / used_max 三筆資源紀錄。
+    """
+    def extract_info(label):
+        for entry in data:
+            if entry["Project"] == label:
+                return {
+                    "CPU": int(entry["CPU"]),
+                    "Memory_MB": int(entry["Memory MB"]),
+                    "Disk_GB": int(entry["Disk GB"])
+                }
+        return {"CPU": 0, "Memory_MB": 0, "Disk_GB": 0}
+
+    return {
+        "total": extract_info("(total)"),
+        "used_now": extract_info("(used_now)"),
+        "used_max": extract_info("(used_max)")
+    }
 
-    if int(sat_id) not in current_hosts:
-        fake = generate_consistent_resource()
-        hostname = f"openstackcompute{sat_id}"
-        return {
-            "hostname": hostname,
-            "warning": f"ID {sat_id} is not in the valid host list, using simulated data.",
-            "resource": fake
-        }
+def resource(sat_id):
+    if is_simulated(sat_id):
+        return simulated_resource(sat_id)
 
     hostname = f"openstackcompute{sat_id}"
 
@@ -478,27 +544,9 @@ def resource(sat_id):
         json_output = result.stdout
         data = json.loads(json_output)
 
-        def extract_info(label):
-            for entry in data:
-                if entry["Project"] == label:
-                    return {
-                        "CPU": int(entry["CPU"]),
-                        "Memory_MB": int(entry["Memory MB"]),
-                        "Disk_GB": int(entry["Disk GB"])
-                    }
-            return {"CPU": 0, "Memory_MB": 0, "Disk_GB": 0}
-
-        total = extract_info("(total)")
-        used_now = extract_info("(used_now)")
-        used_max = extract_info("(used_max)")
-
         return {
             "hostname": hostname,
-            "resource": {
-                "total": total,
-                "used_now": used_now,
-                "used_max": used_max
-            }
+            "resource": parse_host_show(data)
         }
 
     except subprocess.CalledProcessError as e:
@@ -512,7 +560,120 @@ def resource(sat_id):
             "error": "JSON parsing failed, possibly due to format error or incorrect execution of the openstack command."
         }
 
+def query_hosts_batch(hostnames, timeout=None):
+    """
+    以單一次 ssh 在 controller 上依序對多台主機執行 `openstack host show`。
+    每台主機的輸出前會印出 `HOST_SEPARATOR <hostname> <controller 時間戳(ns)>`，
+    最後再印一行 END 標記，藉此算出每台主機在 controller 端花費的查詢時間。
+    回傳格式：{ hostname: { "hostname": ..., "resource": {...} 或 "error": ..., "fetch_latency": 秒 } }
+    """
+    host_cmds = "; ".join(
+        f"echo {HOST_SEPARATOR} {hostname} \\$(date +%s%N); openstack host show {hostname} -f json"
+        for hostname in hostnames
+    )
+    remote_cmd = (
+        f"ssh {remote_user}@{remote_ip} "
+        f"\". ~/devstack/openrc admin demo && {host_cmds}; echo {HOST_SEPARATOR} END \\$(date +%s%N)\""
+    )
+
+    start = time.time()
+    try:
+        result = subprocess.run(remote_cmd, shell=True, text=True, capture_output=True, timeout=timeout)
+        stdout, stderr = result.stdout, result.stderr
+    except subprocess.TimeoutExpired:
+        stdout, stderr = "", f"Timed out after {timeout} seconds"
+    elapsed = time.time() - start
+
+    # 解析每台主機的輸出與 controller 端時間戳
+    outputs = {}
+    stamps = []
+    for block in stdout.split(HOST_SEPARATOR)[1:]:
+        header, _, json_output = block.partition("\n")
+        fields = header.split()
+        if not fields:
+            continue
+        outputs[fields[0]] = json_output
+        stamps.append((fields[0], int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else None))
+
+    latency = {}
+    for (hostname, stamp), (_, next_stamp) in zip(stamps, stamps[1:]):
+        if stamp is not None and next_stamp is not None:
+            latency[hostname] = (next_stamp - stamp) / 1e9
+
+    records = {}
+    for hostname in hostnames:
+        record = {"hostname": hostname, "fetch_latency": latency.get(hostname, elapsed)}
+        try:
+            record["resource"] = parse_host_show(json.loads(outputs[hostname]))
+        except KeyError:
+            record["error"] = f"Failed to query host resources: {stderr}"
+        except json.JSONDecodeError:
+            record["error"] = "JSON parsing failed, possibly due to format error or incorrect execution of the openstack command."
+        records[hostname] = record
+    return records
+
+def resource_snapshot(sat_ids, max_workers=1, timeout=None, cache_ttl=None):
+    """
+    一次取得多顆衛星的資源狀態，供 VnfPlacement / VnfMigration 直接 import 呼叫，
+    不必每顆衛星都另外啟動一次 `python3 Operating_Manager.py resource <sat_id>`。
+    - cache_ttl 不為 None 時，先從共用快取 (resource_cache) 取 cache_ttl 秒內的紀錄，
+      只查詢未命中的主機，查詢成功的結果再寫回快取
+    - 不在 current_hosts 內的衛星：直接由 synthetic_cluster 一次產生模擬資料
+    - 實體 compute node：平均分成至多 max_workers 批，每批一次 ssh（見 query_hosts_batch），
+      各批以 thread pool 平行查詢，每次 ssh 最多等待 timeout 秒
+      （max_workers=1 即為單一次 ssh 查完所有主機）
+    （hypervisor list 沒有 Disk 與 used_max 欄位，因此仍以 host show 取得完整紀錄）
+    回傳格式：{ sat_id: { "hostname": ..., "resource": {...}, "fetch_latency": 秒 } }，
+    查詢失敗者改帶 "error" 欄位，取自快取者帶 "cached": True
+    """
+    snapshot = {}
+    pending = {f"openstackcompute{sat_id}": sat_id for sat_id in dict.fromkeys(sat_ids)}
+
+    if cache_ttl is not None:
+        for hostname, record in resource_cache.get_many(pending, cache_ttl).items():
+            snapshot[pending.pop(hostname)] = dict(record, fetch_latency=0.0, cached=True)
+
+    fetched = {}
+    real_hosts = {hostname: sat_id for hostname, sat_id in pending.items() if not is_simulated(sat_id)}
+    simulated = [sat_id for hostname, sat_id in pending.items() if hostname not in real_hosts]
+    if simulated:
+        start = time.time()
+        records = simulated_resources(simulated)
+        latency = (time.time() - start) / len(simulated)
+        for sat_id, record in records.items():
+            fetched[record["hostname"]] = dict(record, fetch_latency=latency)
+
+    if real_hosts:
+        hostnames = list(real_hosts)
+        batch_count = max(1, min(max_workers, len(hostnames)))
+        batches = [hostnames[i::batch_count] for i in range(batch_count)]
+
+        with ThreadPoolExecutor(max_workers=batch_count) as executor:
+            for records in executor.map(lambda batch: query_hosts_batch(batch, timeout), batches):
+                fetched.update(records)
+
+    for hostname, record in fetched.items():
+        snapshot[pending[hostname]] = record
+
+    if cache_ttl is not None:
+        resource_cache.put_many({
+            hostname: {key: value for key, value in record.items() if key != "fetch_latency"}
+            for hostname, record in fetched.items() if "resource" in record
+        })
+
+    return snapshot
 
+def invalidate_resource_cache(sat_ids=None):
+    """
+    deploy / migrate / scale 之後主機資源已改變，讓相關主機的快取紀錄失效。
+    實體主機的實際落點由 OpenStack scheduler 決定，因此一律連同 current_hosts 一起失效；
+    sat_ids 為 None 時清空整個快取。
+    """
+    if sat_ids is None:
+        resource_cache.invalidate()
+        return
+    hosts = {f"openstackcompute{sat_id}" for sat_id in list(sat_ids) + current_hosts}
+    resource_cache.invalidate(hosts)
 
 
 
@@ -537,7 +698,8 @@ def main():
             ns_name = sys.argv[2]
             vnf_name = sys.argv[3]
             sat_id = sys.argv[4]
-            migrate(ns_name, vnf_name, sat_id)
+            if not migrate(ns_name, vnf_name, sat_id):
+                sys.exit(1)
         case "resource":
             if len(sys.argv) < 3:
                 print(f"{RED}請輸入要查詢的衛星id{NC}")
@@ -545,6 +707,17 @@ def main():
             sat_id = sys.argv[2]
             info = resource(sat_id)
             print(json.dumps(info, indent=4))
+        case "resources":
+            if len(sys.argv) < 3:
+                print(f"{RED}請輸入要查詢的衛星id，例如：resources 1 2 305{NC}")
+                return
+            info = resource_snapshot(sys.argv[2:])
+            print(json.dumps(info, indent=4))
+        case "synthetic-reset":
+            # 清除模擬叢集的所有預留（例如重新跑 benchmark 前）
+            synthetic_cluster.release(sys.argv[2] if len(sys.argv) > 2 else None)
+            invalidate_resource_cache()
+            print(f"{GREEN}已清除模擬叢集的預留資源{NC}")
         case _:
             print(f"{RED}不支援的操作，請輸入：deployment / scaling / migration{NC}")
 
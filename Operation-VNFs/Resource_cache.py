@@ -0,0 +1,86 @@
+import json
+import os
+import time
+import fcntl
+from contextlib import contextmanager
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource_cache.json")
+MAX_ENTRIES = 1024      # 快取最多保留幾台主機，超過時淘汰最久沒被讀取的 (LRU)
+
+
+class ResourceCache:
+    """
+    跨行程共用的主機資源快取（以 hostname 為 key，存在磁碟上的 JSON 檔）。
+    VnfPlacement / VnfMigration / Operating_Manager 都透過 resource_snapshot 讀寫同一份檔案，
+    連續的部署與遷移決策可以直接沿用 TTL 內的資源快照，不必再查詢 controller。
+    - TTL：超過 ttl 秒的紀錄視為過期
+    - LRU：超過 max_entries 時淘汰 last_access 最舊的紀錄
+    - invalidate：deploy / migrate / scale 之後由 Operating_Manager 明確讓相關主機失效
+    檔案讀寫以 flock 互斥，寫入時先寫暫存檔再 os.replace，避免其他行程讀到寫一半的內容。
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.max_entries = max_entries
+
+    @contextmanager
+    def locked(self):
+        """取得檔案鎖並讀出整份快取，離開時寫回"""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = self.load()
+                yield entries
+                self.save(entries)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def get_many(self, hostnames, ttl):
+        """回傳 TTL 內仍有效的紀錄 {hostname: record}，並更新其 last_access"""
+        now = time.time()
+        hits = {}
+        with self.locked() as entries:
+            for hostname in hostnames:
+                entry = entries.get(hostname)
+                if entry is None:
+                    continue
+                if now - entry["stored_at"] > ttl:
+                    del entries[hostname]
+                    continue
+                entry["last_access"] = now
+                hits[hostname] = entry["record"]
+        return hits
+
+    def put_many(self, records):
+        """寫入 {hostname: record}，超過 max_entries 時依 LRU 淘汰"""
+        now = time.time()
+        with self.locked() as entries:
+            for hostname, record in records.items():
+                entries[hostname] = {"record": record, "stored_at": now, "last_access": now}
+            overflow = len(entries) - self.max_entries
+            if overflow > 0:
+                for hostname in sorted(entries, key=lambda h: entries[h]["last_access"])[:overflow]:
+                    del entries[hostname]
+
+    def invalidate(self, hostnames=None):
+        """讓指定主機的紀錄失效；hostnames 為 None 時清空整個快取"""
+        with self.locked() as entries:
+            if hostnames is None:
+                entries.clear()
+                return
+            for hostname in hostnames:
+                entries.pop(hostname, None)
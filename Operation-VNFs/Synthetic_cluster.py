@@ -0,0 +1,143 @@
+import json
+import os
+import random
+import fcntl
+from contextlib import contextmanager
+
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "synthetic_cluster.json")
+DEFAULT_SEED = 910605   # 預設種子，相同種子下每顆衛星的模擬資源都相同
+RESOURCE_KEYS = ("CPU", "Memory_MB", "Disk_GB")
+
+
+def base_resource(rng):
+    """
+    以指定的亂數產生器產生一筆自洽的模擬資源資料（used_now <= used_max <= total），
+    分布與原本 generate_consistent_resource 相同。
+    """
+    total_cpu = rng.choice([4, 8, 16, 32])
+    total_mem = total_cpu * rng.choice([2048, 4096])
+    total_disk = rng.randint(100, 500)
+
+    used_now_cpu = rng.randint(0, total_cpu)
+    used_now_mem = rng.randint(0, total_mem)
+    used_now_disk = rng.randint(0, total_disk)
+
+    used_max_cpu = max(used_now_cpu, rng.randint(used_now_cpu, total_cpu))
+    used_max_mem = max(used_now_mem, rng.randint(used_now_mem, total_mem))
+    used_max_disk = max(used_now_disk, rng.randint(used_now_disk, total_disk))
+
+    return {
+        "total": {"CPU": total_cpu, "Memory_MB": total_mem, "Disk_GB": total_disk},
+        "used_now": {"CPU": used_now_cpu, "Memory_MB": used_now_mem, "Disk_GB": used_now_disk},
+        "used_max": {"CPU": used_max_cpu, "Memory_MB": used_max_mem, "Disk_GB": used_max_disk},
+    }
+
+
+def vnf_demand(vnf):
+    """ns_vnf_config.json 中 VNF 的需求（memory 單位為 GB）轉成資源紀錄的單位"""
+    return {"CPU": vnf["cpu"], "Memory_MB": vnf["memory"] * 1024, "Disk_GB": vnf["storage"]}
+
+
+class SyntheticCluster:
+    """
+    尚未建出實體 compute node 的衛星所使用的模擬叢集。
+    - 每顆衛星的基礎資源以 random.Random(f"{seed}:{sat_id}") 產生，與查詢順序、行程無關，
+      placement 與 migration 看到的同一顆衛星永遠相同，benchmark 可以重現
+    - deploy / migrate / scale 造成的預留記錄在 STATE_FILE（以 "ns_name/vnf_name" 為 key，
+      記錄所在衛星、需求與副本數），查詢時加到 used_now / used_max 上
+    - 基礎資源只在需要時計算並保留在記憶體，數千顆衛星也不必預先產生
+    檔案讀寫以 flock 互斥，寫入時先寫暫存檔再 os.replace。
+    """
+
+    def __init__(self, seed=DEFAULT_SEED, path=STATE_FILE):
+        self.seed = seed
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.bases = {}
+
+    def base(self, sat_id):
+        sat_id = int(sat_id)
+        record = self.bases.get(sat_id)
+        if record is None:
+            record = base_resource(random.Random(f"{self.seed}:{sat_id}"))
+            self.bases[sat_id] = record
+        return record
+
+    @contextmanager
+    def locked(self):
+        """取得檔案鎖並讀出預留紀錄，離開時寫回"""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                reservations = self.load()
+                yield reservations
+                self.save(reservations)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, reservations):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(reservations, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def resources(self, sat_ids):
+        """回傳 {sat_id: {"total", "used_now", "used_max"}}，已加上目前的預留量"""
+        reserved = {}
+        for entry in self.load().values():
+            usage = reserved.setdefault(int(entry["sat_id"]), dict.fromkeys(RESOURCE_KEYS, 0))
+            for key in RESOURCE_KEYS:
+                usage[key] += entry["demand"][key] * entry["replicas"]
+
+        result = {}
+        for sat_id in sat_ids:
+            base = self.base(sat_id)
+            extra = reserved.get(int(sat_id), dict.fromkeys(RESOURCE_KEYS, 0))
+            used_now = {key: base["used_now"][key] + extra[key] for key in RESOURCE_KEYS}
+            result[sat_id] = {
+                "total": dict(base["total"]),
+                "used_now": used_now,
+                "used_max": {key: max(base["used_max"][key], used_now[key]) for key in RESOURCE_KEYS},
+            }
+        return result
+
+    def reserve(self, ns_name, vnfs, is_simulated):
+        """deploy 成功後記錄 NS 中部署在模擬衛星上的 VNF（is_simulated(sat_id) 判斷是否為模擬衛星）"""
+        with self.locked() as reservations:
+            for vnf in vnfs:
+                key = f"{ns_name}/{vnf['vnf_name']}"
+                sat_id = vnf.get("sat_id", -1)
+                if sat_id == -1 or not is_simulated(sat_id):
+                    reservations.pop(key, None)
+                    continue
+                reservations[key] = {"sat_id": int(sat_id), "demand": vnf_demand(vnf), "replicas": 1}
+
+    def move(self, ns_name, vnf, sat_id, is_simulated):
+        """migrate 成功後把 VNF 的預留移到新的衛星（目標為實體主機時只移除預留）"""
+        key = f"{ns_name}/{vnf['vnf_name']}"
+        with self.locked() as reservations:
+            replicas = reservations.pop(key, {}).get("replicas", 1)
+            if is_simulated(sat_id):
+                reservations[key] = {"sat_id": int(sat_id), "demand": vnf_demand(vnf), "replicas": replicas}
+
+    def scale(self, ns_name, vnf_name, delta):
+        """scale-out / scale-in 成功後增減 VNF 的副本數（副本與原本的 VNF 在同一顆衛星上）"""
+        key = f"{ns_name}/{vnf_name}"
+        with self.locked() as reservations:
+            entry = reservations.get(key)
+            if entry is None:
+                return
+            entry["replicas"] = max(1, entry["replicas"] + delta)
+
+    def release(self, ns_name=None):
+        """移除某個 NS 的所有預留；ns_name 為 None 時清空"""
+        with self.locked() as reservations:
+            for key in [key for key in reservations if ns_name is None or key.startswith(f"{ns_name}/")]:
+                del reservations[key]
@@ -8,6 +8,7 @@ RED = '\033[91m'
 NC = '\033[0m'  # No Color
 
 Operation_dir = "Operation-VNFs"
+Control_dir = "VNF-control"
 
 def modify_ns_info():
 
@@ -54,10 +55,36 @@ def scaling_ns():
     
 
 def migrate_ns():
-    ns_name = input(f"{GREEN}請輸入要進行Migrate的NS名稱: {NC}")
-    print(f"{GREEN}執行NS遷移操作...{NC}")
-    # 可以根據實際情況進行遷移邏輯的補充
-    pass
+    print(f"{GREEN}\n選擇遷移方式:{NC}")
+    print("1. 立即遷移指定的NS（未指定VNF時遷移預測最先斷線的VNF）")
+    print("2. 啟動自動遷移控制器（持續監看所有已部署的NS，Ctrl+C 停止）")
+    choice = input(f"{GREEN}請選擇操作: {NC}")
+
+    match choice:
+        case "1":
+            ns_name = input(f"{GREEN}請輸入要進行Migrate的NS名稱: {NC}")
+            vnf_name = input(f"{GREEN}請輸入要遷移的VNF名稱（直接 Enter 則自動選擇）: {NC}").strip()
+            print(f"{GREEN}執行NS遷移操作...{NC}")
+            command = ["python3", "MigrationController.py", "migrate", ns_name] + ([vnf_name] if vnf_name else [])
+        case "2":
+            print(f"{GREEN}啟動自動遷移控制器...{NC}")
+            command = ["python3", "MigrationController.py"]
+        case _:
+            print(f"{RED}\n無效的選擇{NC}")
+            return
+
+    # 執行 MigrationController.py
+    try:
+        result = subprocess.run(
+            command,
+            check=True,
+            cwd=Control_dir
+        )
+        print(f"{YELLOW}NS遷移操作執行完畢\n{NC}")
+    except subprocess.CalledProcessError as e:
+        print(f"{RED}NS遷移失敗\n{e.stderr}{NC}")
+    except KeyboardInterrupt:
+        print(f"{YELLOW}\n自動遷移控制器已停止\n{NC}")
 
 def main():
     while True:
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+MigrationController.py
+持續執行的自動遷移控制器
+
+監看 ns_vnf_config.json 中所有已部署（有 path 欄位）的 NS，以預先計算的星群拓樸（拓樸封存檔 / sattrack）
+往後預測每個 VNF 何時會與前後節點斷線，在斷線前 lead_time 秒計算遷移決策（VnfMigration.migration_with_rounds），
+再呼叫 Operating_Manager.py migration 執行遷移。
+- 斷線的定義與 VnfMigration 的穩定節點相同：VNF 所在衛星不在前一個節點（或 NS 起點的 cover sats）
+  到後一個節點（或 NS 終點的 cover sats）的前 k 短路徑上（依 ROUTING_PARAMS["metric"] 排序）；
+  MIGRATION_PARAMS["max_detour_hops"] 不為 None 時改為查 all-pairs 路由表，繞路 hop 數超過上限即視為斷線
+- 所有事件放在以時間為 key 的 priority queue (heapq)，只處理到期的事件；
+  同一批要預測的 NS 共用同一次拓樸掃描（IncrementalTopology），拓樸沒有變動的 frame 直接沿用路徑查詢結果，
+  NS 數量多時成本仍然很低
+- ns_vnf_config.json 變動（部署、遷移完成）時只重新預測內容有改變的 NS，舊的事件以 generation 作廢
+
+用法：
+    python3 MigrationController.py                     持續執行
+    python3 MigrationController.py status              預測所有 NS 的斷線時間後結束
+    python3 MigrationController.py migrate <ns> [vnf]  立即為指定 VNF（未指定時為最先斷線的 VNF）計算並執行遷移
+"""
+
+import heapq
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import closing
+from datetime import datetime
+
+import VnfMigration
+from policy_config import CONTROLLER_PARAMS, MIGRATION_PARAMS, ROUTING_PARAMS, TOPOLOGY_PARAMS
+
+YELLOW = '\033[93m'
+GREEN = '\033[38;5;82m'
+RED = '\033[91m'
+NC = '\033[0m'  # No Color
+
+OPERATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Operation-VNFs')
+CONFIG_PATH = os.path.join(OPERATION_DIR, 'ns_vnf_config.json')
+
+
+def seconds_of_day(timestamp):
+    now = datetime.fromtimestamp(timestamp)
+    return now.hour * 3600 + now.minute * 60 + now.second
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')
+
+
+def deployed_vnfs(user_config):
+    """已部署（path 中有對應位置）的 VNF"""
+    path = user_config.get("path") or []
+    return [
+        vnf for vnf in user_config.get("vnfs", [])
+        if 0 < vnf.get("id", 0) < len(path) - 1 and vnf.get("sat_id", -1) != -1
+    ]
+
+
+def deployment_signature(user_config):
+    """NS 的部署內容（path 與各 VNF 所在衛星），改變時需要重新預測"""
+    return json.dumps([user_config.get("path"), [(vnf["vnf_name"], vnf["sat_id"]) for vnf in deployed_vnfs(user_config)]])
+
+
+def vnf_on_candidate_paths(G, user_config, vnf, cover_sats, k_paths):
+    """
+    VNF 所在衛星是否仍在前一個節點（或 NS 起點的 cover sats）到後一個節點（或 NS 終點的 cover sats）
+    的前 k 短路徑上（與 migration_with_rounds 相同，依 ROUTING_PARAMS["metric"] 排序；
+    MIGRATION_PARAMS["max_detour_hops"] 不為 None 時改為繞路 hop 數是否不超過上限），與判斷穩定節點的方式相同
+    """
+    path = user_config["path"]
+    target_id = vnf["id"]
+    src, dst = VnfMigration.get_migration_endpoints(path, target_id)
+    src_list = cover_sats() if target_id - 1 == 0 else [src]
+    dst_list = cover_sats() if target_id + 1 == len(path) - 1 else [dst]
+    sat_id = str(path[target_id])
+    max_detour = MIGRATION_PARAMS["max_detour_hops"]
+    if max_detour is not None:
+        # 查路由表：繞路不超過上限即可繼續使用
+        return sat_id in G.within_detour(src_list, dst_list, max_detour)
+    # 路徑在拓樸沒有變動時沿用 IncrementalTopology 的快取結果
+    return any(sat_id in candidate for candidate in G.k_shortest_paths_multi(src_list, dst_list, k_paths, ROUTING_PARAMS["metric"]))
+
+
+def predict_breaks(config, ns_names, start, horizon, step, k_paths=MIGRATION_PARAMS["k_paths"], output=False):
+    """
+    從 start（epoch 秒）往後 horizon 秒、每 step 秒取一個 frame，預測 ns_names 中每個 VNF 第一次斷線的時間。
+    所有 NS 共用同一次拓樸掃描；回傳 {(ns_name, vnf_name): 斷線時間或 None（horizon 內不會斷線）}
+    """
+    pending = {(ns_name, vnf["vnf_name"]): vnf for ns_name in ns_names for vnf in deployed_vnfs(config[ns_name])}
+    breaks = {key: None for key in pending}
+    if not pending:
+        return breaks
+
+    frame_times = [start + offset for offset in range(0, horizon + 1, step)]
+    with closing(VnfMigration.generate_adj_series([seconds_of_day(t) for t in frame_times], output)) as series:
+        for t, (seconds_today, G, _) in zip(frame_times, series):
+            cover_cache = {}
+            for key, vnf in list(pending.items()):
+                user_config = config[key[0]]
+                station = (user_config['source_latitude'], user_config['source_longitude'])
+
+                def cover_sats():
+                    if station not in cover_cache:
+                        cover_cache[station] = VnfMigration.get_cover_sats(user_config, seconds_today, output)
+                    return cover_cache[station]
+
+                if not vnf_on_candidate_paths(G, user_config, vnf, cover_sats, k_paths):
+                    breaks[key] = t
+                    del pending[key]
+            if not pending:
+                break
+    return breaks
+
+
+def trigger_migration(ns_name, vnf_name, sat_id):
+    """呼叫 Operating_Manager.py migration 執行遷移，成功時 Operating_Manager 會更新 ns_vnf_config.json"""
+    try:
+        subprocess.run(["python3", "Operating_Manager.py", "migration", ns_name, vnf_name, str(sat_id)], check=True, cwd=OPERATION_DIR)
+        return True
+    except subprocess.CalledProcessError:
+        print(f"{RED}✘ 遷移 {ns_name}/{vnf_name} 至衛星 {sat_id} 失敗{NC}")
+        return False
+
+
+class MigrationController:
+    """
+    以 priority queue 排程的遷移控制器，事件為 (到期時間, 序號, 種類, ns_name, vnf_name, generation, 預測斷線時間)：
+    - "predict"：重新預測該 NS 在 horizon 內的斷線時間
+    - "migrate"：斷線前 lead_time 秒計算遷移決策並執行
+    NS 重新預測時 generation 加一，佇列中舊的事件在取出時直接略過（lazy deletion）。
+    """
+
+    def __init__(self, params=CONTROLLER_PARAMS, config_path=CONFIG_PATH, output=True):
+        self.params = params
+        self.config_path = config_path
+        self.output = output
+        self.step = TOPOLOGY_PARAMS["step"]
+        self.config = {}
+        self.config_mtime = None
+        self.signatures = {}
+        self.generations = {}
+        self.queue = []
+        self.sequence = itertools.count()
+
+    def push(self, due, kind, ns_name, vnf_name=None, break_time=None):
+        heapq.heappush(self.queue, (due, next(self.sequence), kind, ns_name, vnf_name, self.generations[ns_name], break_time))
+
+    def reload(self, now):
+        """ns_vnf_config.json 變動時重新載入，新增或部署內容改變的 NS 排入立即預測"""
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except FileNotFoundError:
+            return
+        if mtime == self.config_mtime:
+            return
+        self.config_mtime = mtime
+        with open(self.config_path, 'r') as f:
+            self.config = json.load(f)
+
+        for ns_name in list(self.signatures):
+            if ns_name not in self.config or not deployed_vnfs(self.config[ns_name]):
+                # NS 已刪除或尚未部署，佇列中的事件全部作廢
+                del self.signatures[ns_name]
+                self.generations[ns_name] += 1
+        for ns_name, user_config in self.config.items():
+            if not deployed_vnfs(user_config):
+                continue
+            signature = deployment_signature(user_config)
+            if self.signatures.get(ns_name) != signature:
+                self.signatures[ns_name] = signature
+                self.generations[ns_name] = self.generations.get(ns_name, 0) + 1
+                self.push(now, "predict", ns_name)
+
+    def predict(self, ns_names, now):
+        """一次掃描拓樸預測多個 NS，依斷線時間排入 migrate 事件；horizon 內不會斷線的 NS 在 horizon 結束前再預測一次"""
+        horizon, lead_time = self.params["horizon"], self.params["lead_time"]
+        breaks = predict_breaks(self.config, ns_names, now, horizon, self.step)
+        by_ns = {ns_name: {} for ns_name in ns_names}
+        for (ns_name, vnf_name), break_time in breaks.items():
+            if break_time is not None:
+                by_ns[ns_name][vnf_name] = break_time
+        for ns_name, ns_breaks in by_ns.items():
+            self.generations[ns_name] += 1
+            for vnf_name, break_time in ns_breaks.items():
+                self.push(max(now, break_time - lead_time), "migrate", ns_name, vnf_name, break_time)
+                if self.output:
+                    print(f"{YELLOW}⚙ 預測 {ns_name}/{vnf_name} 將於 {format_time(break_time)} 斷線，{format_time(max(now, break_time - lead_time))} 開始遷移{NC}")
+            if not ns_breaks:
+                self.push(now + max(horizon - lead_time, self.step), "predict", ns_name)
+                if self.output:
+                    print(f"{GREEN}✓ {ns_name} 在 {horizon} 秒內不會斷線{NC}")
+        return breaks
+
+    def migrate(self, ns_name, vnf_name, now, break_time=None):
+        """計算遷移決策並執行；沒有更好的目標或遷移失敗時 retry_interval 秒後重新預測"""
+        user_config = self.config[ns_name]
+        target_vnf = next(vnf for vnf in deployed_vnfs(user_config) if vnf["vnf_name"] == vnf_name)
+        if self.output:
+            print(f"\n{GREEN}▶ 計算 {ns_name}/{vnf_name} 的遷移目標（目前位於衛星 {target_vnf['sat_id']}）...{NC}")
+        decision = VnfMigration.migration_with_rounds(
+            user_config, user_config["path"], target_vnf,
+            MIGRATION_PARAMS["rounds"], MIGRATION_PARAMS["round_length"], MIGRATION_PARAMS["k_paths"],
+            MIGRATION_PARAMS["output_round"], VnfMigration.workers,
+        )
+
+        retry = now + self.params["retry_interval"]
+        if decision is None or str(decision["sat_id"]) == str(target_vnf["sat_id"]):
+            print(f"{RED}✘ {ns_name}/{vnf_name} 沒有可遷移的目標衛星，{self.params['retry_interval']} 秒後重新預測{NC}")
+        elif self.params["dry_run"]:
+            print(f"{YELLOW}⚙ [dry run] {ns_name}/{vnf_name}：衛星 {target_vnf['sat_id']} → {decision['sat_id']}{NC}")
+            # config 不會改變，斷線之後再重新預測
+            retry = max(retry, (break_time or now) + self.step)
+        elif trigger_migration(ns_name, vnf_name, decision["sat_id"]):
+            # 遷移成功後 config 會改變，由 reload 重新預測
+            return decision
+        self.generations[ns_name] += 1
+        self.push(retry, "predict", ns_name)
+        return decision
+
+    def run_due(self, now):
+        """處理所有已到期的事件：到期的 predict 合併成一次拓樸掃描，migrate 依到期順序處理"""
+        to_predict = []
+        while self.queue and self.queue[0][0] <= now:
+            due, _, kind, ns_name, vnf_name, generation, break_time = heapq.heappop(self.queue)
+            if self.generations.get(ns_name) != generation or ns_name not in self.signatures:
+                continue
+            if kind == "predict":
+                to_predict.append(ns_name)
+            else:
+                self.migrate(ns_name, vnf_name, now, break_time)
+        if to_predict:
+            self.predict(sorted(set(to_predict)), now)
+
+    def run(self):
+        print(f"{GREEN}遷移控制器啟動：lead_time = {self.params['lead_time']} 秒，horizon = {self.params['horizon']} 秒，dry_run = {self.params['dry_run']}{NC}")
+        while True:
+            now = time.time()
+            self.reload(now)
+            self.run_due(now)
+            wait = self.params["poll_interval"]
+            if self.queue:
+                wait = min(wait, self.queue[0][0] - time.time())
+            time.sleep(max(wait, 0))
+
+
+def main():
+    controller = MigrationController()
+    operation = sys.argv[1].lower() if len(sys.argv) > 1 else "run"
+    match operation:
+        case "run":
+            try:
+                controller.run()
+            except KeyboardInterrupt:
+                print(f"{RED}\n遷移控制器已停止{NC}")
+        case "status":
+            now = time.time()
+            controller.reload(now)
+            breaks = predict_breaks(controller.config, sorted(controller.signatures), now, controller.params["horizon"], controller.step)
+            for (ns_name, vnf_name), t in sorted(breaks.items(), key=lambda item: (item[1] is None, item[1] or 0)):
+                when = format_time(t) if t is not None else f"{controller.params['horizon']} 秒內不會斷線"
+                print(f"{ns_name}/{vnf_name}: {when}")
+        case "migrate":
+            if len(sys.argv) < 3:
+                print(f"{RED}請輸入 NS 名稱（可再指定 VNF 名稱），例如：python3 MigrationController.py migrate test 1{NC}")
+                return
+            ns_name = sys.argv[2]
+            now = time.time()
+            controller.reload(now)
+            if ns_name not in controller.signatures:
+                print(f"{RED}找不到已部署的 NS：{ns_name}{NC}")
+                return
+            if len(sys.argv) > 3:
+                vnf_name, break_time = sys.argv[3], None
+            else:
+                breaks = predict_breaks(controller.config, [ns_name], now, controller.params["horizon"], controller.step)
+                broken = sorted((t, name) for (_, name), t in breaks.items() if t is not None)
+                if not broken:
+                    print(f"{GREEN}✓ {ns_name} 在 {controller.params['horizon']} 秒內不會斷線，不需要遷移{NC}")
+                    return
+                break_time, vnf_name = broken[0]
+                print(f"{YELLOW}⚙ {ns_name}/{vnf_name} 預測最先斷線（{format_time(break_time)}）{NC}")
+            if vnf_name not in [vnf["vnf_name"] for vnf in deployed_vnfs(controller.config[ns_name])]:
+                print(f"{RED}找不到已部署的 VNF：{vnf_name}{NC}")
+                return
+            controller.migrate(ns_name, vnf_name, now, break_time)
+        case _:
+            print(f"{RED}不支援的操作，請輸入：run / status / migrate{NC}")
+
+
+if __name__ == "__main__":
+    main()
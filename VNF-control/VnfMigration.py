@@ -1,11 +1,17 @@
 import json
-import subprocess
 import time
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 import numpy as np
-import networkx as nx
-from policy_config import MIGRATION_PARAMS
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Operation-VNFs'))
+import Operating_Manager
+from policy_config import MIGRATION_PARAMS, RESOURCE_PARAMS, TOPOLOGY_PARAMS, ROUTING_PARAMS
+import sattrack_runner
+from topology_store import TopologyStore
+from topology import Topology, IncrementalTopology
+from cover_index import cover_index
 
 YELLOW = '\033[93m'
 GREEN = '\033[38;5;82m'
@@ -19,6 +25,7 @@ rounds = MIGRATION_PARAMS["rounds"]    # 輪數
 round_length = MIGRATION_PARAMS["round_length"]  # 秒
 k_paths = MIGRATION_PARAMS["k_paths"] # 每輪找 k 條路徑
 output_round = MIGRATION_PARAMS["output_round"]  # 是否在每輪輸出結果
+workers = MIGRATION_PARAMS["workers"] or os.cpu_count() or 1  # 平行計算各輪的 process 數
 
 
 '''-------------------------------------------------------------------------------------------------------'''
@@ -44,12 +51,18 @@ def convert_to_list(data):
         return [data]  # Wrap single value in a list
 
 def query_sat_resource(sat_id):
-    """用 subprocess 查詢 Operating_Manager.py 資源狀態
+    """查詢單一衛星的資源狀態，回傳 resource 欄位（total / used_now / used_max），失敗回傳 None"""
+    return query_sat_resources([sat_id]).get(sat_id)
+
+def query_sat_resources(sat_ids):
+    """直接 import Operating_Manager.resource_snapshot，一次查詢多顆衛星的資源狀態
+    實體主機依 RESOURCE_PARAMS 分批平行查詢（max_workers / timeout），查完再列出最慢的主機；
+    cache_ttl 秒內查過的主機直接取自共用快取（deploy / migrate / scale 後會自動失效）。
+    不再為每顆衛星啟動一個 `python3 Operating_Manager.py resource <sat_id>` 子行程，
+    實體主機也只需一次 ssh。
     JSON回傳格式範例：
         {
-            "hostname": "openstackcompute5",
-            "warning": "ID 5 is not in the valid host list, using simulated data.",
-            "resource": {
+            305: {
                 "total": {
                     "CPU": 4,
                     "Memory_MB": 16384,
@@ -67,20 +80,40 @@ def query_sat_resource(sat_id):
                 }
             }
         }
+    查詢失敗的衛星不會出現在回傳的 dict 中
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__))  # Get the directory of the current script
-    full_path = os.path.join(script_dir, '..', 'Operation-VNFs', 'Operating_Manager.py')
+    resources = {}
+    start = time.time()
     try:
-        result = subprocess.check_output(
-            ['python3', full_path, 'resource', str(sat_id)],
-            stderr=subprocess.DEVNULL
+        snapshot = Operating_Manager.resource_snapshot(
+            sat_ids,
+            max_workers=RESOURCE_PARAMS["max_workers"],
+            timeout=RESOURCE_PARAMS["timeout"],
+            cache_ttl=RESOURCE_PARAMS["cache_ttl"]
         )
-        res = json.loads(result)
-        return res['resource']
     except Exception as e:
-        print(f"{RED}  無法查詢衛星 {sat_id} 的資源: {e}{NC}")
-        return None
+        print(f"{RED}  無法查詢衛星 {list(sat_ids)} 的資源: {e}{NC}")
+        return resources
+    elapsed = time.time() - start
+
+    for sat_id, info in snapshot.items():
+        if "resource" not in info:
+            print(f"{RED}  無法查詢衛星 {sat_id} 的資源: {info.get('error')}{NC}")
+            continue
+        resources[sat_id] = info["resource"]
+
+    report_latency(snapshot, elapsed)
+    return resources
 
+def report_latency(snapshot, elapsed):
+    """列出資源查詢最慢的幾台主機，方便找出拖慢決策時間的 compute node"""
+    top = RESOURCE_PARAMS["latency_report_top"]
+    if not top or not snapshot:
+        return
+    slowest = sorted(snapshot.values(), key=lambda info: info.get("fetch_latency", 0), reverse=True)[:top]
+    print(f"{YELLOW}  資源查詢完成：{len(snapshot)} 顆衛星，總耗時 {elapsed:.3f} 秒，最慢的主機：{NC}")
+    for info in slowest:
+        print(f"    - {info['hostname']}: {info.get('fetch_latency', 0):.3f} 秒")
 
 
 def resource_sufficient(sat_resource_cache,sat_id , vnf):
@@ -104,101 +137,105 @@ def get_migration_endpoints(deploy_path, target_id):
     return src, dst
 
 def generate_adj_matrix(user_config, seconds_today,output=True):
-    """產生鄰接矩陣檔案 adj_matrix.txt 並回傳對應的 graph 物件與 sat_ids"""
-
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    directory = os.path.join(script_dir, '..', 'LEO-satellite-constellation-simulator', 'LEO-satellite-constellation-simulator', 'sattrack')
-    input_file_path = os.path.join(directory, 'parameter_example.txt')
-    output_file_path = os.path.join(directory, 'parameter.txt')
-
-    # 複製模板內容
-    with open(input_file_path, 'r') as input_file:
-        content = input_file.read()
-    with open(output_file_path, 'w') as output_file:
-        output_file.write(content)
+    """取得該時刻的星群拓樸，回傳 Topology（CSR，衛星編號為字串）與 sat_ids；只保存 link，不建立 N × N 的鄰接矩陣"""
 
-    # 加入經緯度與時間參數
-    with open(output_file_path, 'a') as file:
-        file.write(f">>(outputFileName): (adj_matrix.txt)\n")
-        file.write(f">>(execute_function): (printConstellationStateFile)\n")
-        file.write(f">>(time):({seconds_today})second")    
-
-    if output:
-        print(f"{GREEN}已完成寫入 parameter.txt 參數檔案{NC}")
-
-    # 執行 sattrack
     try:
         if output:
-            print(f"{GREEN}執行 ./sattrack 模擬獲取adj matrix中...{NC}")
-        with open(os.path.join(directory, 'adj_matrixOutput.txt'), 'w') as output_file:
-            subprocess.run(['./sattrack'], cwd=directory, stdout=output_file, stderr=subprocess.STDOUT, check=True)
+            print(f"{GREEN}計算 t = {seconds_today} 的星群拓樸中...{NC}")
+        for _, sat_ids, u, v, distance in sattrack_runner.constellation_index_series([seconds_today]):
+            G = Topology.from_edges([str(sat_id) for sat_id in sat_ids], u, v, distance)
+            break
+        else:
+            print(f"{RED}模擬器沒有輸出 t = {seconds_today} 的拓樸{NC}")
+            return None, None
+    except FileNotFoundError:
+        print(f"{RED}找不到產出的星群拓樸檔案{NC}")
+        return None, None
     except Exception as e:
         print(f"{RED}執行 sattrack 失敗: {e}{NC}")
         return None, None
 
-    adj_output_path = os.path.join(directory, 'adj_matrix.txt')
-    if not os.path.exists(adj_output_path):
-        print(f"{RED}找不到產出的 adj_matrix.txt{NC}")
-        return None, None
-
-    # 讀取並轉換成 graph
-    with open(adj_output_path, 'r') as f:
-        lines = f.readlines()
+    if output:
+        print(f"{GREEN}成功生成圖，節點數: {len(G.sat_ids)}，邊數: {G.number_of_edges()}{NC}")
+    return G, G.sat_ids
 
-    sat_ids = lines[0].strip().split()
-    matrix = [list(map(int, line.strip().split()[1:])) for line in lines[1:]]
+def generate_adj_series(times, output=True, directory=None):
+    """
+    一次取得所有時間點的星群拓樸（propagator，或執行一次 sattrack 的 printConstellationStateSeries），
+    依序 yield (seconds_today, G, sat_ids)，G 為 IncrementalTopology（衛星編號為字串），
+    每個時間點只套用與上一輪之間新增 / 移除的 link，未受影響的路徑查詢結果沿用上一輪；
+    TOPOLOGY_PARAMS["use_archive"] 為 True 時改從拓樸封存檔讀取（取不超過該時間的最近取樣點），不執行 sattrack
+    """
+    if TOPOLOGY_PARAMS["use_archive"]:
+        store = TopologyStore(output=output)
+        sat_ids = [str(sat_id) for sat_id in store.sat_ids]
+        G = IncrementalTopology(sat_ids)
+        G.routing_dir = store.routing_dir
+        for seconds_today in times:
+            added, removed = G.update(*store.edges(seconds_today))
+            if output:
+                print(f"{GREEN}自封存檔讀取拓樸（t = {seconds_today}，取樣點 {store.frame_time(seconds_today)}），節點數: {len(sat_ids)}，邊數: {G.number_of_edges()}（新增 {added}、移除 {removed}）{NC}")
+            yield seconds_today, G, sat_ids
+        return
 
-    G = nx.Graph()
-    for i in range(len(sat_ids)):
-        for j in range(len(sat_ids)):
-            if matrix[i][j] != 0:
-                G.add_edge(sat_ids[i], sat_ids[j], weight=1)
     if output:
-        print(f"{GREEN}成功生成圖，節點數: {G.number_of_nodes()}，邊數: {G.number_of_edges()}{NC}")
-        print(output)
-    return G, sat_ids
-
-def get_cover_sats(user_config, seconds_today, output=True):
-    """產生 CoverSatsOutput.txt 並回傳對應的 sat_ids 列表"""
-
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    directory = os.path.join(script_dir, '..', 'LEO-satellite-constellation-simulator', 'LEO-satellite-constellation-simulator', 'sattrack')
-    input_file_path = os.path.join(directory, 'parameter_example.txt')
-    output_file_path = os.path.join(directory, 'parameter.txt')
-
-    # 複製模板內容
-    with open(input_file_path, 'r') as input_file:
-        content = input_file.read()
-    with open(output_file_path, 'w') as output_file:
-        output_file.write(content)
-
-    # 加入經緯度與時間參數
-    with open(output_file_path, 'a') as file:
-        file.write(f">>(stationLatitude): ({user_config['source_latitude']})\n")
-        file.write(f">>(stationLongitude): ({user_config['source_longitude']})\n")
-        file.write(f">>(outputFileName): (CoverSats.txt)\n")
-        file.write(f">>(execute_function): (printStationCoverSats)\n")
-        file.write(f">>(time):({seconds_today})second")    
+        print(f"{GREEN}一次計算 {len(times)} 個時間點的星群拓樸中...{NC}")
+    try:
+        G = None
+        series = sattrack_runner.constellation_index_series(times, directory=directory)
+        for seconds_today, sat_ids, u, v, distance in series:
+            if G is None:
+                G = IncrementalTopology([str(sat_id) for sat_id in sat_ids])
+            added, removed = G.update(u, v, distance)
+            if output:
+                print(f"{GREEN}成功生成圖（t = {seconds_today}），節點數: {len(G.sat_ids)}，邊數: {G.number_of_edges()}（新增 {added}、移除 {removed}）{NC}")
+            yield seconds_today, G, G.sat_ids
+    except Exception as e:
+        print(f"{RED}執行 sattrack 失敗: {e}{NC}")
 
-    if output:
-        print(f"{GREEN}已完成寫入 parameter.txt 參數檔案{NC}")
+def get_cover_sats(user_config, seconds_today, output=True, directory=None):
+    """
+    回傳時間 seconds_today 能服務 NS 起點地面站的 sat_ids 列表。
+    TOPOLOGY_PARAMS["use_cover_index"] 為 True 時查詢該地面站的可見衛星區間索引（每個地面站只建立一次），
+    否則執行 printStationCoverSats 產生 CoverSats.txt（directory 為模擬器工作目錄，None 則使用專用的暫存工作目錄）
+    """
 
-    # 執行 sattrack
+    if TOPOLOGY_PARAMS["use_cover_index"]:
+        try:
+            index = cover_index(user_config['source_latitude'], user_config['source_longitude'], output)
+            return [str(sat_id) for sat_id in index.at(seconds_today)]
+        except Exception as e:
+            print(f"{RED}建立可見衛星索引失敗: {e}{NC}")
+            return []
+
+    params = {
+        "stationLatitude": user_config['source_latitude'],
+        "stationLongitude": user_config['source_longitude'],
+        "outputFileName": "CoverSats.txt",
+        "execute_function": "printStationCoverSats",
+        "time": seconds_today,
+    }
+
+    # 執行 sattrack（可以在行程內計算時不執行模擬器，常駐模擬器可用時直接查詢）
     try:
+        constellation = sattrack_runner.shared_constellation()
+        if constellation is not None:
+            return [str(sat_id) for sat_id in constellation.cover_sats(user_config['source_latitude'], user_config['source_longitude'], [seconds_today])[0]]
+        client = sattrack_runner.shared_client() if directory is None else None
+        if client is not None:
+            return [str(sat_id) for sat_id in client.cover_sats(user_config['source_latitude'], user_config['source_longitude'], seconds_today)]
         if output:
             print(f"{GREEN}執行 ./sattrack 模擬獲取覆蓋衛星中...{NC}")
-        with open(os.path.join(directory, 'CoverSatsOutput.txt'), 'w') as output_file:
-            subprocess.run(['./sattrack'], cwd=directory, stdout=output_file, stderr=subprocess.STDOUT, check=True)
+        return sattrack_runner.query_sattrack(params, 'CoverSatsOutput.txt', parse_cover_sats, directory)
+    except FileNotFoundError:
+        print(f"{RED}找不到產出的 CoverSats.txt{NC}")
+        return []
     except Exception as e:
         print(f"{RED}執行 sattrack 失敗: {e}{NC}")
-        return None, None
+        return []
 
-    output_path = os.path.join(directory, 'CoverSats.txt')
-    if not os.path.exists(output_path):
-        print(f"{RED}找不到產出的 CoverSats.txt{NC}")
-        return None, None
-    
-    with open(output_path, 'r') as f:
+def parse_cover_sats(path):
+    with open(path, 'r') as f:
         lines = f.readlines()
     sats = set()
     for line in lines:
@@ -209,86 +246,228 @@ def get_cover_sats(user_config, seconds_today, output=True):
                     sats.add(sid.strip())
     return list(sats)
 
-def migration_with_rounds(user_config, deploy_path, target_vnf, round_num, round_len_sec, k_paths=3, output=True):
+class StableNodes:
+    """
+    逐輪折疊候選路徑：只保留目前「所有輪皆出現」的節點與每個節點的預估延遲
+    （各輪中經過該節點的最短路徑延遲，取最差的一輪），不保留各輪的路徑。
+    stop_reason() 依 MIGRATION_PARAMS 判斷是否可以提早結束：
+    - stop_when_empty：共同節點已為空，之後的輪次不可能再增加節點
+    - stable_rounds：共同節點連續 N 輪沒有改變（0 則不使用）
+    """
+
+    def __init__(self, stop_when_empty=True, stable_rounds=0):
+        self.stop_when_empty = stop_when_empty
+        self.stable_rounds = stable_rounds
+        self.nodes = None
+        self.latency = {}
+        self.rounds = 0
+        self.unchanged = 0
+
+    def fold(self, round_paths, round_latencies):
+        best_in_round = {}
+        for path, latency in zip(round_paths, round_latencies):
+            for sid in path:
+                if self.nodes is None or sid in self.nodes:
+                    best_in_round[sid] = min(best_in_round.get(sid, latency), latency)
+        nodes = set(best_in_round)
+        self.unchanged = self.unchanged + 1 if nodes == self.nodes else 0
+        self.nodes = nodes
+        self.latency = {sid: max(self.latency.get(sid, best_in_round[sid]), best_in_round[sid]) for sid in nodes}
+        self.rounds += 1
+
+    def stop_reason(self):
+        if self.stop_when_empty and self.nodes is not None and not self.nodes:
+            return "共同節點已為空"
+        if self.stable_rounds and self.unchanged >= self.stable_rounds:
+            return f"共同節點已連續 {self.unchanged} 輪沒有改變"
+        return None
+
+def evaluate_rounds(user_config, deploy_path, target_vnf, round_times, k_paths, output=True, directory=None, stats=None):
+    """
+    依序計算 round_times 中每一輪的候選路徑（directory 為模擬器工作目錄），路徑依 ROUTING_PARAMS["metric"] 排序；
+    MIGRATION_PARAMS["max_detour_hops"] 不為 None 時改查路由表，每個繞路不超過上限的衛星各有一條經過它的最短路徑。
+    逐輪 yield (seconds_today, 該輪的路徑清單, 各路徑的端到端延遲 ms)，呼叫端可隨時停止（close）；
+    結束或被關閉時把拓樸變動統計累加到 stats
+    """
+    target_id = target_vnf["id"]
+    metric = ROUTING_PARAMS["metric"]
+
+    # === 所有輪的衛星圖由同一次 sattrack 執行依序產生 ===
+    G = None
+    try:
+        for r, (seconds_today, G, _) in enumerate(generate_adj_series(round_times, output, directory)):
+            if output:
+                print(f"\n{YELLOW}>>> Round {r+1}, Time = {seconds_today} sec{NC}")
+
+            # === 找出前後相鄰衛星 ===
+            src, dst = get_migration_endpoints(deploy_path, target_id)
+
+            if output:
+                print(f"{YELLOW}⚙ VNF {target_vnf['vnf_name']} 的遷移起點: {src}，終點: {dst}{NC}")
+            # === 初始化起點與終點清單 ===
+            src_list = [src]
+            dst_list = [dst]
+
+            # === 若起點是 NS 的起點，取當下能服務起點的 cover sats ===
+            if target_id-1 == 0:
+                src_list = get_cover_sats(user_config, seconds_today, output, directory)
+                if output:
+                    print(f"{YELLOW}⚙ 起點為 NS 起點，擴展為 cover sats：{src_list}{NC}")
+
+            # === 若終點是 NS 的終點，取當下能服務終點的 cover sats ===
+            if target_id+1 == len(deploy_path) - 1:
+                dst_list = get_cover_sats(user_config, seconds_today, output, directory)
+                if output:
+                    print(f"{YELLOW}⚙ 終點為 NS 終點，擴展為 cover sats：{dst_list}{NC}")
+
+            # === 搜尋所有起點與終點組合的最短路徑 ===
+            round_paths = []
+            max_detour = MIGRATION_PARAMS["max_detour_hops"]
+            if max_detour is not None:
+                # 查路由表：繞路不超過上限的衛星都是候選節點，各以經過它的最短路徑作為該輪的路徑
+                round_paths = [G.detour_route(src_list, dst_list, sid) for sid in G.within_detour(src_list, dst_list, max_detour)]
+                if output:
+                    print(f"{GREEN}✓ 繞路不超過 {max_detour} 跳的候選節點 {len(round_paths)} 顆{NC}")
+                    if not round_paths:
+                        print(f"{RED}✘ 無法從 {src_list} 到 {dst_list} 找到通訊路徑{NC}")
+            elif MIGRATION_PARAMS["multi_endpoint_search"]:
+                # 以虛擬 super-source / super-sink 一次取得所有組合中的前 k 短路徑
+                round_paths = G.k_shortest_paths_multi(src_list, dst_list, k_paths, metric)
+                if output:
+                    for path in round_paths:
+                        print(f"{GREEN}✓ 路徑 {path[0]} -> {path[-1]}：{path}（{G.path_latency(path):.2f} ms）{NC}")
+                    if not round_paths:
+                        print(f"{RED}✘ 無法從 {src_list} 到 {dst_list} 找到通訊路徑{NC}")
+            else:
+                for s in src_list:
+                    for d in dst_list:
+                        if G.has_path(s, d):
+                            # Yen's k-shortest simple paths 直接在 CSR 上計算
+                            for path in G.k_shortest_paths(s, d, k_paths, metric):
+                                if output:
+                                    print(f"{GREEN}✓ 路徑 {s} -> {d}：{path}（{G.path_latency(path):.2f} ms）{NC}")
+                                round_paths.append(path)
+                        else:
+                            if output:
+                                print(f"{RED}✘ 無法從 {s} 到 {d} 找到通訊路徑{NC}")
+
+            yield seconds_today, round_paths, [G.path_latency(path) for path in round_paths]
+    finally:
+        if G is not None and stats is not None:
+            for key in stats:
+                stats[key] += G.stats[key]
+
+def new_stats():
+    return {"added": 0, "removed": 0, "reused": 0, "recomputed": 0}
+
+def evaluate_round_chunk(task):
+    """
+    process pool 的工作：在獨立的模擬器工作目錄中計算一段連續的輪次，回傳 ([(路徑清單, 延遲)], 拓樸變動統計)。
+    段內的共同節點已為空時提早結束（整體的共同節點必定也為空）
+    """
+    user_config, deploy_path, target_vnf, round_times, k_paths = task
+    stats = new_stats()
+    tracker = StableNodes(MIGRATION_PARAMS["stop_when_empty"])
+    rounds = []
+    with sattrack_runner.workspace() as directory:
+        with closing(evaluate_rounds(user_config, deploy_path, target_vnf, round_times, k_paths, False, directory, stats)) as series:
+            for _, round_paths, round_latencies in series:
+                rounds.append((round_paths, round_latencies))
+                tracker.fold(round_paths, round_latencies)
+                if tracker.stop_when_empty and not tracker.nodes:
+                    break
+    return rounds, stats
+
+def evaluate_rounds_parallel(user_config, deploy_path, target_vnf, round_times, k_paths, workers, tracker, output=True):
+    """
+    把輪次切成 workers * 4 段連續的區間，以 process pool 平行計算（每個 process 有自己的模擬器工作目錄，
+    段內仍共用 IncrementalTopology），結果依輪次順序折疊進 tracker；
+    tracker 判斷可以提早結束時取消尚未開始的區間，回傳 (拓樸變動統計, 提早結束的原因)
+    """
+    if TOPOLOGY_PARAMS["use_archive"]:
+        # 先在主行程確認封存檔已建立，避免多個 process 同時建立
+        TopologyStore(output=output)
+    if TOPOLOGY_PARAMS["use_cover_index"]:
+        cover_index(user_config['source_latitude'], user_config['source_longitude'], output)
+
+    chunks = [chunk.tolist() for chunk in np.array_split(np.array(round_times), min(workers * 4, len(round_times)))]
+    tasks = [(user_config, deploy_path, target_vnf, chunk, k_paths) for chunk in chunks]
+    if output:
+        print(f"{GREEN}以 {min(workers, len(tasks))} 個 process 平行計算 {len(round_times)} 輪（{len(tasks)} 段）...{NC}")
+
+    stats = new_stats()
+    reason = None
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+    try:
+        futures = [executor.submit(evaluate_round_chunk, task) for task in tasks]
+        for chunk, future in zip(chunks, futures):
+            rounds, chunk_stats = future.result()
+            for key in stats:
+                stats[key] += chunk_stats[key]
+            for seconds_today, (round_paths, round_latencies) in zip(chunk, rounds):
+                tracker.fold(round_paths, round_latencies)
+                if output:
+                    print(f"{YELLOW}>>> Round {tracker.rounds}, Time = {seconds_today} sec：{len(round_paths)} 條路徑，共同節點 {len(tracker.nodes)} 顆{NC}")
+                    for path, latency in zip(round_paths, round_latencies):
+                        print(f"{GREEN}  ✓ {path}（{latency:.2f} ms）{NC}")
+                reason = tracker.stop_reason()
+                if reason:
+                    break
+            if reason:
+                break
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return stats, reason
+
+def migration_with_rounds(user_config, deploy_path, target_vnf, round_num, round_len_sec, k_paths=3, output=True, workers=1):
     """
     模擬多輪 VNF 遷移決策過程。
-    每輪根據當時的衛星拓樸重建圖，並重新計算該 VNF 的最短路徑。
+    每輪只套用與上一輪之間變動的 link（IncrementalTopology），並計算該 VNF 的最短路徑，不受變動影響的查詢沿用上一輪結果。
     若起點或終點為 NS 的端點，則以 get_cover_sats() 擴展成多個候選衛星。
-    最後取所有輪中皆出現的衛星作為穩定可用節點。
+    workers 大於 1 時各輪以 process pool 平行計算（evaluate_rounds_parallel），結果依輪次順序合併。
+    每輪的路徑立即折疊進 StableNodes（所有輪皆出現的衛星作為穩定可用節點），不保留各輪的路徑；
+    共同節點已為空或連續多輪沒有改變時（MIGRATION_PARAMS 的 stop_when_empty / stable_rounds）提早結束。
+    每個候選節點的預估延遲為「各輪中經過該節點的最短候選路徑延遲」的最大值（最差的一輪）；
+    超過 ROUTING_PARAMS["max_latency_ms"] 的節點排除，metric 為 "latency" 時先比延遲再比資源分數。
+    回傳遷移決策 {"sat_id", "score", "cpu_ratio", "mem_ratio", "disk_ratio", "latency_ms"}，沒有可用節點時回傳 None
     """
 
     from datetime import datetime, timedelta
-    from networkx.algorithms.simple_paths import shortest_simple_paths
 
     base_time = datetime.now()
-    target_id = target_vnf["id"]
-    all_paths = []
 
+    # === 每輪時間點 ===
+    round_times = []
     for r in range(round_num):
-        # === 每輪時間點 ===
         now = base_time + timedelta(seconds=r * round_len_sec)
-        seconds_today = now.hour * 3600 + now.minute * 60 + now.second
-        if output:
-            print(f"\n{YELLOW}>>> Round {r+1}, Time = {seconds_today} sec{NC}")
-
-        # === 每輪重新取得衛星圖 ===
-        G, _ = generate_adj_matrix(user_config, seconds_today, output)
-
-        # === 找出前後相鄰衛星 ===
-        src, dst = get_migration_endpoints(deploy_path, target_id)
+        round_times.append(now.hour * 3600 + now.minute * 60 + now.second)
 
-        if output:
-            print(f"{YELLOW}⚙ VNF {target_vnf['vnf_name']} 的遷移起點: {src}，終點: {dst}{NC}")
-        # === 初始化起點與終點清單 ===
-        src_list = [src]
-        dst_list = [dst]
-
-        # === 若起點是 NS 的起點，取當下能服務起點的 cover sats ===
-        if target_id-1 == 0:
-            src_list = get_cover_sats(user_config, seconds_today, output)
-            if output:
-                print(f"{YELLOW}⚙ 起點為 NS 起點，擴展為 cover sats：{src_list}{NC}")
+    start = time.time()
+    tracker = StableNodes(MIGRATION_PARAMS["stop_when_empty"], MIGRATION_PARAMS["stable_rounds"])
+    if workers > 1 and round_num > 1:
+        stats, reason = evaluate_rounds_parallel(user_config, deploy_path, target_vnf, round_times, k_paths, workers, tracker, output)
+    else:
+        stats, reason = new_stats(), None
+        with closing(evaluate_rounds(user_config, deploy_path, target_vnf, round_times, k_paths, output, stats=stats)) as series:
+            for _, round_paths, round_latencies in series:
+                tracker.fold(round_paths, round_latencies)
+                reason = tracker.stop_reason()
+                if reason:
+                    break
 
-        # === 若終點是 NS 的終點，取當下能服務終點的 cover sats ===
-        if target_id+1 == len(deploy_path) - 1:
-            dst_list = get_cover_sats(user_config, seconds_today, output)
-            if output:
-                print(f"{YELLOW}⚙ 終點為 NS 終點，擴展為 cover sats：{dst_list}{NC}")
-
-        # === 搜尋所有起點與終點組合的最短路徑 ===
-        round_paths = []
-        for s in src_list:
-            for d in dst_list:
-                if nx.has_path(G, s, d):
-                    paths = shortest_simple_paths(G, source=s, target=d)
-                    for counter, path in enumerate(paths):
-                        if output:
-                            print(f"{GREEN}✓ 路徑 {s} -> {d}：{path}{NC}")
-                        round_paths.append(path)
-                        if counter + 1 == k_paths:
-                            break
-                else:
-                    if output:
-                        print(f"{RED}✘ 無法從 {s} 到 {d} 找到通訊路徑{NC}")
-
-        all_paths.append(round_paths)
+    if output:
+        print(f"\n{YELLOW}{tracker.rounds} 輪計算耗時 {time.time() - start:.3f} 秒；拓樸變動：新增 {stats['added']}、移除 {stats['removed']} 條 link；路徑查詢沿用 {stats['reused']} 次、重新計算 {stats['recomputed']} 次{NC}")
+    if reason:
+        print(f"{YELLOW}⚙ {reason}，於第 {tracker.rounds} / {round_num} 輪提早結束{NC}")
+    else:
+        print(f"{YELLOW}⚙ 共計算 {tracker.rounds} / {round_num} 輪{NC}")
 
     # === 共通節點交集（找出所有輪皆穩定存在的衛星） ===
-    if not all_paths or not all_paths[0]:
+    if tracker.rounds == 1 and not tracker.nodes:
         print(f"{RED}✘ 無任何路徑可用，請確認起訖衛星有連通{NC}")
-        return
-
-    # 初始化為第一輪所有候選路徑的 union
-    final_nodes = set()
-    for p in all_paths[0]:
-        final_nodes.update(p)
-
-    # 逐輪縮小
-    for round_group in all_paths[1:]:
-        merged = set()
-        for path in round_group:
-            merged.update(path)
-        final_nodes.intersection_update(merged)
+        return None
+    final_nodes = tracker.nodes or set()
+    node_latency = tracker.latency
 
     print(f"\n{GREEN}✓ 所有輪皆存在的共同節點（可穩定使用的衛星）：{sorted(final_nodes)}{NC}")
 
@@ -296,9 +475,10 @@ def migration_with_rounds(user_config, deploy_path, target_vnf, round_num, round
     print(f"\n{YELLOW}▶ 對穩定節點進行資源評估...{NC}")
 
     candidate_scores = []
+    stable_resources = query_sat_resources(sorted(final_nodes))
 
     for sid in final_nodes:
-        res = query_sat_resource(sid)
+        res = stable_resources.get(sid)
         if res is None:
             continue
 
@@ -336,20 +516,38 @@ def migration_with_rounds(user_config, deploy_path, target_vnf, round_num, round
             disk_ratio * weights["disk"]
         )
 
-        candidate_scores.append((sid, score, cpu_ratio, mem_ratio, disk_ratio))
+        # 檢查端到端延遲上限 (SLA)
+        latency = node_latency.get(sid)
+        max_latency = ROUTING_PARAMS["max_latency_ms"]
+        if max_latency is not None and latency is not None and latency > max_latency:
+            print(f"{RED}✘ 衛星 {sid} 預估延遲 {latency:.2f} ms 超過上限 {max_latency} ms，排除{NC}")
+            continue
+
+        candidate_scores.append((sid, score, cpu_ratio, mem_ratio, disk_ratio, latency))
 
-        print(f"{GREEN}✓ 衛星 {sid} 可用，Score={score:.4f}{NC}")
+        print(f"{GREEN}✓ 衛星 {sid} 可用，Score={score:.4f}，預估延遲={latency:.2f} ms{NC}")
 
     if not candidate_scores:
         print(f"{RED}✘ 無衛星同時滿足：穩定 + 資源足夠 + 不超限{NC}")
-        return
+        return None
 
-    # 依 score 選最終遷移節點
-    best_sid, best_score, cr, mr, dr = min(candidate_scores, key=lambda x: x[1])
+    # 依 score 選最終遷移節點（latency 模式下先比預估延遲）
+    if ROUTING_PARAMS["metric"] == "latency":
+        best_sid, best_score, cr, mr, dr, best_latency = min(candidate_scores, key=lambda x: (x[5], x[1]))
+    else:
+        best_sid, best_score, cr, mr, dr, best_latency = min(candidate_scores, key=lambda x: x[1])
 
     print(f"\n{GREEN}=== 最終遷移目標節點 ===")
-    print(f"衛星 {best_sid}（Score={best_score:.4f}）")
+    print(f"衛星 {best_sid}（Score={best_score:.4f}，預估延遲={best_latency:.2f} ms）")
     print(f"CPU={cr*100:.1f}%  MEM={mr*100:.1f}%  Disk={dr*100:.1f}%{NC}")
+    return {
+        "sat_id": best_sid,
+        "score": best_score,
+        "cpu_ratio": cr,
+        "mem_ratio": mr,
+        "disk_ratio": dr,
+        "latency_ms": best_latency
+    }
 
 
 
@@ -375,7 +573,8 @@ def main():
     print(f"  rounds = {rounds}")
     print(f"  round_length = {round_length} 秒")
     print(f"  k_paths = {k_paths} 條路徑")
-    print(f"  output_round = {output_round}\n{NC}")
+    print(f"  output_round = {output_round}")
+    print(f"  workers = {workers}\n{NC}")
 
     deploy_path = user_config.get("path", [])
     target_vnf = None
@@ -386,7 +585,7 @@ def main():
 
    
 
-    migration_with_rounds(user_config, deploy_path, target_vnf, rounds, round_length, k_paths, output_round)
+    migration_with_rounds(user_config, deploy_path, target_vnf, rounds, round_length, k_paths, output_round, workers)
 
     # -------------------------------------------------------------- 測試用 -------------------------------------------------------------- #
 
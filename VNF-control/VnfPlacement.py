@@ -3,8 +3,13 @@ import subprocess
 import time
 import sys
 import os
-import copy
-from policy_config import PLACEMENT_PARAMS
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Operation-VNFs'))
+import Operating_Manager
+from policy_config import PLACEMENT_PARAMS, RESOURCE_PARAMS, ROUTING_PARAMS, SATTRACK_PARAMS
+from placement_engine import PlacementEngine
+import sattrack_runner
+from topology_store import topology_at
 
 YELLOW = '\033[93m'
 GREEN = '\033[38;5;82m'
@@ -33,12 +38,18 @@ def convert_to_list(data):
         return [data]  # Wrap single value in a list
 
 def query_sat_resource(sat_id):
-    """用 subprocess 查詢 Operating_Manager.py 資源狀態
+    """查詢單一衛星的資源狀態，回傳 resource 欄位（total / used_now / used_max），失敗回傳 None"""
+    return query_sat_resources([sat_id]).get(sat_id)
+
+def query_sat_resources(sat_ids):
+    """直接 import Operating_Manager.resource_snapshot，一次查詢多顆衛星的資源狀態
+    實體主機依 RESOURCE_PARAMS 分批平行查詢（max_workers / timeout），查完再列出最慢的主機；
+    cache_ttl 秒內查過的主機直接取自共用快取（deploy / migrate / scale 後會自動失效）。
+    不再為每顆衛星啟動一個 `python3 Operating_Manager.py resource <sat_id>` 子行程，
+    實體主機也只需一次 ssh。
     JSON回傳格式範例：
         {
-            "hostname": "openstackcompute5",
-            "warning": "ID 5 is not in the valid host list, using simulated data.",
-            "resource": {
+            305: {
                 "total": {
                     "CPU": 4,
                     "Memory_MB": 16384,
@@ -56,353 +67,329 @@ def query_sat_resource(sat_id):
                 }
             }
         }
+    查詢失敗的衛星不會出現在回傳的 dict 中
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__))  # Get the directory of the current script
-    full_path = os.path.join(script_dir, '..', 'Operation-VNFs', 'Operating_Manager.py')
+    resources = {}
+    start = time.time()
     try:
-        result = subprocess.check_output(
-            ['python3', full_path, 'resource', str(sat_id)],
-            stderr=subprocess.DEVNULL
+        snapshot = Operating_Manager.resource_snapshot(
+            sat_ids,
+            max_workers=RESOURCE_PARAMS["max_workers"],
+            timeout=RESOURCE_PARAMS["timeout"],
+            cache_ttl=RESOURCE_PARAMS["cache_ttl"]
         )
-        res = json.loads(result)
-        return res['resource']
-        # used = res['resource']['used_now']
-        # total = res['resource']['total']
-        # print(f"{GREEN}  查詢衛星 {sat_id} ......{NC}")
-        # return {
-        #     "cpu": total["CPU"] - used["CPU"],
-        #     "mem": total["Memory_MB"] - used["Memory_MB"],
-        #     "disk": total["Disk_GB"] - used["Disk_GB"]
-        # }
     except Exception as e:
-        print(f"{RED}  無法查詢衛星 {sat_id} 的資源: {e}{NC}")
-        return None
-
-
-def resource_sufficient(sat_resource_cache, sat_id, vnf):
-    """判斷某衛星資源是否能部署某 VNF，並檢查是否超過使用率上限"""
+        print(f"{RED}  無法查詢衛星 {list(sat_ids)} 的資源: {e}{NC}")
+        return resources
+    elapsed = time.time() - start
+
+    for sat_id, info in snapshot.items():
+        if "resource" not in info:
+            print(f"{RED}  無法查詢衛星 {sat_id} 的資源: {info.get('error')}{NC}")
+            continue
+        resources[sat_id] = info["resource"]
+
+    report_latency(snapshot, elapsed)
+    return resources
+
+def report_latency(snapshot, elapsed):
+    """列出資源查詢最慢的幾台主機，方便找出拖慢決策時間的 compute node"""
+    top = RESOURCE_PARAMS["latency_report_top"]
+    if not top or not snapshot:
+        return
+    slowest = sorted(snapshot.values(), key=lambda info: info.get("fetch_latency", 0), reverse=True)[:top]
+    print(f"{YELLOW}  資源查詢完成：{len(snapshot)} 顆衛星，總耗時 {elapsed:.3f} 秒，最慢的主機：{NC}")
+    for info in slowest:
+        print(f"    - {info['hostname']}: {info.get('fetch_latency', 0):.3f} 秒")
 
-    available = {
-        "cpu": sat_resource_cache[sat_id]['total']['CPU'] - sat_resource_cache[sat_id]['used_now']['CPU'],
-        "mem": sat_resource_cache[sat_id]['total']['Memory_MB'] - sat_resource_cache[sat_id]['used_now']['Memory_MB'],
-        "disk": sat_resource_cache[sat_id]['total']['Disk_GB'] - sat_resource_cache[sat_id]['used_now']['Disk_GB']
-    }
 
-    print(f"    ➤ 檢查衛星 {sat_id}：可用 CPU={available['cpu']}, Mem={available['mem']//1024}GB, Disk={available['disk']}GB")
+def find_paths(user_config):
+    """
+    以 NS 的起訖地面站座標查詢 printStationHopcountPath 的結果，
+    回傳 HopCountPath.txt 的內容（availableSatsList1 / availableSatsList2 / pathlist）；
+    相同地面站與模擬參數的結果會直接取自 sattrack_runner 的磁碟快取
+    """
+    source = (user_config['source_latitude'], user_config['source_longitude'])
+    destination = (user_config['destination_latitude'], user_config['destination_longitude'])
 
-    # 基本資源夠不夠
-    if not (
-        available["cpu"] >= vnf["cpu"] and
-        available["mem"] >= vnf["memory"] * 1024 and
-        available["disk"] >= vnf["storage"]
-    ):
-        return False
+    # Execute ./sattrack
+    try:
+        data, cached = sattrack_runner.station_hop_paths(source, destination)
+    except subprocess.CalledProcessError as e:
+        print(f"An error occurred while executing ./sattrack: {e}")
+        return {}
+    except FileNotFoundError as e:
+        print(f"File not found: {e.filename}")
+        return {}
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return {}
 
+    if cached:
+        print("\nHopCountPath found in cache, skipped ./sattrack..............................\n")
+    else:
+        print("\nExecuting ./satrrack successfully. Output in HopCountPath.txt..............\n")
 
-    # 檢查使用率是否超過限制
+    available_sats_list1 = data.get("availableSatsList1", [])
+    available_sats_list2 = data.get("availableSatsList2", [])
+    path_list = data.get("pathlist", [])
+    
+    print("\nAvailable Sats List 1:", available_sats_list1)
+    print("Available Sats List 2:", available_sats_list2)
+    print("Path List:", path_list)
+    return data
 
-    total = sat_resource_cache[sat_id]['total']
 
-    # 部署後的預估使用率
-    cpu_ratio = (sat_resource_cache[sat_id]['used_now']['CPU'] + vnf["cpu"]) / total['CPU']
-    mem_ratio = (sat_resource_cache[sat_id]['used_now']['Memory_MB'] + vnf["memory"] * 1024) / total['Memory_MB']
-    disk_ratio = (sat_resource_cache[sat_id]['used_now']['Disk_GB'] + vnf["storage"]) / total['Disk_GB']
+def station_pair(user_config):
+    """NS 的起訖地面站座標，座標相同的 NS 共用同一次 sattrack 結果"""
+    return (user_config['source_latitude'], user_config['source_longitude'],
+            user_config['destination_latitude'], user_config['destination_longitude'])
 
-    if cpu_ratio > limit["cpu"]:
-        print(f"{RED}    ⚠ CPU 使用率將達 {cpu_ratio*100:.1f}% 超過上限{limit['cpu']*100}%{NC}")
-        return False
-    if mem_ratio > limit["mem"]:
-        print(f"{RED}    ⚠ Mem 使用率將達 {mem_ratio*100:.1f}% 超過上限{limit['mem']*100}%{NC}")
-        return False
-    if disk_ratio > limit["disk"]:
-        print(f"{RED}    ⚠ Disk 使用率將達 {disk_ratio*100:.1f}% 超過上限{limit['disk']*100}%{NC}")
-        return False
 
-    return True
+def path_topology():
+    """候選路徑計算時（範本時間）的星群拓樸，用來估計路徑延遲；取得失敗時回傳 None"""
+    try:
+        return topology_at(sattrack_runner.template_time())
+    except Exception as e:
+        print(f"{RED}  ⚠ 無法取得星群拓樸，不估計路徑延遲: {e}{NC}")
+        return None
 
 
-def main():
+def detour_resources(resources, data, topology):
+    """
+    PLACEMENT_PARAMS["max_detour_hops"] 不為 None 時，只保留繞路不超過上限的衛星（查路由表：經過該衛星比兩地面站
+    可見衛星之間的最短路徑多走的 hop 數），其餘衛星仍可作為路徑經過的節點，但不部署 VNF
+    """
+    max_detour = PLACEMENT_PARAMS.get("max_detour_hops")
+    if max_detour is None or topology is None:
+        return resources
+    allowed = set(topology.within_detour(data.get("availableSatsList1", []), data.get("availableSatsList2", []), max_detour))
+    excluded = sorted(sat_id for sat_id in resources if sat_id not in allowed)
+    if excluded:
+        print(f"{YELLOW}  ⚠ 衛星 {excluded} 的繞路超過 {max_detour} 跳，不部署 VNF{NC}")
+    return {sat_id: info for sat_id, info in resources.items() if sat_id in allowed}
 
-    print(f"{GREEN}正在執行 VNF Placement 決策模組{NC}\n\n")
-    if len(sys.argv) < 2:
-        print(f"{RED}請輸入要部署之 NS 名稱{NC}")
-        return
 
-    ns_name = sys.argv[1]
+def place_ns(ns_name, vnf_list, path_list, resources, topology=None):
+    """
+    在 resources（已扣除先前 NS 的預留）上為單一 NS 挑選最佳部署方案，
+    回傳 best_plan {"path", "vnf_to_sat", "total_resource_used", "ratios", "latency_ms"}，沒有可行方案時回傳 None。
+    有 topology 時以 ISL 距離估計每條路徑的端到端延遲：超過 ROUTING_PARAMS["max_latency_ms"] 的方案排除，
+    ROUTING_PARAMS["metric"] 為 "latency" 時依延遲選出最佳方案（延遲相同再比權重分數）
+    """
+    print(f"\n{GREEN}===== NS: {ns_name} ====={NC}")
+    deployable_paths = []
 
-    # Set the directory to execute the command
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    directory = os.path.join(script_dir, '..', 'LEO-satellite-constellation-simulator', 'LEO-satellite-constellation-simulator', 'sattrack')
-    # If you want to use a relative path, you can uncomment the line below
-    # directory = '../LEO-satellite-constellation-simulator/LEO-satellite-constellation-simulator/sattrack/'
-    
+    # 將候選衛星資源與 VNF 需求載入成陣列，可行性判斷與評分都以陣列運算完成
+    engine = PlacementEngine(resources, vnf_list, weights, limit)
+    total_resource_used = engine.total_resource_used()
 
+    # 所有路徑建成前綴樹一起搜尋，共同前綴只計算一次
+    if PLACEMENT_PARAMS.get("solver", "greedy") == "optimal":
+        results = engine.place_optimal_all(path_list, PLACEMENT_PARAMS.get("time_budget"), PLACEMENT_PARAMS.get("max_labels"))
+        if not all(result[2] for result in results):
+            print(f"{YELLOW}  ⚠ 部分路徑未能在時間上限 / 部分解數量上限內確認為最佳解，採用目前找到的最佳部署方式{NC}")
+    else:
+        results = engine.place_greedy_all(path_list)
 
-    config = load_json('ns_vnf_config.json')
-    user_config = config[ns_name]
-    print(user_config)
-    
-    # Specify the file paths
-    input_file_path = os.path.join(directory , 'parameter_example.txt')
-    output_file_path = os.path.join(directory, 'parameter.txt')
+    for path_idx, (path, result) in enumerate(zip(path_list, results), 1):
+        print(f"\n{YELLOW}▶ 正在檢查路徑 {path_idx}: {path}{NC}")
+        deployment_map, failed_vnf = result[0], result[1]
 
+        for vnf_name, sat_id in deployment_map.items():
+            print(f"{GREEN}    ✅ 成功部署 {vnf_name} 至衛星 {sat_id}{NC}")
 
-    # Read from parameter_example.txt and write to parameter.txt
-    try:
-        with open(input_file_path, 'r') as input_file:
-            content = input_file.read()  # Read the content of the input file
-        
-        with open(output_file_path, 'w') as output_file:
-            output_file.write(content)  # Write the content to the output file
+        if failed_vnf is not None:
+            print(f"{RED}  ✘ 無法為 VNF：{failed_vnf} 找到合適的衛星，此路徑部署失敗{NC}")
+            continue
 
-        print(f"\nContent from {input_file_path} has been written to {output_file_path}.\n")
+        print(f"{GREEN}\n  ✅ 路徑 {path} 可成功部署所有 VNF{NC}")
+        deployable_paths.append({
+            "path": path,
+            "vnf_to_sat": deployment_map,
+            "total_resource_used": dict(total_resource_used)
+        })
 
-    except FileNotFoundError:
-        print(f"File not found: {input_file_path}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
 
+    # 顯示所有成功部署的路徑
+    if not deployable_paths:
+        print(f"\n{RED}✘ 沒有符合條件的路徑可以部署所有 VNF{NC}")
+        return None
 
-    # Append the formatted latitude and longitude to a file
-    with open(output_file_path, 'a') as file:
-        file.write(f">>(stationLatitude1): ({user_config['source_latitude']})\n")
-        file.write(f">>(stationLongitude1): ({user_config['source_longitude']})\n")
-        file.write(f">>(stationLatitude2): ({user_config['destination_latitude']})\n")
-        file.write(f">>(stationLongitude2): ({user_config['destination_longitude']})\n")
-        file.write(f">>(outputFileName): (HopCountPath.txt)\n")
-        file.write(f">>(execute_function): (printStationHopcountPath)\n")
-        
+    # 一次算出所有方案的使用率與權重分數（分數越低越好，代表使用越平均、壓力越低）
+    scores, ratio_matrix = engine.score_plans(deployable_paths)
+    for plan, score, (cpu_ratio, mem_ratio, disk_ratio) in zip(deployable_paths, scores, ratio_matrix):
+        plan["ratios"] = {
+            "score": float(score),
+            "cpu_ratio": float(cpu_ratio),
+            "mem_ratio": float(mem_ratio),
+            "disk_ratio": float(disk_ratio)
+        }
+        plan["latency_ms"] = topology.path_latency(plan["path"]) if topology is not None else None
+
+    # 排除超過延遲上限 (SLA) 的方案
+    max_latency = ROUTING_PARAMS["max_latency_ms"]
+    if max_latency is not None:
+        within_sla = [plan for plan in deployable_paths if plan["latency_ms"] is None or plan["latency_ms"] <= max_latency]
+        for plan in deployable_paths:
+            if plan not in within_sla:
+                print(f"{RED}  ✘ 路徑 {plan['path']} 的延遲 {plan['latency_ms']:.2f} ms 超過上限 {max_latency} ms，排除{NC}")
+        if not within_sla:
+            print(f"\n{RED}✘ 沒有符合延遲上限的路徑可以部署所有 VNF{NC}")
+            return None
+        deployable_paths = within_sla
+
+    print(f"\n{GREEN}符合條件的路徑與部署方案如下：{NC}")
+    for idx, item in enumerate(deployable_paths, 1):
+        print(f"\n方案 {idx}:")
+        print(f"  Path: {item['path']}")
+        for vnf_name, sat_id in item['vnf_to_sat'].items():
+            print(f"  - {vnf_name} 部署於衛星 {sat_id}")
+        tr = item["total_resource_used"]
+        print(f"  ✦ 總資源使用量：CPU={tr['cpu']}, Mem={tr['mem']}MB, Disk={tr['disk']}GB")
 
-    print("\nLatitude and longitude have been appended to the file......................\n")
+        # ➤ 顯示使用率
+        ratios = item["ratios"]
+        print(f"  ➤ 使用率：CPU={ratios['cpu_ratio']*100:.1f}%, Mem={ratios['mem_ratio']*100:.1f}%, Disk={ratios['disk_ratio']*100:.1f}%")
+        print(f"  ➤ 權重後分數（越低越好）：{ratios['score']:.4f}")
+        print(f"  ➤ 預估端到端延遲：{format_latency(item['latency_ms'])}")
 
-    
-    
-    
 
-    # Execute ./sattrack
+    # 根據權重分數（score）選出最佳方案；latency 模式下先比延遲（無法估計延遲的方案排在最後）
+    if ROUTING_PARAMS["metric"] == "latency":
+        best_plan = min(deployable_paths, key=lambda plan: (plan["latency_ms"] is None, plan["latency_ms"] or 0.0, plan["ratios"]["score"]))
+        basis = "端到端延遲"
+    else:
+        best_plan = min(deployable_paths, key=lambda plan: plan["ratios"]["score"])
+        basis = "資源使用率"
+    ratios = best_plan["ratios"]
+
+    print(f"\n{YELLOW}最佳部署方案（依{basis}）為：{NC}")
+    print(f"  Path: {best_plan['path']}")
+    for vnf_name, sat_id in best_plan['vnf_to_sat'].items():
+        print(f"  - {vnf_name} 部署於衛星 {sat_id}")
+    tr = best_plan["total_resource_used"]
+    print(f"  ✦ 資源使用量：CPU={tr['cpu']}, Mem={tr['mem']}MB, Disk={tr['disk']}GB")
+    print(f"  ➤ 使用率：CPU={ratios['cpu_ratio']*100:.1f}%, Mem={ratios['mem_ratio']*100:.1f}%, Disk={ratios['disk_ratio']*100:.1f}%")
+    print(f"  ➤ 使用者權重：CPU={weights['cpu']}, MEM={weights['mem']}, DISK={weights['disk']}")
+    print(f"  ➤ 權重後分數（越低越好）：{ratios['score']:.4f}")
+    print(f"  ➤ 預估端到端延遲：{format_latency(best_plan['latency_ms'])}")
+    return best_plan
+
+
+def format_latency(latency_ms):
+    return f"{latency_ms:.2f} ms" if latency_ms is not None else "無法估計"
+
+
+def reserve_plan(resources, vnf_list, best_plan):
+    """把選定方案的 VNF 需求加到 used_now，之後的 NS 會看到這些衛星已被預留的資源"""
+    for vnf in vnf_list:
+        usage = resources[best_plan["vnf_to_sat"][vnf["vnf_name"]]]["used_now"]
+        usage["CPU"] += vnf["cpu"]
+        usage["Memory_MB"] += vnf["memory"] * 1024
+        usage["Disk_GB"] += vnf["storage"]
+
+
+def apply_plan(config, ns_name, best_plan):
+    """將選定方案寫回 config（只修改記憶體中的內容）"""
+    # Update selected sat_id in json config
+    for vnf in config[ns_name]["vnfs"]:
+        vnf_name = vnf["vnf_name"]
+        if vnf_name in best_plan["vnf_to_sat"]:
+            vnf["sat_id"] = best_plan["vnf_to_sat"][vnf_name]
+
+    # Update path list: [起點, 所有VNF對應sat_id, 終點]
+    path_with_vnf = []
     try:
-        
-        print("\nExecuting ./satrrack.......................................................\n")
-
-        # Use subprocess to run the external command
-        with open(os.path.join(directory, 'HopCountOutput.txt'), 'w') as output_file:
-            subprocess.run(['./sattrack'], cwd=directory, stdout=output_file, stderr=subprocess.STDOUT, check=True)
-
-
-        # Wait for a short time to ensure execution completes (if needed)
-        time.sleep(1)  # Adjust the wait time as necessary
-
-        # Read the output1.txt file
-        output_file_path = os.path.join(directory, 'HopCountPath.txt')
-        with open(output_file_path, 'r') as file:
-            output_data = file.read()
-        
-        # Display the read content
-        # print("Output from output1.txt:")
-        # print(output_data)
-    except subprocess.CalledProcessError as e:
-        print(f"An error occurred while executing ./sattrack: {e}")
-    except FileNotFoundError:
-        print(f"File not found: {output_file_path}")
+        start_sat = best_plan["path"][0]
+        end_sat = best_plan["path"][-1]
+        path_with_vnf.append(start_sat)
+        for vnf in config[ns_name]["vnfs"]:
+            path_with_vnf.append(vnf["sat_id"])
+        path_with_vnf.append(end_sat)
+        config[ns_name]["path"] = path_with_vnf
+        print(f"{GREEN}✔ 已新增 path 欄位: {path_with_vnf}{NC}")
+        if best_plan.get("latency_ms") is not None:
+            config[ns_name]["latency_ms"] = round(best_plan["latency_ms"], 3)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-
-
-    print("\nExecuting ./satrrack successfully. Output in HopCountPath.txt..............\n")
-
+        print(f"{RED}✘ 產生 path 欄位失敗: {e}{NC}")
 
-    data = load_json(output_file_path)
-    
-    available_sats_list1 = data.get("availableSatsList1", [])
-    available_sats_list2 = data.get("availableSatsList2", [])
-    path_list = data.get("pathlist", [])
-    
-    print("\nAvailable Sats List 1:", available_sats_list1)
-    print("Available Sats List 2:", available_sats_list2)
-    print("Path List:", path_list)
 
-    deployable_paths = []
-    vnf_list = user_config["vnfs"]
-    initial_resource = {}
+def save_config(config):
+    """先寫入暫存檔再 os.replace，一次更新 ns_vnf_config.json，其他程式不會讀到寫一半的內容"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    json_path = os.path.join(script_dir, '..', 'Operation-VNFs', 'ns_vnf_config.json')
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, json_path)
 
-    for path_idx, path in enumerate(path_list, 1):
-        print(f"\n{YELLOW}▶ 正在檢查路徑 {path_idx}: {path}{NC}")
-        deployment_successful = True
-        sat_resource_cache = copy.deepcopy(initial_resource)  # 快取衛星資源狀態
-        deployment_map = {}
-        used_satellites = set()
-        total_resource_used = {"cpu": 0, "mem": 0, "disk": 0}
-        last_deployed_sat_index = 0  # 嘗試部署的衛星起始點
-
-        for vnf in vnf_list:
-            vnf_deployed = False
-            print(f"\n  嘗試部署 VNF：{vnf['vnf_name']}，需求：CPU={vnf['cpu']}, Memory={vnf['memory']}GB, Disk={vnf['storage']}GB")
-
-            # 優先找尚未部署過的衛星
-            for sat_index in range(last_deployed_sat_index, len(path)):
-                sat_id = path[sat_index]
-
-                # 先從快取取得資源，沒有就查詢後存入快取
-                if sat_id not in initial_resource:
-                    res_data = query_sat_resource(sat_id)
-                    if res_data is None:
-                        print(f"{RED}    ⚠ 無法取得衛星 {sat_id} 的資源資料，跳過此衛星{NC}")
-                        continue
-                    sat_resource_cache[sat_id] = copy.deepcopy(res_data)
-                    initial_resource[sat_id] = copy.deepcopy(res_data)
-
-
-                
-
-                if resource_sufficient(sat_resource_cache,sat_id, vnf):
-                    if sat_id not in used_satellites:
-                        # 優先使用新衛星
-                        pass
-                    elif len(used_satellites) < len(path):
-                        continue  # 還有其他沒用過的衛星可試
-
-                    deployment_map[vnf["vnf_name"]] = sat_id
-                    sat_resource_cache[sat_id]['used_now']['CPU'] += vnf["cpu"]
-                    sat_resource_cache[sat_id]['used_now']['Memory_MB'] += vnf["memory"] * 1024
-                    sat_resource_cache[sat_id]['used_now']['Disk_GB'] += vnf["storage"]
-
-                    # 累加此 VNF 使用的資源量
-                    total_resource_used["cpu"] += vnf["cpu"]
-                    total_resource_used["mem"] += vnf["memory"] * 1024
-                    total_resource_used["disk"] += vnf["storage"]
-
-                    used_satellites.add(sat_id)
-                    vnf_deployed = True
-                    last_deployed_sat_index = sat_index
-                    print(f"{GREEN}    ✅ 成功部署 {vnf['vnf_name']} 至衛星 {sat_id}{NC}")
-                    break
-                else:
-                    print(f"{RED}    ❌ 衛星 {sat_id} 資源不足，無法部署此 VNF{NC}")
-
-            if not vnf_deployed:
-                print(f"{RED}  ✘ 無法為 VNF：{vnf['vnf_name']} 找到合適的衛星，此路徑部署失敗{NC}")
-                deployment_successful = False
-                break
-
-        if deployment_successful:
-            print(f"{GREEN}\n  ✅ 路徑 {path} 可成功部署所有 VNF{NC}")
-            deployable_paths.append({
-                "path": path,
-                "vnf_to_sat": deployment_map,
-                "total_resource_used": total_resource_used
-            })
 
+def main():
 
-    # 顯示所有成功部署的路徑
-    if deployable_paths:
-        #  加入使用率計算
-        def calculate_usage_ratio(plan):
-            """
-            使用者自訂權重 (CPU/MEM/DISK) 來計算分數
-            分數越低越好（代表使用越平均、壓力越低）
-            """
-
-            path = plan["path"]
-            used_plan = plan["total_resource_used"]
-            total = {"cpu": 0, "mem": 0, "disk": 0}
-            used_now = {"cpu": 0, "mem": 0, "disk": 0}
-
-            # 只計算真正用上的衛星
-            used_sat_ids = set(plan["vnf_to_sat"].values())
-
-            for sat_id in used_sat_ids:
-                res = initial_resource.get(sat_id)
-                if res:
-                    total["cpu"] += res["total"]["CPU"]
-                    total["mem"] += res["total"]["Memory_MB"]
-                    total["disk"] += res["total"]["Disk_GB"]
-                    used_now["cpu"] += res["used_now"]["CPU"]
-                    used_now["mem"] += res["used_now"]["Memory_MB"]
-                    used_now["disk"] += res["used_now"]["Disk_GB"]
-
-            # 取得三個使用率
-            cpu_ratio = (used_plan["cpu"] + used_now["cpu"]) / total["cpu"] if total["cpu"] else 0
-            mem_ratio = (used_plan["mem"] + used_now["mem"]) / total["mem"] if total["mem"] else 0
-            disk_ratio = (used_plan["disk"] + used_now["disk"]) / total["disk"] if total["disk"] else 0
-
-            # 依照使用者權重計算總分          
-            score = (
-                cpu_ratio * weights["cpu"] +
-                mem_ratio * weights["mem"] +
-                disk_ratio * weights["disk"]
-            )
-
-            return {
-                "score": score,
-                "cpu_ratio": cpu_ratio,
-                "mem_ratio": mem_ratio,
-                "disk_ratio": disk_ratio
-            }
+    print(f"{GREEN}正在執行 VNF Placement 決策模組{NC}\n\n")
+    if len(sys.argv) < 2:
+        print(f"{RED}請輸入要部署之 NS 名稱（可一次輸入多個：python3 VnfPlacement.py <ns_name> [ns_name ...]）{NC}")
+        return
 
-        print(f"\n{GREEN}符合條件的路徑與部署方案如下：{NC}")
-        for idx, item in enumerate(deployable_paths, 1):
-            print(f"\n方案 {idx}:")
-            print(f"  Path: {item['path']}")
-            for vnf_name, sat_id in item['vnf_to_sat'].items():
-                print(f"  - {vnf_name} 部署於衛星 {sat_id}")
-            tr = item["total_resource_used"]
-            print(f"  ✦ 總資源使用量：CPU={tr['cpu']}, Mem={tr['mem']}MB, Disk={tr['disk']}GB")
+    ns_names = list(dict.fromkeys(sys.argv[1:]))
 
-            # ➤ 顯示使用率
-            ratios = calculate_usage_ratio(item)
-            print(f"  ➤ 使用率：CPU={ratios['cpu_ratio']*100:.1f}%, Mem={ratios['mem_ratio']*100:.1f}%, Disk={ratios['disk_ratio']*100:.1f}%")
-            print(f"  ➤ 權重後分數（越低越好）：{ratios['score']:.4f}")
+    config = load_json('ns_vnf_config.json')
+    missing_ns = [ns_name for ns_name in ns_names if ns_name not in config]
+    if missing_ns:
+        print(f"{RED}ns_vnf_config.json 中找不到 NS：{missing_ns}{NC}")
+        return
 
+    # 每組起訖地面站只執行一次 sattrack；每次查詢有自己的模擬器工作目錄，不同地面站組合同時執行
+    pair_configs = {}
+    for ns_name in ns_names:
+        user_config = config[ns_name]
+        print(user_config)
+        pair_configs.setdefault(station_pair(user_config), user_config)
+    with ThreadPoolExecutor(max_workers=max(1, min(SATTRACK_PARAMS["max_parallel"], len(pair_configs)))) as executor:
+        data_by_pair = dict(zip(pair_configs, executor.map(find_paths, pair_configs.values())))
+    path_lists = {ns_name: data_by_pair[station_pair(config[ns_name])].get("pathlist", []) for ns_name in ns_names}
+
+    # 所有 NS 的候選衛星合併後一次批次查詢資源，之後的可行性檢查都只讀這份快照
+    candidate_sats = list(dict.fromkeys(sat_id for path_list in path_lists.values() for path in path_list for sat_id in path))
+    print(f"\n{YELLOW}批次查詢 {len(candidate_sats)} 顆候選衛星的資源...{NC}")
+    resources = query_sat_resources(candidate_sats)
+    missing_sats = [sat_id for sat_id in candidate_sats if sat_id not in resources]
+    if missing_sats:
+        print(f"{RED}  ⚠ 無法取得衛星 {missing_sats} 的資源資料，這些衛星將被跳過{NC}")
+    # 預留量直接累加在 used_now 上，先複製一份避免動到查詢結果
+    resources = {sat_id: dict(info, used_now=dict(info["used_now"])) for sat_id, info in resources.items()}
+
+    # 候選路徑的端到端延遲以同一時間點的星群拓樸估計
+    topology = path_topology()
+
+    # 依輸入順序逐一部署，前面 NS 選定的衛星資源會被預留，後面的 NS 不會重複使用同一份容量
+    placed = []
+    for ns_name in ns_names:
+        vnf_list = config[ns_name]["vnfs"]
+        ns_resources = detour_resources(resources, data_by_pair[station_pair(config[ns_name])], topology)
+        best_plan = place_ns(ns_name, vnf_list, path_lists[ns_name], ns_resources, topology)
+        if best_plan is None:
+            continue
+        reserve_plan(resources, vnf_list, best_plan)
+        apply_plan(config, ns_name, best_plan)
+        placed.append(ns_name)
+
+    if not placed:
+        return
 
-        # 根據權重分數（score）選出最佳方案
-        best_plan = min(deployable_paths, key=lambda p: calculate_usage_ratio(p)["score"])
-        ratios = calculate_usage_ratio(best_plan)
+    # Save the updated config back to the original JSON file 
+    try:
+        save_config(config)
+        print(f"{GREEN}\nSuccessfully updated 'sat_id' in ns_vnf_config.json for NS: {', '.join(placed)}\n{NC}")
+    except Exception as e:
+        print(f"{RED}✘ Error writing to ns_vnf_config.json: {e}{NC}")
 
-        print(f"\n{YELLOW}最佳部署方案（依資源使用率）為：{NC}")
-        print(f"  Path: {best_plan['path']}")
-        for vnf_name, sat_id in best_plan['vnf_to_sat'].items():
-            print(f"  - {vnf_name} 部署於衛星 {sat_id}")
-        tr = best_plan["total_resource_used"]
-        print(f"  ✦ 資源使用量：CPU={tr['cpu']}, Mem={tr['mem']}MB, Disk={tr['disk']}GB")
-        print(f"  ➤ 使用率：CPU={ratios['cpu_ratio']*100:.1f}%, Mem={ratios['mem_ratio']*100:.1f}%, Disk={ratios['disk_ratio']*100:.1f}%")
-        print(f"  ➤ 使用者權重：CPU={weights['cpu']}, MEM={weights['mem']}, DISK={weights['disk']}")
-        print(f"  ➤ 權重後分數（越低越好）：{ratios['score']:.4f}")
+    failed_ns = [ns_name for ns_name in ns_names if ns_name not in placed]
+    if failed_ns:
+        print(f"{RED}✘ 以下 NS 沒有符合條件的路徑可以部署所有 VNF：{failed_ns}{NC}")
 
-        # Update selected sat_id in json config
-        for vnf in config[ns_name]["vnfs"]:
-            vnf_name = vnf["vnf_name"]
-            if vnf_name in best_plan["vnf_to_sat"]:
-                vnf["sat_id"] = best_plan["vnf_to_sat"][vnf_name]
-
-        # Update path list: [起點, 所有VNF對應sat_id, 終點]
-        path_with_vnf = []
-        try:
-            start_sat = best_plan["path"][0]
-            end_sat = best_plan["path"][-1]
-            path_with_vnf.append(start_sat)
-            for vnf in config[ns_name]["vnfs"]:
-                path_with_vnf.append(vnf["sat_id"])
-            path_with_vnf.append(end_sat)
-            config[ns_name]["path"] = path_with_vnf
-            print(f"{GREEN}✔ 已新增 path 欄位: {path_with_vnf}{NC}")
-        except Exception as e:
-            print(f"{RED}✘ 產生 path 欄位失敗: {e}{NC}")
-
-        # Save the updated config back to the original JSON file 
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        json_path = os.path.join(script_dir, '..', 'Operation-VNFs', 'ns_vnf_config.json')
-
-        try:
-            with open(json_path, 'w') as f:
-                json.dump(config, f, indent=2)
-            print(f"{GREEN}\nSuccessfully updated 'sat_id' in ns_vnf_config.json for NS: {ns_name}\n{NC}")
-        except Exception as e:
-            print(f"{RED}✘ Error writing to ns_vnf_config.json: {e}{NC}")
 
-    else:
-        print(f"\n{RED}✘ 沒有符合條件的路徑可以部署所有 VNF{NC}")
-    
-    
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+cover_index.py
+地面站可見衛星的區間索引 (cover-satellite interval index)
+
+每個地面站只執行一次 printStationAllSatConnectionTime，取得一天中每顆衛星可以連線的時間區間
+[start, end)（end 為斷線的那一秒），存成磁碟快取；之後在行程內直接查詢，不必再為每個時間點執行 printStationCoverSats：
+- at(t)：時間 t 可以連線的衛星，以所有區間端點切出的基本區段 + bisect，O(log n)
+- during(t0, t1, mode)：[t0, t1] 期間可以連線的衛星（"any" = 任一秒可連線，"all" = 整段都可連線），
+  從 t0 所在的基本區段出發："any" 再加上所有區間起點中落在 (t0, t1] 的衛星（起點已全部排序），
+  "all" 只檢查 t0 可見衛星的區間終點，O(log n + k)，k 為 t0 可見與期間內開始連線的衛星數
+- coverage_end(sat_id, t)：衛星在時間 t 可以連線時，連線中斷的時間點
+快取以 (TLE 檔內容、地面站座標與高度、仰角 / 距離限制、round) 的 hash 命名，參數或 TLE 改變時自動重建。
+時間先對 86400 取餘數。
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+
+import sattrack_runner
+from topology_store import DAY_SECONDS
+
+COVER_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cover_index_cache')
+# 影響地面站可見衛星的參數
+COVER_KEYS = (
+    "TLE_inputFileName", "stationLatitude", "stationLongitude", "stationAltitude",
+    "groundStationAcceptableElevation", "groundStationAcceptableDistance", "round",
+)
+INTERVAL_PATTERN = re.compile(r'(\d+)~(\d+)-\d+')
+
+GREEN = '\033[38;5;82m'
+NC = '\033[0m'  # No Color
+
+
+def station_params(latitude, longitude):
+    return {"stationLatitude": latitude, "stationLongitude": longitude}
+
+
+def cover_key(latitude, longitude, directory=sattrack_runner.SATTRACK_DIR):
+    """以模擬器實際讀到的地面站參數與 TLE 檔內容產生快取 key"""
+    table = sattrack_runner.parse_parameters(sattrack_runner.render_parameters(station_params(latitude, longitude), directory))
+    material = {
+        "parameters": {key: table.get(key) for key in COVER_KEYS},
+        "tle": sattrack_runner.file_digest(os.path.join(directory, table.get('TLE_inputFileName', ''))),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def parse_connection_time(path):
+    """解析 printStationAllSatConnectionTime（printSecond = Y）的輸出，回傳 {sat_id: [[start, end], ...]}"""
+    intervals = {}
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.startswith('sat'):
+                continue
+            name, _, rest = line.partition(' ')
+            intervals[int(name[3:])] = [[int(start), int(end)] for start, end in INTERVAL_PATTERN.findall(rest)]
+    return intervals
+
+
+class CoverIndex:
+    """
+    單一地面站一天的可見衛星索引。第一次使用時在獨立的模擬器工作目錄中執行 sattrack 並寫入快取，
+    之後只讀取 COVER_INDEX_DIR/<key>.json。
+    """
+
+    def __init__(self, latitude, longitude, directory=COVER_INDEX_DIR, output=True):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.path = os.path.join(directory, f"{cover_key(latitude, longitude)}.json")
+        self.output = output
+        try:
+            with open(self.path, 'r') as f:
+                intervals = json.load(f)["intervals"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            intervals = self.build()
+        self.load({int(sat_id): value for sat_id, value in intervals.items()})
+
+    def build(self):
+        if self.output:
+            print(f"{GREEN}建立地面站 ({self.latitude}, {self.longitude}) 的可見衛星索引中（執行一次 ./sattrack）...{NC}")
+        params = dict(station_params(self.latitude, self.longitude))
+        params["printSecond"] = "Y"
+        params["outputFileName"] = "StationConnectionTime.txt"
+        params["execute_function"] = "printStationAllSatConnectionTime"
+        intervals = sattrack_runner.query_sattrack(params, 'StationConnectionTimeOutput.txt', parse_connection_time)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"latitude": self.latitude, "longitude": self.longitude, "intervals": intervals}, f)
+        os.replace(tmp_path, self.path)
+        return intervals
+
+    def load(self, intervals):
+        self.sat_ids = sorted(intervals)
+        self.starts = {sat_id: [start for start, _ in intervals[sat_id]] for sat_id in self.sat_ids}
+        self.ends = {sat_id: [end for _, end in intervals[sat_id]] for sat_id in self.sat_ids}
+        # 所有區間的起點依時間排序，start_sats[i] 為第 i 個起點所屬的衛星
+        openings = sorted((start, sat_id) for sat_id in self.sat_ids for start in self.starts[sat_id])
+        self.start_times = [start for start, _ in openings]
+        self.start_sats = [sat_id for _, sat_id in openings]
+
+        # 所有區間端點把一天切成基本區段，每個區段內可見的衛星相同
+        events = {}
+        for sat_id in self.sat_ids:
+            for start, end in intervals[sat_id]:
+                events.setdefault(start, []).append((sat_id, True))
+                events.setdefault(end, []).append((sat_id, False))
+        self.boundaries = [0]
+        self.segments = [()]
+        visible = set()
+        for t in sorted(events):
+            for sat_id, connecting in events[t]:
+                if connecting:
+                    visible.add(sat_id)
+                else:
+                    visible.discard(sat_id)
+            if t == self.boundaries[-1]:
+                self.segments[-1] = tuple(sorted(visible))
+            else:
+                self.boundaries.append(t)
+                self.segments.append(tuple(sorted(visible)))
+
+    def at(self, seconds):
+        """時間 seconds 可以連線的衛星（依編號排序）"""
+        t = int(seconds) % DAY_SECONDS
+        return list(self.segments[bisect.bisect_right(self.boundaries, t) - 1])
+
+    def during(self, t0, t1, mode="any"):
+        """[t0, t1] 期間可以連線的衛星；mode 為 "any"（任一秒）或 "all"（整段期間都可以連線），t0 > t1 時跨過午夜"""
+        t0, t1 = int(t0) % DAY_SECONDS, int(t1) % DAY_SECONDS
+        if t0 > t1:
+            first, second = self.during(t0, DAY_SECONDS - 1, mode), self.during(0, t1, mode)
+            if mode == "all":
+                return sorted(set(first) & set(second))
+            return sorted(set(first) | set(second))
+
+        visible = self.segments[bisect.bisect_right(self.boundaries, t0) - 1]
+        if mode == "all":
+            return [sat_id for sat_id in visible if self.coverage_end(sat_id, t0) > t1]
+        first, last = bisect.bisect_right(self.start_times, t0), bisect.bisect_right(self.start_times, t1)
+        return sorted(set(visible).union(self.start_sats[first:last]))
+
+    def coverage_end(self, sat_id, seconds):
+        """衛星在時間 seconds 可以連線時，回傳連線中斷的時間點（當天的秒數，最大為 86400）；不可連線時回傳 None"""
+        t = int(seconds) % DAY_SECONDS
+        starts, ends = self.starts.get(int(sat_id), []), self.ends.get(int(sat_id), [])
+        i = bisect.bisect_right(starts, t) - 1
+        if i >= 0 and ends[i] > t:
+            return ends[i]
+        return None
+
+
+indexes = {}
+
+
+def cover_index(latitude, longitude, output=True):
+    """同一行程中每個地面站只載入一次索引"""
+    key = (float(latitude), float(longitude))
+    if key not in indexes:
+        indexes[key] = CoverIndex(latitude, longitude, output=output)
+    return indexes[key]
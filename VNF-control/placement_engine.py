@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+"""
+placement_engine.py
+VNF Placement 的 NumPy 可行性判斷與評分引擎
+
+把所有候選衛星的 total / used_now 載入成 (衛星數 x 3) 的陣列、
+所有 VNF 的需求載入成 (VNF 數 x 3) 的需求矩陣，
+資源是否足夠、使用率是否超限、以及各方案的權重分數都以陣列運算一次算完。
+"""
+
+import time
+import numpy as np
+
+RESOURCE_KEYS = ("CPU", "Memory_MB", "Disk_GB")   # 陣列第二維的順序
+PARAM_KEYS = ("cpu", "mem", "disk")               # 對應 policy_config 中 weights / limit 的 key
+
+
+def demand_row(vnf):
+    """VNF 需求轉成 [CPU, Memory_MB, Disk_GB]（ns_vnf_config.json 的 memory 單位為 GB）"""
+    return [vnf["cpu"], vnf["memory"] * 1024, vnf["storage"]]
+
+
+class ResourceLedger:
+    """
+    路徑評估時的暫時預留帳本：所有路徑共用同一份唯讀的 base（各衛星 used_now），
+    每條路徑只記錄自己預留的差量 (delta) 與 undo log，不再為每條路徑複製整份資源表。
+    - reserve：在某顆衛星上預留一個 VNF 的需求
+    - checkpoint / rollback：記下 log 長度，失敗或換下一條路徑時 O(預留數) 還原
+    """
+    __slots__ = ("base", "delta", "count", "log")
+
+    def __init__(self, base):
+        self.base = base            # (衛星數 x 3) 唯讀陣列
+        self.delta = {}             # 衛星 index -> 已預留的 [CPU, Memory_MB, Disk_GB]
+        self.count = {}             # 衛星 index -> 預留了幾個 VNF
+        self.log = []               # (衛星 index, 需求列)
+
+    def __len__(self):
+        """目前有預留的衛星數"""
+        return len(self.delta)
+
+    def __contains__(self, sat):
+        return sat in self.delta
+
+    def used(self, sats):
+        """回傳 sats 的 used_now + 已預留量"""
+        used = self.base[sats]
+        if self.delta:
+            used = used.copy()
+            for i, sat in enumerate(sats):
+                reserved = self.delta.get(sat)
+                if reserved is not None:
+                    used[i] += reserved
+        return used
+
+    def reserve(self, sat, demand):
+        reserved = self.delta.get(sat)
+        self.delta[sat] = demand.copy() if reserved is None else reserved + demand
+        self.count[sat] = self.count.get(sat, 0) + 1
+        self.log.append((sat, demand))
+
+    def checkpoint(self):
+        return len(self.log)
+
+    def rollback(self, mark=0):
+        while len(self.log) > mark:
+            sat, demand = self.log.pop()
+            self.count[sat] -= 1
+            if self.count[sat] == 0:
+                del self.delta[sat], self.count[sat]
+            else:
+                self.delta[sat] = self.delta[sat] - demand
+
+
+class PathTrie:
+    """
+    pathlist 的前綴樹：HopCountPath 的候選路徑大多共用前段（例如 [209,210,211,308] 與 [209,210,211,308,405]），
+    每個節點代表一段前綴，greedy / optimal 的搜尋都沿著樹走，共同前綴只處理一次。
+    節點以 list 儲存（root 為 0，不對應任何衛星），terminals[node] 為在此節點結束的路徑編號（重複路徑會有多個）。
+    另外預先算好 optimal 剪枝用的子樹資訊：
+    - below_terminals[node]：在 node 之下（不含 node）結束的路徑編號
+    - below_sats[node]：node 之下出現過的衛星 index
+    - solvable[node][v]：不考慮共用時，第 v 個之後的 VNF 能否放在 node 之下的某條路徑上
+    - min_usage[node]：node 之下的衛星中，每種資源 used_now / total 的最小值（分數下界用）
+    """
+
+    def __init__(self, path_list, engine):
+        self.root = 0
+        self.sat = [engine.unknown]
+        self.sat_id = [None]
+        self.depth = [-1]
+        self.children = [[]]
+        self.terminals = [[]]
+        lookup = {}
+        for path_id, path in enumerate(path_list):
+            node = self.root
+            for sat_id in path:
+                child = lookup.get((node, sat_id))
+                if child is None:
+                    child = len(self.sat)
+                    lookup[(node, sat_id)] = child
+                    self.sat.append(engine.index.get(sat_id, engine.unknown))
+                    self.sat_id.append(sat_id)
+                    self.depth.append(self.depth[node] + 1)
+                    self.children.append([])
+                    self.terminals.append([])
+                    self.children[node].append(child)
+                node = child
+            self.terminals[node].append(path_id)
+
+        # 子節點編號一定比父節點大，由後往前即為 bottom-up
+        n_vnf = len(engine.vnf_list)
+        self.below_terminals = [None] * len(self.sat)
+        self.below_sats = [None] * len(self.sat)
+        self.solvable = [None] * len(self.sat)
+        self.min_usage = [None] * len(self.sat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            usage = np.where(engine.total > 0, engine.used / np.where(engine.total > 0, engine.total, 1), np.inf)
+        here = [None] * len(self.sat)
+        for node in range(len(self.sat) - 1, -1, -1):
+            terminals, sats = [], set()
+            solvable = np.zeros(n_vnf + 1, dtype=bool)
+            solvable[n_vnf] = True
+            min_usage = np.full(3, np.inf)
+            for child in self.children[node]:
+                terminals += self.terminals[child] + self.below_terminals[child].tolist()
+                sats |= self.below_sats[child]
+                sats.add(self.sat[child])
+                solvable |= here[child]
+                min_usage = np.minimum(min_usage, np.minimum(self.min_usage[child], usage[self.sat[child]]))
+            self.below_terminals[node] = np.array(terminals, dtype=np.intp)
+            self.below_sats[node] = sats
+            self.solvable[node] = solvable
+            self.min_usage[node] = min_usage.tolist()
+            # here[node][v]：第 v 個之後的 VNF 能否從 node 開始（含 node）往下放
+            reach = solvable.copy()
+            if node != self.root:
+                for v in range(n_vnf - 1, -1, -1):
+                    reach[v] |= engine.fit[v, self.sat[node]] and reach[v + 1]
+            here[node] = reach
+
+    def subtree_terminals(self, node):
+        """在 node（含）之下結束的所有路徑編號"""
+        return np.concatenate([np.array(self.terminals[node], dtype=np.intp), self.below_terminals[node]])
+
+
+class PlacementEngine:
+    """
+    resources: { sat_id: {"total": {...}, "used_now": {...}, ...} }（query_sat_resources 的回傳值）
+    vnf_list:  NS 中依序要部署的 VNF
+    最後一列為「查無資源」的虛擬衛星（total 全為 0），路徑上查不到資源的衛星都對應到它，永遠不可部署。
+    """
+
+    def __init__(self, resources, vnf_list, weights, limit):
+        self.sat_ids = list(resources)
+        self.index = {sat_id: i for i, sat_id in enumerate(self.sat_ids)}
+        self.unknown = len(self.sat_ids)
+
+        rows = [resources[sat_id] for sat_id in self.sat_ids]
+        self.total = np.array([[r["total"][k] for k in RESOURCE_KEYS] for r in rows] + [[0, 0, 0]], dtype=float)
+        self.used = np.array([[r["used_now"][k] for k in RESOURCE_KEYS] for r in rows] + [[0, 0, 0]], dtype=float)
+        self.used.setflags(write=False)
+        self.ledger = ResourceLedger(self.used)
+        self.block_cache = {}
+        self.mask_cache = {}
+
+        self.vnf_list = vnf_list
+        self.demand = np.array([demand_row(vnf) for vnf in vnf_list], dtype=float).reshape(-1, 3)
+        self.weights = np.array([weights[k] for k in PARAM_KEYS], dtype=float)
+        self.limit = np.array([limit[k] for k in PARAM_KEYS], dtype=float)
+
+        # fit[v, s]：在尚未有任何預留的情況下，衛星 s 能否部署第 v 個 VNF
+        self.fit = self.feasible(self.total, self.used, self.demand[:, None, :])
+
+    def feasible(self, total, used, demand):
+        """
+        可部署條件（與原本 resource_sufficient 相同）：
+        1. 剩餘資源 >= 需求
+        2. 部署後使用率 <= limit（total 為 0 的衛星一律不可部署）
+        total / used 的最後一維為資源種類，可以任意 broadcast
+        """
+        after = used + demand
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(total > 0, after / np.where(total > 0, total, 1), np.inf)
+        return ((total - used >= demand) & (ratio <= self.limit)).all(axis=-1)
+
+    def path_indices(self, path):
+        return np.array([self.index.get(sat_id, self.unknown) for sat_id in path], dtype=np.intp)
+
+    def place_greedy(self, path):
+        """單一路徑的 greedy 部署，回傳 (vnf_to_sat, failed_vnf_name)"""
+        return self.place_greedy_all([path])[0]
+
+    def place_greedy_all(self, path_list):
+        """
+        沿路徑由前往後 first-fit 部署每個 VNF（與原本 VnfPlacement 的三層迴圈結果相同）：
+        - 從上一個 VNF 所在位置開始往後找，優先使用尚未部署過的衛星
+        - 只有當路徑上每顆衛星都已部署過時，才允許與先前的 VNF 共用衛星（此時需扣除已預留的資源）
+        first-fit 只看走過的位置，因此在 PathTrie 上逐個節點推進即可：
+        每個節點最多放下目前這個 VNF，共同前綴只算一次；路徑在某節點結束時再套用共用衛星的規則，
+        所有 VNF 都放完後，整棵子樹上的路徑結果都相同，不必再往下走。
+        回傳與 path_list 同順序的 [(vnf_to_sat, failed_vnf_name)]，全部成功時 failed_vnf_name 為 None
+        """
+        trie = PathTrie(path_list, self)
+        results = [None] * len(path_list)
+        ledger = self.ledger
+        n_vnf = len(self.vnf_list)
+        vnf_to_sat = {}
+
+        def finish(node, v):
+            """路徑在 node 結束：若路徑上每個位置都放了 VNF（衛星皆不同），剩下的 VNF 依序與最後一顆衛星共用"""
+            sat = trie.sat[node]
+            mark = ledger.checkpoint()
+            placed = dict(vnf_to_sat)
+            failed = None
+            if v < n_vnf and len(ledger) == trie.depth[node] + 1:
+                while v < n_vnf and self.feasible(self.total[sat], ledger.used([sat])[0], self.demand[v]):
+                    ledger.reserve(sat, self.demand[v])
+                    placed[self.vnf_list[v]["vnf_name"]] = trie.sat_id[node]
+                    v += 1
+            if v < n_vnf:
+                failed = self.vnf_list[v]["vnf_name"]
+            ledger.rollback(mark)
+            for path_id in trie.terminals[node]:
+                results[path_id] = (dict(placed), failed)
+
+        def walk(node, v):
+            sat = trie.sat[node]
+            mark = ledger.checkpoint()
+            placed_name = None
+            if v < n_vnf and sat not in ledger and self.fit[v, sat]:
+                ledger.reserve(sat, self.demand[v])
+                placed_name = self.vnf_list[v]["vnf_name"]
+                vnf_to_sat[placed_name] = trie.sat_id[node]
+                v += 1
+
+            if v == n_vnf:
+                for path_id in trie.subtree_terminals(node):
+                    results[path_id] = (dict(vnf_to_sat), None)
+            else:
+                if trie.terminals[node]:
+                    finish(node, v)
+                for child in trie.children[node]:
+                    walk(child, v)
+
+            if placed_name is not None:
+                del vnf_to_sat[placed_name]
+            ledger.rollback(mark)
+
+        for path_id in trie.terminals[trie.root]:
+            results[path_id] = ({}, self.vnf_list[0]["vnf_name"] if n_vnf else None)
+        for child in trie.children[trie.root]:
+            walk(child, 0)
+        return results
+
+    def block_ends(self, sat):
+        """ends[v]：衛星 sat 從第 v 個 VNF 開始，最多能連續放到第 ends[v]-1 個（累積需求仍可部署）"""
+        ends = self.block_cache.get(sat)
+        if ends is None:
+            n_vnf = len(self.vnf_list)
+            cumulative = np.vstack([np.zeros(3), np.cumsum(self.demand, axis=0)])
+            block = cumulative[None, :, :] - cumulative[:, None, :]            # block[v, e] = VNF v..e-1 的需求總和
+            ok = self.feasible(self.total[sat], self.used[sat], block) & (np.arange(n_vnf + 1)[None, :] > np.arange(n_vnf + 1)[:, None])
+            ends = [int(np.flatnonzero(ok[v]).max()) if ok[v].any() else v for v in range(n_vnf)]
+            self.block_cache[sat] = ends
+        return ends
+
+    def block_mask(self, sat):
+        """mask[v, e]：衛星 sat 能否放下第 v 到第 e-1 個 VNF（v < e <= ends[v]）"""
+        mask = self.mask_cache.get(sat)
+        if mask is None:
+            n_vnf = len(self.vnf_list)
+            ends = np.array(self.block_ends(sat) + [n_vnf])
+            steps = np.arange(n_vnf + 1)
+            mask = (steps[None, :] > steps[:, None]) & (steps[None, :] <= ends[:, None])
+            self.mask_cache[sat] = mask
+        return mask
+
+    def cheapest_blocks(self, sats, cost):
+        """
+        DP，狀態為 (路徑位置, 已部署的 VNF 數 v)：sats 為路徑上各位置的衛星 index，cost 為每顆衛星的成本，
+        回傳保留 VNF 順序下「用上衛星的成本總和」最小的位置 list，無可行解時回傳 None。
+        每個位置 O(VNF 數²)；同一顆衛星在路徑上重複出現時只使用第一次
+        """
+        n_vnf = len(self.vnf_list)
+        steps = np.arange(n_vnf + 1)
+        best = np.full(n_vnf + 1, np.inf)
+        best[0] = 0.0
+        parents = []
+        seen = set()
+        for sat in sats:
+            if sat in seen or sat == self.unknown:
+                parents.append(None)
+                continue
+            seen.add(sat)
+            # step[v, e]：在這顆衛星放入第 v 到第 e-1 個 VNF 後的成本
+            step = np.where(self.block_mask(sat), best[:, None] + cost[sat], np.inf)
+            source = step.argmin(axis=0)
+            reached = step[source, steps]
+            use = reached < best
+            parents.append(np.where(use, source, -1))
+            best = np.where(use, reached, best)
+        if not np.isfinite(best[n_vnf]):
+            return None
+        positions, v = [], n_vnf
+        for q in range(len(sats) - 1, -1, -1):
+            if parents[q] is not None and parents[q][v] >= 0:
+                positions.append(q)
+                v = parents[q][v]
+        return positions[::-1]
+
+    def plan_usage(self, sats, positions):
+        """選定位置的 (各資源使用率 (需求總量 + Σused_now) / Σtotal, Σtotal)"""
+        chosen = sats[positions]
+        sum_total = self.total[chosen].sum(axis=0)
+        return (self.demand.sum(axis=0) + self.used[chosen].sum(axis=0)) / sum_total, sum_total
+
+    def descend(self, sats, positions):
+        """
+        從可行解 positions 出發，把權重分數在目前解的位置線性化成每顆衛星的成本：
+            cost_s = Σ_d weights_d / Σtotal_d × (used_s,d - ratio_d × total_s,d)
+        以 cheapest_blocks 求出新的位置，分數下降就繼續（只有一種資源時即為 Dinkelbach 法，收斂到最佳解）。
+        回傳 (positions, score)
+        """
+        ratio, sum_total = self.plan_usage(sats, positions)
+        score = float(ratio @ self.weights)
+        for _ in range(32):
+            cost = (self.weights / sum_total * (self.used - ratio * self.total)).sum(axis=1)
+            candidate = self.cheapest_blocks(sats, cost)
+            new_ratio, new_total = self.plan_usage(sats, candidate)
+            new_score = float(new_ratio @ self.weights)
+            if new_score >= score - 1e-12:
+                break
+            positions, ratio, sum_total, score = candidate, new_ratio, new_total, new_score
+        return positions, score
+
+    def score_bound(self, sats, positions):
+        """
+        分數下界：每種資源各自以 Dinkelbach 法求出可行解中的最低使用率，再加權相加。
+        路徑上可部署的衛星規格（total）都相同時，分數為 (常數 + Σ每顆衛星的成本) / 衛星數，
+        descend 即為 Dinkelbach 法，收斂的解就是最佳解，直接回傳 positions 的分數
+        """
+        ratio = self.plan_usage(sats, positions)[0]
+        valid = sats[self.total[sats, 0] > 0]
+        if (self.total[valid] == self.total[valid[0]]).all():
+            return float(ratio @ self.weights)
+        bound = 0.0
+        for d, w in enumerate(self.weights):
+            best = ratio[d]
+            for _ in range(32):
+                candidate = self.cheapest_blocks(sats, self.used[:, d] - best * self.total[:, d])
+                new_ratio = self.plan_usage(sats, candidate)[0][d]
+                if new_ratio >= best - 1e-12:
+                    break
+                best = new_ratio
+            bound += w * best
+        return bound
+
+    def place_optimal(self, path, time_budget=None, max_labels=None):
+        """單一路徑的最佳部署，回傳 (vnf_to_sat, failed_vnf_name, optimal)"""
+        return self.place_optimal_all([path], time_budget, max_labels)[0]
+
+    def place_optimal_all(self, path_list, time_budget=None, max_labels=None):
+        """
+        在每條路徑上找出權重分數最低的部署方式（保留 VNF 順序：VNF 依序分成連續的區段，
+        每段部署在一顆衛星上，衛星順序與路徑順序相同；同一顆衛星上的多個 VNF 需一起扣除資源）。
+        分數只取決於「用上哪些衛星」的 Σused_now / Σtotal：
+        1. 每條路徑從 greedy 的結果（greedy 失敗時取 used_now / total 最低的可行解）出發，以 descend 反覆求解
+           (路徑位置, 已部署 VNF 數) 的 DP，得到目前最佳解；每次 DP 為 O(路徑長度 × VNF 數²)
+        2. score_bound 為分數下界，目前最佳解已達下界的路徑即為最佳解
+        3. 其餘路徑在 PathTrie 上做同樣狀態的 DP，共同前綴只計算一次：每個 (節點, v) 狀態保留互不支配的部分解
+           (Σused 較小且 Σtotal 較大者較佳)，每種資源的使用率不低於 min(目前的使用率, 子樹中衛星 used_now / total
+           的最小值)，加權後不小於子樹中尚未確定路徑的目前最佳解即捨棄；每個狀態最多保留 max_labels 個部分解
+        time_budget（秒）為整個搜尋的時間上限，用完時回傳目前找到的最佳解。
+        回傳與 path_list 同順序的 [(vnf_to_sat, failed_vnf_name, optimal)]，
+        optimal 表示已確定為最佳解（達到下界，或第 3 步在時間內完成且沒有因 max_labels 捨棄部分解）
+        """
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        n_vnf = len(self.vnf_list)
+        if n_vnf == 0:
+            return [({}, None, True) for _ in path_list]
+
+        def out_of_time():
+            return deadline is not None and time.perf_counter() > deadline
+
+        best_score = np.full(len(path_list), np.inf)
+        best_chosen = [None] * len(path_list)
+        settled = np.zeros(len(path_list), dtype=bool)
+        greedy = self.place_greedy_all(path_list)
+        for path_id, (greedy_map, greedy_failed) in enumerate(greedy):
+            if greedy_failed is None:
+                path = path_list[path_id]
+                best_chosen[path_id] = sorted({path.index(sat_id) for sat_id in greedy_map.values()})
+                ratio = self.plan_usage(self.path_indices(path), best_chosen[path_id])[0]
+                best_score[path_id] = float(ratio @ self.weights)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            load = np.where(self.total > 0, self.used / np.where(self.total > 0, self.total, 1), 0.0) @ self.weights
+        same_path = {}
+        for path_id, path in enumerate(path_list):
+            same_path.setdefault(tuple(path), []).append(path_id)
+        for path, path_ids in same_path.items():
+            if out_of_time():
+                break
+            sats = self.path_indices(path)
+            positions = best_chosen[path_ids[0]]
+            if positions is None:
+                positions = self.cheapest_blocks(sats, load)
+                if positions is None:
+                    settled[path_ids] = True
+                    continue
+            positions, score = self.descend(sats, positions)
+            best_score[path_ids] = score
+            for other in path_ids:
+                best_chosen[other] = positions
+            settled[path_ids] = score <= self.score_bound(sats, positions) + 1e-12
+
+        if settled.all():
+            return [self.finish_plan(path, best_chosen[path_id], greedy[path_id][1], True)
+                    for path_id, path in enumerate(path_list)]
+
+        trie = PathTrie(path_list, self)
+        total = self.total.tolist()
+        used = self.used.tolist()
+        need = self.demand.sum(axis=0).tolist()
+        weights = self.weights.tolist()
+        # 剪枝門檻：已確定為最佳解的路徑不再需要搜尋
+        target = np.where(settled, -np.inf, best_score)
+        state = {"timed_out": False, "truncated": False}
+
+        def score_of(sum_used, sum_total):
+            return sum(w * (need[d] + sum_used[d]) / sum_total[d] for d, w in enumerate(weights))
+
+        def keep(node, v, labels):
+            """保留 (node, v) 狀態下可能成為最佳解、且不被其他部分解支配的部分解"""
+            min_usage = trie.min_usage[node]
+            incumbent = target[trie.below_terminals[node]].max()
+            ranked = []
+            if out_of_time():
+                state["timed_out"] = True
+                return ranked
+            for label in labels:
+                sum_used, sum_total = label[0], label[1]
+                bound = sum(w * min((need[d] + sum_used[d]) / sum_total[d] if sum_total[d] > 0 else np.inf, min_usage[d])
+                            for d, w in enumerate(weights))
+                if bound < incumbent - 1e-12:
+                    ranked.append((score_of(sum_used, sum_total) if v else 0.0, label))
+            ranked.sort(key=lambda item: item[0])
+            below = trie.below_sats[node]
+            kept = []
+            for _, label in ranked:
+                sum_used, sum_total, sats = label[0], label[1], label[2]
+                if any(all(other[0][d] <= sum_used[d] and other[1][d] >= sum_total[d] for d in range(3))
+                       and (other[2] & below) <= sats for other in kept):
+                    continue
+                if max_labels is not None and len(kept) >= max_labels:
+                    state["truncated"] = True
+                    break
+                kept.append(label)
+            return kept
+
+        def search(node, labels):
+            """labels[v]：在 node（含）之前剛好放完前 v 個 VNF 的部分解 (Σused, Σtotal, 衛星集合, 路徑位置)"""
+            for child in trie.children[node]:
+                if out_of_time():
+                    state["timed_out"] = True
+                if state["timed_out"]:
+                    return
+                sat = trie.sat[child]
+                ends = self.block_ends(sat)
+                solvable = trie.solvable[child]
+                candidates = [list(labels[v]) if solvable[v] else [] for v in range(n_vnf)]
+                for v in range(n_vnf):
+                    if ends[v] <= v:
+                        continue
+                    for sum_used, sum_total, sats, positions in labels[v]:
+                        if sat in sats:
+                            continue
+                        new_used = tuple(sum_used[d] + used[sat][d] for d in range(3))
+                        new_total = tuple(sum_total[d] + total[sat][d] for d in range(3))
+                        new_positions = positions + (trie.depth[child],)
+                        if ends[v] == n_vnf:
+                            score = score_of(new_used, new_total)
+                            path_ids = trie.subtree_terminals(child)
+                            better = path_ids[best_score[path_ids] > score + 1e-12]
+                            best_score[better] = score
+                            target[better[~settled[better]]] = score
+                            for path_id in better:
+                                best_chosen[path_id] = list(new_positions)
+                        for e in range(v + 1, min(ends[v], n_vnf - 1) + 1):
+                            if solvable[e]:
+                                candidates[e].append((new_used, new_total, sats | {sat}, new_positions))
+                if trie.children[child]:
+                    search(child, [keep(child, v, candidates[v]) if candidates[v] else [] for v in range(n_vnf)])
+
+        empty = [((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), frozenset(), ())]
+        search(trie.root, [empty] + [[] for _ in range(n_vnf - 1)])
+        searched = not state["timed_out"] and not state["truncated"]
+        return [self.finish_plan(path, best_chosen[path_id], greedy[path_id][1], bool(settled[path_id]) or searched)
+                for path_id, path in enumerate(path_list)]
+
+    def finish_plan(self, path, chosen, greedy_failed, optimal):
+        """選定位置轉成 (vnf_to_sat, failed_vnf_name, optimal)；沒有可行解時沿用 greedy 失敗的 VNF"""
+        if chosen is None:
+            return {}, greedy_failed, optimal
+        return self.assign_blocks(path, chosen), None, optimal
+
+    def assign_blocks(self, path, chosen):
+        """依選定的衛星位置（皆需至少部署一個 VNF），由後往前回推每個 VNF 的所在衛星"""
+        n_vnf = len(self.vnf_list)
+        ends = [self.block_ends(self.index[path[q]]) for q in chosen]
+        # can[j] = 前 j 顆選定衛星能剛好放完的 v 集合
+        can = [{0}]
+        for max_end in ends:
+            can.append({e for v in can[-1] if v < n_vnf for e in range(v + 1, max_end[v] + 1)})
+        vnf_to_sat = {}
+        end = n_vnf
+        for j in range(len(chosen), 0, -1):
+            max_end = ends[j - 1]
+            start = min(v for v in can[j - 1] if v < end and max_end[v] >= end)
+            for v in range(start, end):
+                vnf_to_sat[self.vnf_list[v]["vnf_name"]] = path[chosen[j - 1]]
+            end = start
+        return {vnf["vnf_name"]: vnf_to_sat[vnf["vnf_name"]] for vnf in self.vnf_list}
+
+    def total_resource_used(self):
+        cpu, mem, disk = self.demand.sum(axis=0)
+        return {"cpu": int(cpu), "mem": int(mem), "disk": int(disk)}
+
+    def score_plans(self, plans):
+        """
+        一次計算所有方案的使用率與權重分數（只計算方案真正用上的衛星）：
+            ratio = (方案需求總量 + 用上衛星的 used_now 總和) / 用上衛星的 total 總和
+            score = ratio · weights（分數越低越好）
+        回傳 (scores, ratios)，ratios 為 (方案數 x 3) 的 cpu / mem / disk 使用率
+        """
+        mask = np.zeros((len(plans), len(self.total)), dtype=float)
+        for p, plan in enumerate(plans):
+            mask[p, self.path_indices(set(plan["vnf_to_sat"].values()))] = 1.0
+
+        total = mask @ self.total
+        used_now = mask @ self.used
+        plan_used = np.array([[plan["total_resource_used"][k] for k in PARAM_KEYS] for plan in plans], dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.where(total > 0, (plan_used + used_now) / np.where(total > 0, total, 1), 0.0)
+        return ratios @ self.weights, ratios
@@ -20,7 +20,55 @@ PLACEMENT_PARAMS = {
         "cpu": 0.9,     # CPU 最高只能使用 90%
         "mem": 0.9,
         "disk": 0.9
-    }
+    },
+    # 每條路徑上的部署演算法："greedy" = 依序放在第一顆可用的衛星；
+    # "optimal" = 保留 VNF 順序下以 DP（路徑位置 × 已部署 VNF 數）搜尋權重分數最低的部署方式
+    "solver": "greedy",
+    "time_budget": 2.0,  # optimal 搜尋所有路徑的時間上限（秒），超過則採用目前找到的最佳解
+    "max_labels": 8,     # optimal 每個 DP 狀態最多保留幾個部分解（None 則不限制，保證最佳解但計算量可能很大）
+    # 只把 VNF 放在繞路不超過幾跳的衛星上（經過該衛星比兩地面站之間的最短路徑多走的 hop 數，查路由表；None 則不限制）
+    "max_detour_hops": None
+}
+
+# ===================== 路徑延遲相關參數 =====================
+
+ROUTING_PARAMS = {
+    # 路徑排序依據："hop" = hop 數；"latency" = 端到端延遲（ISL 距離 / 光速 + 每一跳的處理延遲）
+    # latency 模式下 ISL 距離每個 frame 都會改變，IncrementalTopology 無法重用上一輪的路徑，每輪都會重新計算
+    "metric": "hop",
+    "hop_delay_ms": 1.0,     # 每經過一條 link 的處理 / 轉送延遲 (ms)
+    "max_latency_ms": None   # 端到端延遲上限 (SLA)，超過的部署 / 遷移方案會被排除（None 則不限制）
+}
+
+# ===================== 資源查詢相關參數 =====================
+
+RESOURCE_PARAMS = {
+    "max_workers": 8,        # 同時查詢資源的最大執行緒數（每個執行緒一次 ssh）
+    "timeout": 30,           # 每次 ssh 查詢的逾時秒數
+    "latency_report_top": 5, # 查詢完成後列出最慢的幾台主機（0 則不列出）
+    "cache_ttl": 30          # 共用資源快取的有效秒數（None 則不使用快取，每次都重新查詢）
+}
+
+# ===================== 衛星模擬器 (sattrack) 相關參數 =====================
+
+SATTRACK_PARAMS = {
+    "hop_path_cache_entries": 256,  # printStationHopcountPath 結果的磁碟快取最多保留幾筆（LRU 淘汰）
+    "time_bucket": 60,              # 指定時間查詢路徑時，時間以幾秒為一桶量化（同一桶共用同一份結果）
+    "max_parallel": 4,              # 同時執行幾個 ./sattrack（每個查詢各自有暫存工作目錄，互不覆寫）
+    "use_server": True,             # 查詢拓樸 / 可見衛星 / 候選路徑時使用常駐模擬器（./sattrack --serve），不必每次重新啟動
+    "use_propagator": True,         # 星群拓樸 / 可見衛星改在行程內以 NumPy 計算（propagator.py），不必查詢模擬器
+    "propagator_batch": 262144      # NumPy 一次計算的（時間點 × 衛星數）上限，星群越大每批的時間點越少
+}
+
+# ===================== 星群拓樸封存檔 (topology_store) 相關參數 =====================
+
+TOPOLOGY_PARAMS = {
+    "use_archive": True,   # Migration 是否從預先建立的拓樸封存檔讀取每輪的星群拓樸（False 則每次執行 sattrack）
+    "step": 6,             # 封存檔每幾秒取樣一個時間點（1 = 一天 86400 個時間點，建立時間較長）
+    "build_chunk": 1800,   # 建立封存檔時，每次執行 sattrack 計算幾個時間點
+    "use_cover_index": True,  # 地面站的可見衛星是否查詢預先建立的區間索引（False 則每次執行 sattrack printStationCoverSats）
+    "routing_cache_mb": 256,  # 行程內保留的 all-pairs 路由表（hop 數 / next-hop，int16）總大小上限 (MB)
+    "routing_disk_mb": 2048   # 封存檔 routing/ 目錄中路由表檔案的總大小上限 (MB)，超過時刪除最久沒用到的
 }
 
 # ===================== Migration 相關參數 =====================
@@ -29,7 +77,14 @@ MIGRATION_PARAMS = {
     "rounds": 100,        # 模擬輪數
     "round_length": 6,    # 每輪相隔秒數
     "k_paths": 5,         # 每輪最多取幾條 simple paths
+    "multi_endpoint_search": True,  # 起訖點擴展為 cover sats 時，一次搜尋所有組合的全域前 k 短路徑（False = 每個組合各取 k 條）
     "output_round": True,  # 是否每輪印 log
+    "workers": 0,         # 平行計算各輪的 process 數（0 = CPU 核心數，1 = 在主行程依序計算）
+    "stop_when_empty": True,  # 共同節點已為空時提早結束，不再計算之後的輪次
+    "stable_rounds": 0,   # 共同節點連續幾輪沒有改變就提早結束（0 = 不提早結束，計算完所有輪次）
+    # 候選節點改為查路由表：繞路不超過幾跳的衛星（經過它比起訖點之間的最短路徑多走的 hop 數），
+    # 每個候選節點以經過它的最短路徑估計延遲；None 則使用前 k 短路徑上的節點
+    "max_detour_hops": None,
     # 使用者自訂資源權重（總和建議 = 1.0）
     # 若只想看 CPU，就設 cpu=1.0, mem=0.0, disk=0.0
     "weights": {
@@ -44,3 +99,13 @@ MIGRATION_PARAMS = {
         "disk": 0.9
     }
 }
+
+# ===================== 自動遷移控制器 (MigrationController) 相關參數 =====================
+
+CONTROLLER_PARAMS = {
+    "lead_time": 120,       # 預測的斷線時間前幾秒開始計算遷移決策並執行遷移
+    "horizon": 1800,        # 每次預測往後看幾秒的拓樸（依 TOPOLOGY_PARAMS["step"] 取樣）
+    "poll_interval": 10,    # 最長每隔幾秒檢查一次 ns_vnf_config.json 是否變動
+    "retry_interval": 60,   # 遷移失敗或找不到遷移目標時，幾秒後重新預測
+    "dry_run": False        # True 則只印出遷移決策，不呼叫 Operating_Manager 執行遷移
+}
@@ -0,0 +1,633 @@
+# -*- coding: utf-8 -*-
+"""
+propagator.py
+以 NumPy 向量化計算的星群傳播與連線判斷（不必執行 ./sattrack）
+
+讀取 sattrack 目錄中的 TLE_*Sats.txt 與 parameter_example.txt，一次計算「所有衛星 × 一串時間點」：
+- propagate：與 libsgp4 相同的 near-earth SGP4（Kepler 方程、短週期修正），得到 ECI 位置 / 速度
+- look_angles：與 Observer::GetLookAngle 相同的 AER（觀測者為衛星時沿用 satellite::getAER 的方位角校正）
+- link_state：跨軌道 (右方) ISL 依 acceptableAzimuthDif / acceptableElevationDif / acceptableRange
+  雙向判斷、PAT_time 內每一秒都要可連線；同軌道 (前方) link 一定存在；closeLink 檔中的 link 關閉。
+  距離與 sattrack 相同取整數 km
+- state_series：依時間順序 yield (time, u, v, distance)，u / v 為 sat_ids 的 index（每條 link 一次），
+  與 printConstellationStateSeries / 常駐模擬器的 state 結果相同
+- cover_sats：地面站可見衛星（groundStationAcceptableElevation / groundStationAcceptableDistance / round），
+  與 printStationCoverSats 相同
+只支援 near-earth 模型（週期 < 225 分鐘，LEO 星群皆是），所有衛星的 TLE epoch 必須相同。
+"""
+
+import os
+import re
+from datetime import date
+
+import numpy as np
+
+import sattrack_runner
+from policy_config import SATTRACK_PARAMS
+
+# ---------- libsgp4 Globals.h 的常數 ----------
+kAE = 1.0
+kMU = 398600.8
+kXKMPER = 6378.135
+kXJ2 = 1.082616e-3
+kXJ3 = -2.53881e-6
+kXJ4 = -1.65597e-6
+kXKE = 60.0 / np.sqrt(kXKMPER * kXKMPER * kXKMPER / kMU)
+kCK2 = 0.5 * kXJ2 * kAE * kAE
+kCK4 = -0.375 * kXJ4 * kAE * kAE * kAE * kAE
+kQOMS2T = ((120.0 - 78.0) / kXKMPER) ** 4.0
+kS = kAE * (1.0 + 78.0 / kXKMPER)
+kTWOPI = 2.0 * np.pi
+kTWOTHIRD = 2.0 / 3.0
+kF = 1.0 / 298.26
+kOMEGA_E = 1.00273790934
+kA3OVK2 = -kXJ3 / kCK2 * kAE * kAE * kAE
+TICKS_PER_DAY = 86400000000
+
+# 各星群的鄰居規則（satellite::satellite 建構子）：
+# (軌道數, 每軌衛星數, 右方衛星的編號位移, 最後一個軌道連回第一個軌道時的編號位移)
+CONSTELLATIONS = {
+    "TLE_7P_16Sats.txt": (7, 16, 2, 0),
+    "TLE_6P_22Sats.txt": (6, 22, 3, 2),
+    "TLE_6P_44Sats.txt": (6, 44, 7, 6),
+    "TLE_8P_33Sats.txt": (8, 33, 4, 3),
+    "TLE_12P_22Sats.txt": (12, 22, 2, 1),
+}
+SATELLITE_PATTERN = re.compile(r'Satellite_\d+_(\d+)')
+
+YELLOW = '\033[93m'
+NC = '\033[0m'  # No Color
+
+
+def read_tle_file(path):
+    """
+    回傳 {satId: (line1, line2)}。衛星編號取自檔案開頭的名稱列表（Sat_800km_29Deg101_SGP4，第 15~17 字元）
+    或每組 TLE 前的 Satellite_644_101 標題，與 getFileData::getSatellitesTable 相同依檔案中的順序對應
+    """
+    with open(path, 'r') as f:
+        lines = [line.rstrip('\r\n') for line in f]
+    tles = [(lines[i], lines[i + 1]) for i in range(len(lines) - 1)
+            if lines[i].startswith('1 ') and lines[i + 1].startswith('2 ')]
+    titles = [int(match.group(1)) for match in map(SATELLITE_PATTERN.search, lines) if match]
+    if not titles:
+        titles = [int(line[15:18]) for line in lines[:len(tles)]]
+    if len(titles) != len(tles):
+        raise ValueError(f"{path}: 衛星編號 {len(titles)} 個與 TLE {len(tles)} 組數量不符")
+    return dict(zip(titles, tles))
+
+
+def read_close_links(path):
+    """與 getFileData::getCloseLinkTable 相同：只讀 '(' 開頭的行，每行一條關閉的 link (satId1, satId2)"""
+    links = set()
+    if not os.path.exists(path):
+        return links
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.startswith('('):
+                continue
+            a, b = line[1:line.find(')')].split(',')[:2]
+            links.add(frozenset((int(a), int(b))))
+    return links
+
+
+def parse_exponential(field):
+    """TLE 的指數欄位（例如 -36767-4 = -0.36767e-4）"""
+    field = field.strip()
+    sign = -1.0 if field.startswith('-') else 1.0
+    mantissa = field.lstrip('+-')
+    return sign * float("0." + mantissa[:-2]) * 10.0 ** int(mantissa[-2:])
+
+
+def epoch_ticks(line1):
+    """TLE epoch 換成 libsgp4 DateTime 的 ticks（西元 1 年起的微秒數）"""
+    year = int(line1[18:20])
+    year += 2000 if year < 57 else 1900
+    return date_ticks(year, float(line1[20:32]))
+
+
+def date_ticks(year, doy):
+    """year 年第 doy 天（1.0 為 1 月 1 日 0 時）的 ticks"""
+    days = (date(year, 1, 1) - date(1, 1, 1)).days + doy - 1.0
+    return int(days * TICKS_PER_DAY)
+
+
+class Elements:
+    """所有衛星的 SGP4 平均根數與 SGP4::Initialise 算出的常數（每個欄位都是長度 N 的陣列）"""
+
+    def __init__(self, inclination, ascending_node, eccentricity, argument_perigee, mean_anomaly, mean_motion, bstar, epoch):
+        """角度為弧度、mean_motion 為 TLE 的平均運動（弧度 / 分鐘），epoch 為所有衛星共同的 ticks"""
+        self.inclination = np.asarray(inclination, dtype=float)
+        self.ascending_node = np.asarray(ascending_node, dtype=float)
+        self.eccentricity = np.asarray(eccentricity, dtype=float)
+        self.argument_perigee = np.asarray(argument_perigee, dtype=float)
+        self.mean_anomaly = np.asarray(mean_anomaly, dtype=float)
+        mean_motion = np.asarray(mean_motion, dtype=float)
+        self.bstar = np.asarray(bstar, dtype=float)
+        self.epoch_ticks = int(epoch)
+
+        # OrbitalElements：recover original mean motion / semimajor axis
+        e, cosio = self.eccentricity, np.cos(self.inclination)
+        a1 = (kXKE / mean_motion) ** kTWOTHIRD
+        theta2 = cosio * cosio
+        x3thm1 = 3.0 * theta2 - 1.0
+        eosq = e * e
+        betao2 = 1.0 - eosq
+        betao = np.sqrt(betao2)
+        temp = (1.5 * kCK2) * x3thm1 / (betao * betao2)
+        del1 = temp / (a1 * a1)
+        a0 = a1 * (1.0 - del1 * (1.0 / 3.0 + del1 * (1.0 + del1 * 134.0 / 81.0)))
+        del0 = temp / (a0 * a0)
+        self.mean_motion = mean_motion / (1.0 + del0)
+        self.semi_major_axis = a0 / (1.0 - del0)
+        perigee = (self.semi_major_axis * (1.0 - e) - kAE) * kXKMPER
+        if np.any(kTWOPI / self.mean_motion >= 225.0):
+            raise ValueError("不支援週期 >= 225 分鐘的 deep-space 衛星")
+        self.simple_model = perigee < 220.0
+
+        # RecomputeConstants
+        sinio = np.sin(self.inclination)
+        self.sinio, self.cosio = sinio, cosio
+        self.x3thm1 = x3thm1
+        self.x1mth2 = 1.0 - theta2
+        self.x7thm1 = 7.0 * theta2 - 1.0
+        self.xlcof = 0.125 * kA3OVK2 * sinio * (3.0 + 5.0 * cosio) / np.where(np.abs(cosio + 1.0) > 1.5e-12, 1.0 + cosio, 1.5e-12)
+        self.aycof = 0.25 * kA3OVK2 * sinio
+
+        # SGP4::Initialise（near-earth）
+        s4 = np.full_like(perigee, kS)
+        qoms24 = np.full_like(perigee, kQOMS2T)
+        low = perigee < 156.0
+        if np.any(low):
+            s4_low = np.where(perigee < 98.0, 20.0, perigee - 78.0)
+            qoms24 = np.where(low, ((120.0 - s4_low) * kAE / kXKMPER) ** 4.0, qoms24)
+            s4 = np.where(low, s4_low / kXKMPER + kAE, s4)
+
+        a = self.semi_major_axis
+        n = self.mean_motion
+        pinvsq = 1.0 / (a * a * betao2 * betao2)
+        tsi = 1.0 / (a - s4)
+        self.eta = a * e * tsi
+        etasq = self.eta * self.eta
+        eeta = e * self.eta
+        psisq = np.abs(1.0 - etasq)
+        coef = qoms24 * tsi ** 4.0
+        coef1 = coef / psisq ** 3.5
+        c2 = coef1 * n * (a * (1.0 + 1.5 * etasq + eeta * (4.0 + etasq))
+                          + 0.75 * kCK2 * tsi / psisq * x3thm1 * (8.0 + 3.0 * etasq * (8.0 + etasq)))
+        self.c1 = self.bstar * c2
+        self.c4 = 2.0 * n * coef1 * a * betao2 * (
+            self.eta * (2.0 + 0.5 * etasq) + e * (0.5 + 2.0 * etasq)
+            - 2.0 * kCK2 * tsi / (a * psisq)
+            * (-3.0 * x3thm1 * (1.0 - 2.0 * eeta + etasq * (1.5 - 0.5 * eeta))
+               + 0.75 * self.x1mth2 * (2.0 * etasq - eeta * (1.0 + etasq)) * np.cos(2.0 * self.argument_perigee)))
+        theta4 = theta2 * theta2
+        temp1 = 3.0 * kCK2 * pinvsq * n
+        temp2 = temp1 * kCK2 * pinvsq
+        temp3 = 1.25 * kCK4 * pinvsq * pinvsq * n
+        self.xmdot = n + 0.5 * temp1 * betao * x3thm1 + 0.0625 * temp2 * betao * (13.0 - 78.0 * theta2 + 137.0 * theta4)
+        x1m5th = 1.0 - 5.0 * theta2
+        self.omgdot = -0.5 * temp1 * x1m5th + 0.0625 * temp2 * (7.0 - 114.0 * theta2 + 395.0 * theta4) + temp3 * (3.0 - 36.0 * theta2 + 49.0 * theta4)
+        xhdot1 = -temp1 * cosio
+        self.xnodot = xhdot1 + (0.5 * temp2 * (4.0 - 19.0 * theta2) + 2.0 * temp3 * (3.0 - 7.0 * theta2)) * cosio
+        self.xnodcf = 3.5 * betao2 * xhdot1 * self.c1
+        self.t2cof = 1.5 * self.c1
+
+        eccentric = e > 1.0e-4
+        c3 = np.where(eccentric, coef * tsi * kA3OVK2 * n * kAE * sinio / np.where(eccentric, e, 1.0), 0.0)
+        self.c5 = 2.0 * coef1 * a * betao2 * (1.0 + 2.75 * (etasq + eeta) + eeta * etasq)
+        self.omgcof = self.bstar * c3 * np.cos(self.argument_perigee)
+        self.xmcof = np.where(eccentric, -kTWOTHIRD * coef * self.bstar * kAE / np.where(eccentric, eeta, 1.0), 0.0)
+        self.delmo = (1.0 + self.eta * np.cos(self.mean_anomaly)) ** 3.0
+        self.sinmo = np.sin(self.mean_anomaly)
+
+        c1sq = self.c1 * self.c1
+        self.d2 = 4.0 * a * tsi * c1sq
+        temp = self.d2 * tsi * self.c1 / 3.0
+        self.d3 = (17.0 * a + s4) * temp
+        self.d4 = 0.5 * temp * a * tsi * (221.0 * a + 31.0 * s4) * self.c1
+        self.t3cof = self.d2 + 2.0 * c1sq
+        self.t4cof = 0.25 * (3.0 * self.d3 + self.c1 * (12.0 * self.d2 + 10.0 * c1sq))
+        self.t5cof = 0.2 * (3.0 * self.d4 + 12.0 * self.c1 * self.d3 + 6.0 * self.d2 * self.d2 + 15.0 * c1sq * (2.0 * self.d2 + c1sq))
+        # simple model 只保留到 t2cof 的項
+        for name in ("omgcof", "xmcof", "d2", "d3", "d4", "t3cof", "t4cof", "t5cof", "c5"):
+            setattr(self, name, np.where(self.simple_model, 0.0, getattr(self, name)))
+
+    @classmethod
+    def from_tles(cls, tles):
+        """tles 為 [(line1, line2)]"""
+        line1 = [tle[0] for tle in tles]
+        line2 = [tle[1] for tle in tles]
+        deg = np.pi / 180.0
+        epochs = {epoch_ticks(l) for l in line1}
+        if len(epochs) != 1:
+            raise ValueError("所有衛星的 TLE epoch 必須相同")
+        return cls(np.array([float(l[8:16]) for l in line2]) * deg,
+                   np.array([float(l[17:25]) for l in line2]) * deg,
+                   np.array([float("0." + l[26:33]) for l in line2]),
+                   np.array([float(l[34:42]) for l in line2]) * deg,
+                   np.array([float(l[43:51]) for l in line2]) * deg,
+                   np.array([float(l[52:63]) for l in line2]) * kTWOPI / 1440.0,
+                   np.array([parse_exponential(l[53:61]) for l in line1]),
+                   epochs.pop())
+
+    @classmethod
+    def walker(cls, planes, per_plane, altitude, inclination, epoch):
+        """
+        Walker-star 星群（相位因子 0）：planes 個軌道面的升交點在 360 度內等間隔、每個軌道面 per_plane 顆衛星等間隔，
+        近圓軌道、無大氣阻力；altitude 為 km、inclination 為度
+        """
+        count = planes * per_plane
+        plane = np.repeat(np.arange(planes), per_plane)
+        slot = np.tile(np.arange(per_plane), planes)
+        semi_major_axis = (kXKMPER + altitude) / kXKMPER
+        mean_motion = kXKE / semi_major_axis ** 1.5
+        return cls(np.full(count, np.radians(inclination)), kTWOPI * plane / planes, np.full(count, 1e-4),
+                   np.zeros(count), kTWOPI * slot / per_plane, np.full(count, mean_motion), np.zeros(count), epoch)
+
+    def propagate(self, tsince):
+        """
+        SGP4::FindPositionSGP4 + CalculateFinalPositionVelocity。
+        tsince 為距 epoch 的分鐘數 (T,)，回傳 ECI 位置 (T, N, 3) km 與速度 (T, N, 3) km/s
+        """
+        t = np.asarray(tsince, dtype=np.float64)[:, None]
+        e0 = self.eccentricity
+        xmdf = self.mean_anomaly + self.xmdot * t
+        omgadf = self.argument_perigee + self.omgdot * t
+        xnoddf = self.ascending_node + self.xnodot * t
+        tsq = t * t
+        xnode = xnoddf + self.xnodcf * tsq
+        tempa = 1.0 - self.c1 * t
+        tempe = self.bstar * self.c4 * t
+        templ = self.t2cof * tsq
+
+        delomg = self.omgcof * t
+        delm = self.xmcof * ((1.0 + self.eta * np.cos(xmdf)) ** 3.0 - self.delmo)
+        temp = delomg + delm
+        xmp = xmdf + temp
+        omega = omgadf - temp
+        tcube = tsq * t
+        tfour = t * tcube
+        tempa = tempa - self.d2 * tsq - self.d3 * tcube - self.d4 * tfour
+        tempe = tempe + self.bstar * self.c5 * np.where(self.simple_model, 0.0, np.sin(xmp) - self.sinmo)
+        templ = templ + self.t3cof * tcube + tfour * (self.t4cof + t * self.t5cof)
+
+        a = self.semi_major_axis * tempa * tempa
+        e = np.clip(e0 - tempe, 1.0e-6, 1.0 - 1.0e-6)
+        xl = xmp + omega + xnode + self.mean_motion * templ
+
+        # long period periodics
+        beta2 = 1.0 - e * e
+        xn = kXKE / a ** 1.5
+        axn = e * np.cos(omega)
+        temp11 = 1.0 / (a * beta2)
+        xll = temp11 * self.xlcof * axn
+        aynl = temp11 * self.aycof
+        xlt = xl + xll
+        ayn = e * np.sin(omega) + aynl
+        elsq = axn * axn + ayn * ayn
+
+        # Kepler 方程（Newton-Raphson，第一次修正量限制在 1.25|e| 內，收斂的元素不再更新）
+        capu = np.fmod(xlt - xnode, kTWOPI)
+        epw = capu.copy()
+        max_newton_raphson = 1.25 * np.abs(np.sqrt(elsq))
+        running = np.ones(epw.shape, dtype=bool)
+        for i in range(10):
+            sinepw = np.sin(epw)
+            cosepw = np.cos(epw)
+            ecose = axn * cosepw + ayn * sinepw
+            esine = axn * sinepw - ayn * cosepw
+            f = capu - epw + esine
+            running &= np.abs(f) >= 1.0e-12
+            if not running.any():
+                break
+            fdot = 1.0 - ecose
+            delta_epw = f / fdot
+            if i == 0:
+                delta_epw = np.clip(delta_epw, -max_newton_raphson, max_newton_raphson)
+            else:
+                delta_epw = f / (fdot + 0.5 * esine * delta_epw)
+            epw = np.where(running, epw + delta_epw, epw)
+
+        # short period preliminary quantities
+        temp21 = 1.0 - elsq
+        pl = a * temp21
+        r = a * (1.0 - ecose)
+        temp31 = 1.0 / r
+        rdot = kXKE * np.sqrt(a) * esine * temp31
+        rfdot = kXKE * np.sqrt(pl) * temp31
+        temp32 = a * temp31
+        betal = np.sqrt(temp21)
+        temp33 = 1.0 / (1.0 + betal)
+        cosu = temp32 * (cosepw - axn + ayn * esine * temp33)
+        sinu = temp32 * (sinepw - ayn - axn * esine * temp33)
+        u = np.arctan2(sinu, cosu)
+        sin2u = 2.0 * sinu * cosu
+        cos2u = 2.0 * cosu * cosu - 1.0
+
+        # update for short periodics
+        temp41 = 1.0 / pl
+        temp42 = kCK2 * temp41
+        temp43 = temp42 * temp41
+        rk = r * (1.0 - 1.5 * temp43 * betal * self.x3thm1) + 0.5 * temp42 * self.x1mth2 * cos2u
+        uk = u - 0.25 * temp43 * self.x7thm1 * sin2u
+        xnodek = xnode + 1.5 * temp43 * self.cosio * sin2u
+        xinck = self.inclination + 1.5 * temp43 * self.cosio * self.sinio * cos2u
+        rdotk = rdot - xn * temp42 * self.x1mth2 * sin2u
+        rfdotk = rfdot + xn * temp42 * (self.x1mth2 * cos2u + 1.5 * self.x3thm1)
+
+        # orientation vectors
+        sinuk, cosuk = np.sin(uk), np.cos(uk)
+        sinik, cosik = np.sin(xinck), np.cos(xinck)
+        sinnok, cosnok = np.sin(xnodek), np.cos(xnodek)
+        xmx = -sinnok * cosik
+        xmy = cosnok * cosik
+        ux = xmx * sinuk + cosnok * cosuk
+        uy = xmy * sinuk + sinnok * cosuk
+        uz = sinik * sinuk
+        vx = xmx * cosuk - cosnok * sinuk
+        vy = xmy * cosuk - sinnok * sinuk
+        vz = sinik * cosuk
+        if np.any(rk < 1.0):
+            raise ValueError("衛星已墜落 (rk < 1.0)")
+
+        position = np.stack((rk * ux, rk * uy, rk * uz), axis=-1) * kXKMPER
+        velocity = np.stack((rdotk * ux + rfdotk * vx, rdotk * uy + rfdotk * vy, rdotk * uz + rfdotk * vz), axis=-1) * (kXKMPER / 60.0)
+        return position, velocity
+
+
+def greenwich_sidereal_time(ticks):
+    """DateTime::ToGreenwichSiderealTime，ticks 為 (T,) 的 int64"""
+    julian = ticks / TICKS_PER_DAY + 1721425.5
+    jd0 = np.floor(julian + 0.5) - 0.5
+    t = (jd0 - 2451545.0) / 36525.0
+    jdf = julian - jd0
+    gt = 24110.54841 + t * (8640184.812866 + t * (0.093104 - t * 6.2E-6))
+    gt = gt + jdf * 1.00273790935 * 86400.0
+    return np.mod(np.radians(gt / 240.0), kTWOPI)
+
+
+def geodetic_to_eci(latitude, longitude, altitude, gmst):
+    """Eci::ToEci：地理座標（弧度、km）在恆星時 gmst 的 ECI 位置；回傳位置與觀測者的地方恆星時"""
+    theta = np.mod(gmst + longitude, kTWOPI)
+    c = 1.0 / np.sqrt(1.0 + kF * (kF - 2.0) * np.sin(latitude) ** 2.0)
+    s = (1.0 - kF) ** 2.0 * c
+    achcp = (kXKMPER * c + altitude) * np.cos(latitude)
+    position = np.stack(np.broadcast_arrays(achcp * np.cos(theta), achcp * np.sin(theta), (kXKMPER * s + altitude) * np.sin(latitude)), axis=-1)
+    return position, theta
+
+
+def eci_to_geodetic(position, gmst):
+    """Eci::ToGeodetic：回傳 (latitude, longitude, altitude)（弧度、km）"""
+    x, y, z = position[..., 0], position[..., 1], position[..., 2]
+    longitude = np.mod(np.arctan2(y, x) - gmst + np.pi, kTWOPI) - np.pi
+    r = np.sqrt(x * x + y * y)
+    e2 = kF * (2.0 - kF)
+    latitude = np.arctan2(z, r)
+    c = np.ones_like(latitude)
+    for _ in range(10):
+        phi = latitude
+        sinphi = np.sin(phi)
+        c = 1.0 / np.sqrt(1.0 - e2 * sinphi * sinphi)
+        latitude = np.arctan2(z + kXKMPER * c * e2 * sinphi, r)
+        if np.all(np.abs(latitude - phi) < 1e-10):
+            break
+    altitude = r / np.cos(latitude) - kXKMPER * c
+    return latitude, longitude, altitude
+
+
+def slant_range(observer, target):
+    d = target - observer
+    return np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1] + d[..., 2] * d[..., 2])
+
+
+def look_angles(observer, theta, latitude, target):
+    """
+    Observer::GetLookAngle：observer / target 為 ECI 位置 (..., 3)，theta 為觀測者的地方恆星時、latitude 為地理緯度，
+    回傳方位角、仰角（度）與距離 (km)
+    """
+    d = target - observer
+    rx, ry, rz = d[..., 0], d[..., 1], d[..., 2]
+    distance = np.sqrt(rx * rx + ry * ry + rz * rz)
+    sin_lat, cos_lat = np.sin(latitude), np.cos(latitude)
+    sin_theta, cos_theta = np.sin(theta), np.cos(theta)
+    top_s = sin_lat * cos_theta * rx + sin_lat * sin_theta * ry - cos_lat * rz
+    top_e = -sin_theta * rx + cos_theta * ry
+    top_z = cos_lat * cos_theta * rx + cos_lat * sin_theta * ry + sin_lat * rz
+    azimuth = np.mod(np.arctan2(top_e, -top_s), kTWOPI)
+    elevation = np.arcsin(top_z / distance)
+    return np.degrees(azimuth), np.degrees(elevation), distance
+
+
+def azimuth_modification(position, velocity):
+    """rectifyAzimuth：地理北方向量轉到軌道方向的角度（度，順時鐘為正），衛星觀測的方位角要減去此值"""
+    unit = position / np.linalg.norm(position, axis=-1, keepdims=True)
+    north = -unit[..., 2:3] * unit
+    north[..., 2] += 1.0
+    cos_angle = np.sum(north * velocity, axis=-1) / (np.linalg.norm(north, axis=-1) * np.linalg.norm(velocity, axis=-1))
+    angle = np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+    clockwise = np.sum(np.cross(north, velocity) * position, axis=-1) > 0
+    return np.where(clockwise, 360.0 - angle, angle)
+
+
+def angle_diff(angle1, angle2):
+    """satellite::getAngleDiff"""
+    diff1 = angle1 - angle2
+    diff2 = angle2 - angle1
+    return np.minimum(np.where(diff1 < 0, diff1 + 360, diff1), np.where(diff2 < 0, diff2 + 360, diff2))
+
+
+def satellite_ids(planes, per_plane):
+    """第 orbit 個軌道的第 number 顆衛星編號為 orbit * base + number（base 為 100，每軌超過 99 顆時取足夠的 10 的次方）"""
+    base = 10 ** max(2, len(str(per_plane)))
+    return [orbit * base + number for orbit in range(1, planes + 1) for number in range(1, per_plane + 1)]
+
+
+class Constellation:
+    """
+    依 parameter_example.txt（加上 params 覆寫）建立的星群。sat_ids 依 satIdToIndex 的順序排列（即編號由小到大），
+    right / front 為每顆衛星右方 / 前方衛星的 index
+    """
+
+    def __init__(self, params=None, directory=sattrack_runner.SATTRACK_DIR):
+        table = sattrack_runner.parse_parameters(sattrack_runner.render_parameters(params or {}, directory))
+        tle_name = table["TLE_inputFileName"]
+        if tle_name not in CONSTELLATIONS:
+            raise ValueError(f"不支援的星群 {tle_name}")
+        layout = CONSTELLATIONS[tle_name]
+        tles = read_tle_file(os.path.join(directory, tle_name))
+        sat_ids = satellite_ids(layout[0], layout[1])
+        closed = read_close_links(os.path.join(directory, table.get("closeLinksFileName", "")))
+        self.setup(table, layout, Elements.from_tles([tles[sat_id] for sat_id in sat_ids]), closed)
+
+    @classmethod
+    def walker(cls, planes, per_plane, altitude=800.0, inclination=29.0, params=None, directory=sattrack_runner.SATTRACK_DIR):
+        """
+        合成的 Walker 星群（Elements.walker，相鄰軌道面同編號的衛星互為左右方），用於大型星群的測試與 benchmark；
+        ISL / PAT / 地面站的參數沿用 parameter_example.txt（加上 params 覆寫），沒有關閉的 link
+        """
+        table = sattrack_runner.parse_parameters(sattrack_runner.render_parameters(params or {}, directory))
+        elements = Elements.walker(planes, per_plane, altitude, inclination, date_ticks(2021, 305.0))
+        constellation = cls.__new__(cls)
+        constellation.setup(table, (planes, per_plane, 0, 0), elements, set())
+        return constellation
+
+    def setup(self, table, layout, elements, closed):
+        self.table = table
+        planes, per_plane, shift, wrap_shift = layout
+        orbit = np.repeat(np.arange(1, planes + 1), per_plane)
+        number = np.tile(np.arange(1, per_plane + 1), planes)
+        self.sat_ids = satellite_ids(planes, per_plane)
+        self.per_plane = per_plane
+        self.elements = elements
+
+        index = np.arange(planes * per_plane)
+        last = orbit == planes
+        right_number = (number - 1 - np.where(last, wrap_shift, shift)) % per_plane
+        self.right = np.where(last, 0, orbit) * per_plane + right_number
+        self.front = (orbit - 1) * per_plane + number % per_plane
+        ids = np.asarray(self.sat_ids)
+        self.right_open = np.array([frozenset((a, b)) not in closed for a, b in zip(ids, ids[self.right])], dtype=bool)
+        self.front_open = np.array([frozenset((a, b)) not in closed for a, b in zip(ids, ids[self.front])], dtype=bool)
+        self.index = index
+        # 每顆衛星的右方 / 前方 link 依 (較小 index, 較大 index) 排序，與 sattrack 輸出 link 的順序相同
+        a, b = np.concatenate([index, index]), np.concatenate([self.right, self.front])
+        u, v = np.minimum(a, b), np.maximum(a, b)
+        self.pair_order = np.lexsort((v, u))
+        self.pair_u, self.pair_v = u[self.pair_order].astype(np.int32), v[self.pair_order].astype(np.int32)
+
+        self.right_angle = float(table["ISLrightAngle"])
+        self.left_angle = float(table["ISLleftAngle"])
+        self.acceptable_azimuth = float(table["acceptableAzimuthDif"])
+        self.acceptable_elevation = float(table["acceptableElevationDif"])
+        self.acceptable_range = float(table["acceptableRange"])
+        self.pat_time = int(table["PAT_time"])
+        self.station_elevation = int(table["groundStationAcceptableElevation"])
+        self.station_distance = int(table["groundStationAcceptableDistance"])
+        self.round = table.get("round") == "Y"
+
+    def batch_size(self, batch=None):
+        """一次計算的時間點數：SATTRACK_PARAMS["propagator_batch"] 為（時間點 × 衛星數）的上限，星群越大每批越少"""
+        return batch or max(1, SATTRACK_PARAMS["propagator_batch"] // len(self.sat_ids))
+
+    def ticks(self, times):
+        return self.elements.epoch_ticks + np.asarray(times, dtype=np.int64) * 1000000
+
+    def propagate(self, times):
+        """times 為距 epoch 的秒數 (T,)，回傳 ECI 位置 / 速度 (T, N, 3) 與格林威治恆星時 (T,)"""
+        times = np.asarray(times, dtype=np.int64)
+        position, velocity = self.elements.propagate(times / 60.0)
+        return position, velocity, greenwich_sidereal_time(self.ticks(times))
+
+    def observer_frames(self, position, velocity, gmst):
+        """
+        每顆衛星作為觀測者時的 (ECI 位置, 地方恆星時, 地理緯度, 方位角校正量)，各為 (T, N, ...)。
+        Observer 以衛星的地理座標重新計算 ECI 位置，與 satellite::getAER 相同
+        """
+        latitude, longitude, altitude = eci_to_geodetic(position, gmst[:, None])
+        observer, theta = geodetic_to_eci(latitude, longitude, altitude, gmst[:, None])
+        return observer, theta, latitude, azimuth_modification(position, velocity)
+
+    def satellite_look_angles(self, position, frames, observers, targets):
+        """satellite::getAER：observers 觀測 targets（index 陣列），方位角已依軌道方向校正"""
+        observer, theta, latitude, modification = (frame[:, observers] for frame in frames)
+        azimuth, elevation, distance = look_angles(observer, theta, latitude, position[:, targets])
+        azimuth = azimuth - modification
+        return np.where(azimuth < 0, azimuth + 360, azimuth), elevation, distance
+
+    def connectable(self, azimuth, elevation, distance, isl_angle):
+        """judgeAzimuth && judgeElevation && judgeRange"""
+        return ((angle_diff(isl_angle, azimuth) < self.acceptable_azimuth)
+                & (np.abs(elevation) < self.acceptable_elevation)
+                & (distance < self.acceptable_range))
+
+    def instant_links(self, times):
+        """
+        不考慮 PAT 的 link 狀態：回傳 right_distance / front_distance (T, N) 的整數 km，
+        0 表示該時刻不可連線（右方需雙向可連線，距離為右方衛星觀測的距離）或 link 已關閉
+        """
+        position, velocity, gmst = self.propagate(times)
+        frames = self.observer_frames(position, velocity, gmst)
+        a1, e1, r1 = self.satellite_look_angles(position, frames, self.index, self.right)
+        a2, e2, r2 = self.satellite_look_angles(position, frames, self.right, self.index)
+        right_ok = (self.connectable(a1, e1, r1, self.right_angle) & (r1 >= 1.0)
+                    & self.connectable(a2, e2, r2, self.left_angle) & self.right_open)
+        right_distance = np.where(right_ok, r2.astype(np.int64), 0)
+        r3 = slant_range(frames[0], position[:, self.front])
+        front_distance = np.where(self.front_open, r3.astype(np.int64), 0)
+        return right_distance, front_distance
+
+    def link_state(self, times):
+        """
+        satellite::getConstellationState：右方 ISL 需在 [max(0, t - PAT_time), t] 的每一秒都可以連線，
+        回傳 right_distance / front_distance (T, N)
+        """
+        times = np.asarray(times, dtype=np.int64)
+        if self.pat_time <= 0:
+            return self.instant_links(times)
+        starts = np.maximum(times - self.pat_time, 0)
+        seconds = np.unique(np.concatenate([np.arange(s, t + 1) for s, t in zip(starts, times)]))
+        right_distance, front_distance = self.instant_links(seconds)
+        # 以累計不可連線秒數判斷區間內是否每一秒都可以連線
+        failures = np.concatenate([np.zeros((1, len(self.index)), dtype=np.int64), np.cumsum(right_distance == 0, axis=0)])
+        begin, end = np.searchsorted(seconds, starts), np.searchsorted(seconds, times)
+        held = failures[end + 1] - failures[begin] == 0
+        return np.where(held, right_distance[end], 0), front_distance[end]
+
+    def state_series(self, times, batch=None):
+        """
+        依序 yield (time, u, v, distance)：u / v 為 sat_ids 的 index（u < v，依 (u, v) 排序，每條 link 一次），
+        每批 batch_size() 個時間點一起計算
+        """
+        times = [int(t) for t in times]
+        batch = self.batch_size(batch)
+        for start in range(0, len(times), batch):
+            chunk = times[start:start + batch]
+            distance = np.concatenate(self.link_state(chunk), axis=1)[:, self.pair_order]
+            for t, row in zip(chunk, distance):
+                keep = row > 0
+                yield t, self.pair_u[keep], self.pair_v[keep], row[keep]
+
+    def edge_series(self, times, batch=None):
+        """與 sattrack_runner.constellation_state_series 相同的格式：yield (time, sat_ids, edges)，edges 為 (E, 3) 陣列"""
+        ids = np.asarray(self.sat_ids, dtype=np.int64)
+        for t, u, v, distance in self.state_series(times, batch):
+            yield t, self.sat_ids, np.stack((ids[u], ids[v], distance), axis=-1)
+
+    def station_visibility(self, latitude, longitude, times, altitude=None):
+        """groundStation::judgeConnection：回傳 (T, N) 的布林陣列；altitude 為 None 時使用參數中的 stationAltitude"""
+        altitude = float(self.table["stationAltitude"]) if altitude is None else float(altitude)
+        times = np.asarray(times, dtype=np.int64)
+        position, _, gmst = self.propagate(times)
+        station, theta = geodetic_to_eci(np.radians(float(latitude)), np.radians(float(longitude)), altitude, gmst)
+        _, elevation, distance = look_angles(station[:, None, :], theta[:, None], np.radians(float(latitude)), position)
+        if self.round:
+            elevation = np.trunc(elevation + 0.5 - (elevation < 0))
+        return (elevation >= self.station_elevation) & (distance <= self.station_distance)
+
+    def cover_sats(self, latitude, longitude, times, altitude=None):
+        """每個時間點地面站可以連線的衛星編號（由小到大），與 printStationCoverSats 相同"""
+        times = np.asarray(times, dtype=np.int64)
+        ids = np.asarray(self.sat_ids)
+        batch = self.batch_size()
+        return [ids[row].tolist() for start in range(0, len(times), batch)
+                for row in self.station_visibility(latitude, longitude, times[start:start + batch], altitude)]
+
+
+constellations = {}
+
+
+def shared_constellation():
+    """
+    取得本行程共用的星群（依目前的 parameter_example.txt 只建立一次）；SATTRACK_PARAMS["use_propagator"] 為 False
+    或目前的參數不支援（例如未知的 TLE 檔、deep-space 衛星）時回傳 None，呼叫端改用 ./sattrack
+    """
+    if not SATTRACK_PARAMS["use_propagator"]:
+        return None
+    key = sattrack_runner.SATTRACK_DIR
+    if key not in constellations:
+        try:
+            constellations[key] = Constellation()
+        except (OSError, KeyError, ValueError) as e:
+            print(f"{YELLOW}⚠ 無法以 NumPy 計算星群，改用 ./sattrack: {e}{NC}")
+            constellations[key] = None
+    return constellations[key]
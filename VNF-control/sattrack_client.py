@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+sattrack_client.py
+常駐模擬器 (./sattrack --serve) 的 Python client
+
+./sattrack 每次啟動都要重新讀 TLE 與 parameter.txt、建立整個星群；常駐模式只在啟動時建立一次，
+之後以一行一個查詢的文字協定回覆（每個回覆一行：OK <json> 或 ERR <訊息>）：
+    state <time>                              該時刻的星群 link（與 printConstellationStateSeries 相同）
+    cover <lat> <lon> <time>                  地面站可見的衛星（與 printStationCoverSats 相同）
+    hop <lat1> <lon1> <lat2> <lon2> <time>    兩地面站之間的候選路徑（與 printStationHopcountPath 相同）
+模擬器在專用的工作目錄中啟動，讀完參數後即刪除工作目錄；同一個行程共用一個模擬器（shared_client），
+多執行緒以 lock 依序送出查詢，fork 出的子行程會自己另外啟動一個。
+"""
+
+import atexit
+import json
+import os
+import subprocess
+import threading
+
+import sattrack_runner
+from policy_config import SATTRACK_PARAMS
+
+YELLOW = '\033[93m'
+NC = '\033[0m'  # No Color
+
+
+class SattrackError(RuntimeError):
+    """模擬器回覆 ERR 或常駐行程已結束"""
+
+
+class SattrackClient:
+
+    def __init__(self, directory=sattrack_runner.SATTRACK_DIR):
+        self.lock = threading.Lock()
+        with sattrack_runner.workspace(directory) as path:
+            sattrack_runner.write_parameters({}, path)
+            self.process = subprocess.Popen(
+                ['./sattrack', '--serve'], cwd=path, text=True, bufsize=1,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+            # 回覆 ping 代表星群已建立完成，之後不再讀取工作目錄中的檔案
+            try:
+                self.request("ping")
+            except SattrackError:
+                self.close()
+                raise
+
+    def request(self, line):
+        with self.lock:
+            try:
+                self.process.stdin.write(line + "\n")
+                self.process.stdin.flush()
+                reply = self.process.stdout.readline()
+            except (BrokenPipeError, ValueError) as e:
+                raise SattrackError(f"sattrack 常駐行程已結束: {e}")
+        status, _, payload = reply.rstrip("\n").partition(" ")
+        if status == "OK":
+            return json.loads(payload)
+        if status == "ERR":
+            raise SattrackError(payload)
+        raise SattrackError(f"sattrack 常駐行程已結束（returncode = {self.process.poll()}）")
+
+    def state(self, seconds):
+        """回傳 (sat_ids, edges)，edges 為 [(satId1, satId2, 距離km)]（每條 link 一次）"""
+        data = self.request(f"state {int(seconds)}")
+        return data["sats"], [tuple(edge) for edge in data["edges"]]
+
+    def cover_sats(self, latitude, longitude, seconds):
+        return self.request(f"cover {latitude} {longitude} {int(seconds)}")
+
+    def hop_paths(self, source, destination, seconds):
+        """回傳 {"availableSatsList1", "availableSatsList2", "pathlist"}"""
+        return self.request(f"hop {source[0]} {source[1]} {destination[0]} {destination[1]} {int(seconds)}")
+
+    def close(self):
+        process = getattr(self, 'process', None)
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.write("quit\n")
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (BrokenPipeError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+clients = {}
+unavailable = set()
+
+
+def shared_client():
+    """
+    取得本行程共用的常駐模擬器；SATTRACK_PARAMS["use_server"] 為 False 或無法啟動（例如舊版 ./sattrack 不支援 --serve）時
+    回傳 None，呼叫端改為每次執行一次 ./sattrack
+    """
+    if not SATTRACK_PARAMS["use_server"]:
+        return None
+    pid = os.getpid()
+    if pid in unavailable:
+        return None
+    client = clients.get(pid)
+    if client is not None and client.process.poll() is None:
+        return client
+    try:
+        clients[pid] = SattrackClient()
+    except (OSError, SattrackError) as e:
+        print(f"{YELLOW}⚠ 無法啟動常駐模擬器，改為每次執行 ./sattrack: {e}{NC}")
+        unavailable.add(pid)
+        return None
+    return clients[pid]
+
+
+@atexit.register
+def close_clients():
+    client = clients.pop(os.getpid(), None)
+    if client is not None:
+        client.close()
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+sattrack_runner.py
+執行 LEO 衛星模擬器 ./sattrack 的共用工具
+
+- write_parameters / run_sattrack：以 parameter_example.txt 為範本加上指定參數寫成 parameter.txt 後執行，
+  以行程結束 (returncode) 判斷模擬完成，不再固定 sleep
+- station_hop_paths：printStationHopcountPath 的結果依 (TLE 檔、closeLink 檔、兩個地面站座標、量化後的時間、
+  ISL / 地面站參數) 做成 key 存在磁碟快取，相同地面站之間重複部署時直接取用，不必再執行模擬器
+- constellation_state_series：一次執行取得多個時間點的星群拓樸（printConstellationStateSeries），逐一 yield
+- workspace：建立獨立的模擬器工作目錄，多個行程同時執行 ./sattrack 時不會互相覆寫 parameter.txt 與輸出檔
+- query_sattrack：每次查詢都在自己的暫存工作目錄中寫入 parameter.txt、執行並讀取輸出，結束後刪除，
+  共用的 sattrack 目錄只會被讀取，多個 deploy / migration 可以同時執行
+- SATTRACK_PARAMS["use_server"] 為 True 時，station_hop_paths / constellation_state_series 改向常駐模擬器查詢
+  （sattrack_client），不必每次啟動 ./sattrack
+- SATTRACK_PARAMS["use_propagator"] 為 True 時，constellation_state_series / station_hop_paths 直接在行程內以 NumPy
+  （propagator）與 CSR 拓樸（topology）計算，結果與模擬器相同，不會建立 N × N 的矩陣
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from policy_config import SATTRACK_PARAMS
+
+SATTRACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'LEO-satellite-constellation-simulator', 'LEO-satellite-constellation-simulator', 'sattrack')
+TEMPLATE_FILE = 'parameter_example.txt'
+PARAMETER_FILE = 'parameter.txt'
+HOP_PATH_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hop_path_cache')
+
+
+def parse_parameters(text):
+    """與 getFileData::getParameterdata 相同的規則：只讀 '>' 開頭的行，取前兩個括號內的字串，後出現的 key 覆蓋前面的"""
+    table = {}
+    for line in text.splitlines():
+        if not line.startswith('>'):
+            continue
+        tokens = []
+        while True:
+            left, right = line.find('('), line.find(')')
+            if left == -1 or right == -1:
+                break
+            tokens.append(line[left + 1:right])
+            line = line[right + 1:]
+        if len(tokens) >= 2:
+            table[tokens[0]] = tokens[1]
+    return table
+
+
+def render_parameters(params, directory=SATTRACK_DIR):
+    """回傳 parameter.txt 的完整內容（範本 + 附加的參數行）"""
+    with open(os.path.join(directory, TEMPLATE_FILE), 'r') as f:
+        content = f.read()
+    if not content.endswith('\n'):
+        content += '\n'
+    return content + ''.join(f">>({key}): ({value})\n" for key, value in params.items())
+
+
+def template_time(directory=SATTRACK_DIR):
+    """範本中設定的模擬時間（秒），未指定 time 的查詢（例如 station_hop_paths）使用此時間"""
+    return int(parse_parameters(render_parameters({}, directory)).get('time', 0))
+
+
+def write_parameters(params, directory=SATTRACK_DIR):
+    """寫入 parameter.txt，回傳模擬器實際會讀到的參數表"""
+    content = render_parameters(params, directory)
+    with open(os.path.join(directory, PARAMETER_FILE), 'w') as f:
+        f.write(content)
+    return parse_parameters(content)
+
+
+def run_sattrack(params, log_name, directory):
+    """
+    在模擬器工作目錄 directory 中寫入參數並執行 ./sattrack（stdout / stderr 寫到 log_name），
+    行程結束即代表輸出檔已寫完；失敗時丟出 subprocess.CalledProcessError。
+    回傳輸出檔 (outputFileName) 的路徑
+    """
+    table = write_parameters(params, directory)
+    # 在 workspace 中輸出檔可能是連到共用目錄的 symlink，先移除以免寫回共用目錄
+    for name in (table['outputFileName'], log_name):
+        path = os.path.join(directory, name)
+        if os.path.islink(path):
+            os.remove(path)
+    with open(os.path.join(directory, log_name), 'w') as log_file:
+        subprocess.run(['./sattrack'], cwd=directory, stdout=log_file, stderr=subprocess.STDOUT, check=True)
+    return os.path.join(directory, table['outputFileName'])
+
+
+@contextmanager
+def workspace(directory=SATTRACK_DIR):
+    """
+    建立獨立的模擬器工作目錄（暫存目錄），以 symlink 連到 directory 中的執行檔、TLE 等檔案，
+    parameter.txt 與輸出檔則寫在各自的目錄中；離開時刪除整個目錄
+    """
+    path = tempfile.mkdtemp(prefix='sattrack-')
+    try:
+        for name in os.listdir(directory):
+            if name != PARAMETER_FILE:
+                os.symlink(os.path.abspath(os.path.join(directory, name)), os.path.join(path, name))
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def scratch_directory(directory=None):
+    """directory 為 None 時建立本次查詢專用的工作目錄（離開時刪除），否則沿用呼叫端已建立的工作目錄"""
+    if directory is not None:
+        yield directory
+        return
+    with workspace() as path:
+        yield path
+
+
+def query_sattrack(params, log_name, reader, directory=None):
+    """在工作目錄中執行 ./sattrack，並在工作目錄刪除前以 reader(輸出檔路徑) 讀出結果後回傳"""
+    with scratch_directory(directory) as path:
+        return reader(run_sattrack(params, log_name, path))
+
+
+def file_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def hop_path_key(table, directory=SATTRACK_DIR):
+    """以模擬器實際讀到的參數表（不含輸出檔名）與 TLE / closeLink 檔內容產生快取 key"""
+    effective = {key: value for key, value in table.items() if key != 'outputFileName'}
+    material = {
+        "parameters": effective,
+        "tle": file_digest(os.path.join(directory, table.get('TLE_inputFileName', ''))),
+        "close_links": file_digest(os.path.join(directory, table.get('closeLinksFileName', ''))),
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()
+
+
+class HopPathCache:
+    """
+    printStationHopcountPath 結果的磁碟快取，每個 key 一個 JSON 檔。
+    讀取時更新檔案 mtime，超過 max_entries 時刪除 mtime 最舊的檔案 (LRU)；
+    寫入時先寫暫存檔再 os.replace，多個行程同時使用也不會讀到寫一半的內容。
+    """
+
+    def __init__(self, directory=HOP_PATH_CACHE_DIR, max_entries=None):
+        self.directory = directory
+        self.max_entries = SATTRACK_PARAMS["hop_path_cache_entries"] if max_entries is None else max_entries
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)
+        return data
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except FileNotFoundError:
+                continue
+        for _, name in sorted(entries)[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def quantize_time(seconds):
+    """時間依 SATTRACK_PARAMS["time_bucket"] 秒分桶，同一桶內的查詢共用一次模擬結果"""
+    bucket = SATTRACK_PARAMS["time_bucket"]
+    seconds = int(seconds)
+    return seconds - seconds % bucket if bucket else seconds
+
+
+def shared_client():
+    # sattrack_client 也會用到本模組，在使用時才 import
+    import sattrack_client
+    return sattrack_client.shared_client()
+
+
+def shared_constellation():
+    # propagator 也會用到本模組，在使用時才 import
+    import propagator
+    return propagator.shared_constellation()
+
+
+def load_json_file(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def station_hop_paths(source, destination, time=None, cache=None, directory=None):
+    """
+    查詢兩個地面站之間的候選衛星路徑（printStationHopcountPath）。
+    source / destination 為 (latitude, longitude)；time 為 None 時使用範本中的時間，否則先量化再寫入；
+    directory 為 None 時在專用的暫存工作目錄中執行。
+    回傳 HopCountPath.txt 的內容 {"availableSatsList1", "availableSatsList2", "pathlist"} 與是否命中快取
+    """
+    params = {
+        "stationLatitude1": source[0],
+        "stationLongitude1": source[1],
+        "stationLatitude2": destination[0],
+        "stationLongitude2": destination[1],
+    }
+    if time is not None:
+        params["time"] = quantize_time(time)
+    params["outputFileName"] = "HopCountPath.txt"
+    params["execute_function"] = "printStationHopcountPath"
+
+    cache = HopPathCache() if cache is None else cache
+    key = hop_path_key(parse_parameters(render_parameters(params)))
+    data = cache.get(key)
+    if data is not None:
+        return data, True
+
+    constellation = shared_constellation()
+    client = shared_client() if directory is None and constellation is None else None
+    if constellation is not None:
+        data = constellation_hop_paths(constellation, source, destination, params.get("time", template_time()))
+    elif client is not None:
+        data = client.hop_paths(source, destination, params.get("time", template_time()))
+    else:
+        data = query_sattrack(params, 'HopCountOutput.txt', load_json_file, directory)
+    cache.put(key, data)
+    return data, False
+
+
+def constellation_hop_paths(constellation, source, destination, seconds):
+    """
+    在行程內計算與 printStationHopcountPath 相同的結果：兩地面站可見的衛星（stationAltitude1 / stationAltitude2），
+    以及每組 (起點衛星, 終點衛星) 在該時刻拓樸上的最短 hop 路徑（Topology.floyd_path，不可達為 [-1]）
+    """
+    # topology 只在行程內計算時用到
+    from topology import Topology
+
+    table = constellation.table
+    sats1 = constellation.cover_sats(source[0], source[1], [seconds], table["stationAltitude1"])[0]
+    sats2 = constellation.cover_sats(destination[0], destination[1], [seconds], table["stationAltitude2"])[0]
+    _, u, v, distance = next(constellation.state_series([seconds]))
+    G = Topology.from_edges(constellation.sat_ids, u, v, distance)
+    rows = {}
+    pathlist = []
+    for a in G.indices_of(sats1).tolist():
+        for b in G.indices_of(sats2).tolist():
+            path = G.floyd_path(a, b, rows)
+            pathlist.append(G.ids_of(path) if path is not None else [-1])
+    return {"availableSatsList1": sats1, "availableSatsList2": sats2, "pathlist": pathlist}
+
+
+def constellation_index_series(times, directory=None):
+    """
+    與 constellation_state_series 相同，但 yield (time, sat_ids, u, v, distance)：u / v 為 sat_ids 的 int32 index 陣列。
+    propagator 直接產生 index；模擬器的結果以衛星編號對照表整批轉換
+    """
+    constellation = shared_constellation()
+    if constellation is not None:
+        for t, u, v, distance in constellation.state_series(times):
+            yield t, constellation.sat_ids, u, v, distance
+        return
+
+    index = None
+    for t, sat_ids, edges in constellation_state_series(times, directory=directory):
+        if index is None:
+            index = {sat_id: i for i, sat_id in enumerate(sat_ids)}
+        frame = np.array(edges, dtype=np.int64).reshape(-1, 3)
+        u = np.fromiter((index[a] for a in frame[:, 0].tolist()), dtype=np.int32, count=len(frame))
+        v = np.fromiter((index[b] for b in frame[:, 1].tolist()), dtype=np.int32, count=len(frame))
+        yield t, sat_ids, u, v, frame[:, 2]
+
+
+def constellation_state_series(times, output_name='adj_series.txt', log_name='adj_matrixOutput.txt', directory=None):
+    """
+    一次執行 printConstellationStateSeries 取得多個時間點的星群連線狀態，
+    依時間順序逐一 yield (time, sat_ids, edges)，edges 為 (satId1, satId2, 距離km) 的序列（每條 link 一次）。
+    所有輪次只需啟動一次模擬器、讀一次 TLE。directory 為 None 時在專用的暫存工作目錄中執行，
+    讀完（或被 close）後刪除；可以在行程內計算時（propagator）不執行模擬器，也不使用 directory。
+    """
+    constellation = shared_constellation()
+    if constellation is not None:
+        yield from constellation.edge_series(times)
+        return
+
+    client = shared_client() if directory is None else None
+    if client is not None:
+        for t in times:
+            yield (int(t), *client.state(t))
+        return
+
+    params = {
+        "timeList": ",".join(str(int(t)) for t in times),
+        "outputFileName": output_name,
+        "execute_function": "printConstellationStateSeries",
+    }
+    with scratch_directory(directory) as path:
+        output_path = run_sattrack(params, log_name, path)
+
+        sat_ids, current_time, edges = [], None, []
+        with open(output_path, 'r') as f:
+            for line in f:
+                if line.startswith('#sats'):
+                    sat_ids = [int(sat_id) for sat_id in line.split()[1:]]
+                elif line.startswith('#t'):
+                    if current_time is not None:
+                        yield current_time, sat_ids, edges
+                    current_time, edges = int(line.split()[1]), []
+                elif line.strip():
+                    a, b, distance = line.split()
+                    edges.append((int(a), int(b), int(distance)))
+        if current_time is not None:
+            yield current_time, sat_ids, edges
@@ -0,0 +1,675 @@
+# -*- coding: utf-8 -*-
+"""
+topology.py
+以 CSR (compressed sparse row) 表示的星群拓樸
+
+- indptr / indices / weights：第 i 顆衛星的鄰居為 indices[indptr[i]:indptr[i+1]]，weights 為 link 距離 (km)，皆為 int32
+- sat_ids / id_to_index：衛星編號與陣列 index 的對應（indices_of / ids_of 整批轉換）
+記憶體與每輪的計算量只隨 link 數成長，不會建立 N × N 的矩陣（大型星群見 topology_benchmark.py）。
+建立方式：
+- from_edges：由 (u, v, distance) 陣列（每條 link 一次）以 NumPy 一次建出雙向 CSR
+- from_edge_list：由 [(satId1, satId2, 距離km)] 建立
+路徑查詢（BFS 最短 hop 路徑、Yen k-shortest simple paths、has_path）直接在 CSR 上進行，
+需要 NetworkX 時再以 to_networkx() 轉成圖。floyd_path 以 BFS 求出與 sattrack 的 Floyd-Warshall
+（satellite::getPath）完全相同的最短 hop 路徑。
+路徑排序的 metric："hop" 依 hop 數；"latency" 依端到端延遲（link 距離 / 光速 + 每一跳的處理延遲，
+見 ROUTING_PARAMS），以 Dijkstra 取代 BFS。
+IncrementalTopology：連續輪次只套用前後 frame 之間新增 / 移除的 link，並保留不受影響的路徑查詢結果。
+RoutingTable：拓樸的 all-pairs hop 數與 next-hop 表（int16），每個不同的 link 集合只以 BFS 建立一次，
+快取在拓樸物件、行程內（依 link 集合的 digest）與封存檔目錄中（總大小超過上限時依 LRU 刪除）；
+繞路 hop 數改為查表，has_path 只在路由表已經建好時查表，否則仍以單次 BFS 判斷。
+"""
+
+import hashlib
+import heapq
+import os
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from policy_config import ROUTING_PARAMS, TOPOLOGY_PARAMS
+
+LIGHT_SPEED_KM_PER_MS = 299.792458  # 真空光速 (km/ms)，ISL 為真空中的雷射鏈路
+
+
+def link_latency_ms(distance_km):
+    """單一 link 的延遲 (ms)：傳播延遲（距離 / 光速）加上每一跳的處理延遲，distance_km 可為陣列"""
+    return distance_km / LIGHT_SPEED_KM_PER_MS + ROUTING_PARAMS["hop_delay_ms"]
+
+
+def bfs_path(adjacency, source, target, blocked_nodes=(), blocked_edges=()):
+    """在鄰接串列上以 BFS 找最短 hop 路徑（index 序列），可排除部分節點與 link；不可達回傳 None"""
+    if source == target:
+        return [source]
+    parent = {source: None}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for neighbor in adjacency[node]:
+            if neighbor in parent or neighbor in blocked_nodes or (node, neighbor) in blocked_edges:
+                continue
+            parent[neighbor] = node
+            if neighbor == target:
+                path = [target]
+                while parent[path[-1]] is not None:
+                    path.append(parent[path[-1]])
+                return path[::-1]
+            queue.append(neighbor)
+    return None
+
+
+def dijkstra_path(latency, source, target, blocked_nodes=(), blocked_edges=()):
+    """latency 為每個節點的 {鄰居: 延遲 ms}，以 Dijkstra 找延遲最小的路徑（index 序列）；不可達回傳 None"""
+    if source == target:
+        return [source]
+    best = {source: 0.0}
+    parent = {source: None}
+    done = set()
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node in done:
+            continue
+        if node == target:
+            path = [target]
+            while parent[path[-1]] is not None:
+                path.append(parent[path[-1]])
+            return path[::-1]
+        done.add(node)
+        for neighbor, weight in latency[node].items():
+            if neighbor in done or neighbor in blocked_nodes or (node, neighbor) in blocked_edges:
+                continue
+            new_cost = cost + weight
+            if new_cost < best.get(neighbor, float('inf')):
+                best[neighbor] = new_cost
+                parent[neighbor] = node
+                heapq.heappush(heap, (new_cost, neighbor))
+    return None
+
+
+def yen_paths(graph, source, target, k, weighted=False):
+    """
+    Yen's algorithm：由短到長回傳至多 k 條 simple path（index 序列）。
+    weighted 為 False 時 graph 為鄰接串列、依 hop 數排序；為 True 時 graph 為 {鄰居: 延遲} 串列、依總延遲排序
+    """
+    shortest_path = dijkstra_path if weighted else bfs_path
+
+    def cost(path):
+        return sum(graph[a][b] for a, b in zip(path, path[1:])) if weighted else len(path)
+
+    first = shortest_path(graph, source, target)
+    if first is None:
+        return []
+
+    found = [first]
+    seen = {tuple(first)}
+    candidates = []
+    counter = 0
+    while len(found) < k:
+        previous = found[-1]
+        for i in range(len(previous) - 1):
+            spur, root = previous[i], previous[:i + 1]
+            blocked_edges = set()
+            for path in found:
+                if path[:i + 1] == root and len(path) > i + 1:
+                    blocked_edges.add((path[i], path[i + 1]))
+                    blocked_edges.add((path[i + 1], path[i]))
+            spur_path = shortest_path(graph, spur, target, set(root[:-1]), blocked_edges)
+            if spur_path is None:
+                continue
+            candidate = root[:-1] + spur_path
+            if tuple(candidate) in seen:
+                continue
+            seen.add(tuple(candidate))
+            heapq.heappush(candidates, (cost(candidate), counter, candidate))
+            counter += 1
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[2])
+    return found
+
+
+class RoutingTable:
+    """
+    拓樸的 all-pairs 路由表，index 與 Topology.sat_ids 相同，皆為 (N, N) 的 int16：
+    - hops[a, b]：a 到 b 的最少 hop 數，不可達為 -1
+    - next_hop[a, b]：a 往 b 的最短 hop 路徑上的下一顆衛星（離 b 少一跳的鄰居中 index 最小者），a == b 時為 a，不可達為 -1
+    """
+
+    def __init__(self, hops, next_hop):
+        self.hops = hops
+        self.next_hop = next_hop
+
+    @classmethod
+    def build(cls, n, u, v):
+        """
+        u / v 為 link 兩端的 index（每條 link 一次）。所有起點同時做 BFS（bit-parallel）：每顆衛星以 uint64 位元
+        記錄已到達它的起點，每一層把鄰居的 frontier 以 CSR 分段 OR 起來，共「直徑」層、每層 O(E * N / 64)；
+        next_hop 再取鄰居中離終點少一跳者
+        """
+        if n > np.iinfo(np.int16).max:
+            raise ValueError(f"衛星數 {n} 超過 int16 路由表的上限")
+        u = np.asarray(u, dtype=np.intp)
+        v = np.asarray(v, dtype=np.intp)
+        rows, cols = np.concatenate([u, v]), np.concatenate([v, u])
+        order = np.lexsort((cols, rows))
+        rows, cols = rows[order], cols[order]
+        index = np.arange(n)
+        starts = np.searchsorted(rows, index)
+        degree = np.bincount(rows, minlength=n)
+        linked = degree > 0
+
+        seen = np.zeros((n, (n + 63) // 64), dtype=np.uint64)
+        seen[index, index // 64] = np.left_shift(np.uint64(1), (index % 64).astype(np.uint64))
+        frontier = seen.copy()
+        hops = np.full((n, n), -1, dtype=np.int16)
+        np.fill_diagonal(hops, 0)
+        level = 0
+        while len(cols):
+            level += 1
+            reached = np.zeros_like(seen)
+            reached[linked] = np.bitwise_or.reduceat(frontier[cols], starts[linked], axis=0)
+            frontier = reached & ~seen
+            if not frontier.any():
+                break
+            seen |= frontier
+            # 第 node 列的第 s 個位元代表起點 s 在這一層到達 node
+            arrived = np.unpackbits(frontier.view(np.uint8), axis=1, count=n, bitorder='little')
+            hops[arrived.T.astype(bool)] = level
+
+        next_hop = np.full((n, n), -1, dtype=np.int16)
+        next_hop[index, index] = index
+        for source in np.flatnonzero(linked).tolist():
+            row = hops[source]
+            remaining = row > 0
+            # 由 index 大到小覆寫，同樣少一跳的鄰居取 index 最小者
+            for neighbor in cols[starts[source]:starts[source] + degree[source]][::-1].tolist():
+                next_hop[source, remaining & (hops[neighbor] == row - 1)] = neighbor
+        return cls(hops, next_hop)
+
+    @classmethod
+    def load(cls, path):
+        """讀取 save() 寫入的檔案（memmap），不存在或損毀時回傳 None"""
+        try:
+            tables = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        return cls(tables[0], tables[1])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.stack([self.hops, self.next_hop]))
+        os.replace(tmp_path, path)
+
+    def nbytes(self):
+        return self.hops.nbytes + self.next_hop.nbytes
+
+    def route(self, source, target):
+        """沿 next-hop 表走出的最短 hop 路徑（index 序列），不可達回傳 None"""
+        if self.hops[source, target] < 0:
+            return None
+        path = [source]
+        while path[-1] != target:
+            path.append(int(self.next_hop[path[-1], target]))
+        return path
+
+    def nearest(self, ends):
+        """每顆衛星到 ends 中最近一顆的 hop 數與該顆的 index（不可達的 hop 數為 -1）"""
+        rows = self.hops[np.asarray(ends, dtype=np.intp)].astype(np.int32)
+        rows[rows < 0] = np.iinfo(np.int32).max
+        closest = rows.argmin(axis=0)
+        distance = rows[closest, np.arange(rows.shape[1])]
+        return np.where(distance == np.iinfo(np.int32).max, -1, distance), np.asarray(ends)[closest]
+
+    def detour(self, sources, targets):
+        """
+        每顆衛星 X 的繞路 hop 數：hops(起點集合, X) + hops(X, 終點集合) - hops(起點集合, 終點集合)，
+        0 表示 X 在某條最短路徑上；到不了起點或終點的衛星為 -1
+        """
+        from_source, _ = self.nearest(sources)
+        to_target, _ = self.nearest(targets)
+        reachable = (from_source >= 0) & (to_target >= 0)
+        if not reachable.any():
+            return np.full(len(self.hops), -1, dtype=np.int32)
+        total = from_source + to_target
+        return np.where(reachable, total - total[reachable].min(), -1)
+
+    def route_via(self, sources, targets, via):
+        """最近的起點 -> via -> 最近的終點的路徑（index 序列，可能經過同一顆衛星往返），不可達回傳 None"""
+        if not len(sources) or not len(targets):
+            return None
+        from_source, source = self.nearest(sources)
+        to_target, target = self.nearest(targets)
+        if from_source[via] < 0 or to_target[via] < 0:
+            return None
+        return self.route(int(source[via]), via) + self.route(via, int(target[via]))[1:]
+
+
+routing_tables = OrderedDict()
+
+
+def routing_key(n, edge_keys):
+    """link 集合的 digest，相同 link 集合的拓樸共用同一份路由表"""
+    digest = hashlib.blake2b(np.int64(n).tobytes(), digest_size=16)
+    digest.update(np.ascontiguousarray(edge_keys, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def evict_routing_files(directory, keep):
+    """routing_dir 中的路由表檔案總大小超過 TOPOLOGY_PARAMS["routing_disk_mb"] 時，刪除 mtime 最舊的檔案 (LRU)，keep 不刪"""
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith('.npy'):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+    budget = TOPOLOGY_PARAMS["routing_disk_mb"] * 1024 * 1024
+    size = sum(entry[1] for entry in entries)
+    for _, entry_size, name in sorted(entries):
+        if size <= budget:
+            break
+        if name == keep:
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        size -= entry_size
+
+
+def remember_routing_table(key, table):
+    """放進行程內的快取，超過 TOPOLOGY_PARAMS["routing_cache_mb"] 時淘汰最久沒用到的"""
+    routing_tables[key] = table
+    routing_tables.move_to_end(key)
+    budget = TOPOLOGY_PARAMS["routing_cache_mb"] * 1024 * 1024
+    while len(routing_tables) > 1 and sum(table.nbytes() for table in routing_tables.values()) > budget:
+        routing_tables.popitem(last=False)
+
+
+class Topology:
+
+    def __init__(self, sat_ids, indptr, indices, weights):
+        self.sat_ids = list(sat_ids)
+        self.id_to_index = {sat_id: i for i, sat_id in enumerate(self.sat_ids)}
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.latency = None
+        self.routing = None
+        self.routing_dir = None
+        # BFS 時以 Python list 存取比逐一索引 ndarray 快
+        self.adjacency = [indices[indptr[i]:indptr[i + 1]].tolist() for i in range(len(self.sat_ids))]
+
+    @classmethod
+    def from_edges(cls, sat_ids, u, v, distance):
+        """u / v 為 sat_ids 的 index（每條 link 一次），建立雙向 CSR"""
+        n = len(sat_ids)
+        u = np.asarray(u, dtype=np.int32)
+        v = np.asarray(v, dtype=np.int32)
+        distance = np.asarray(distance, dtype=np.int32)
+        rows = np.concatenate([u, v])
+        cols = np.concatenate([v, u])
+        dist = np.concatenate([distance, distance])
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=n))
+        return cls(sat_ids, indptr, cols[order], dist[order])
+
+    @classmethod
+    def from_edge_list(cls, sat_ids, edges, id_type=int):
+        """edges 為 [(satId1, satId2, 距離km)]；id_type 為建好的拓樸中衛星編號的型別"""
+        index = {sat_id: i for i, sat_id in enumerate(sat_ids)}
+        array = np.array(edges, dtype=np.int64).reshape(-1, 3)
+        u = np.array([index[a] for a in array[:, 0].tolist()], dtype=np.int32)
+        v = np.array([index[b] for b in array[:, 1].tolist()], dtype=np.int32)
+        return cls.from_edges([id_type(sat_id) for sat_id in sat_ids], u, v, array[:, 2])
+
+    def number_of_edges(self):
+        return len(self.indices) // 2
+
+    def nbytes(self):
+        """CSR 陣列佔用的位元組數"""
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+    def indices_of(self, sat_ids):
+        """衛星編號序列轉成 int32 index 陣列，不在拓樸中的衛星為 -1"""
+        index = self.id_to_index
+        return np.fromiter((index.get(sat_id, -1) for sat_id in sat_ids), dtype=np.int32, count=len(sat_ids))
+
+    def ids_of(self, indices):
+        return [self.sat_ids[i] for i in np.asarray(indices).tolist()]
+
+    def edge_keys(self):
+        """所有 link 以 u * n + v (u < v) 編碼成 int64，方便做集合運算"""
+        n = len(self.sat_ids)
+        rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr))
+        mask = rows < self.indices
+        return rows[mask] * n + self.indices[mask]
+
+    def bfs_distances(self, sources):
+        """sources 為 index 或 index 的集合（多起點 BFS），回傳每顆衛星的 hop 數（不可達為 -1）"""
+        sources = [sources] if isinstance(sources, (int, np.integer)) else list(sources)
+        dist = [-1] * len(self.sat_ids)
+        for source in sources:
+            dist[source] = 0
+        queue = deque(sources)
+        adjacency = self.adjacency
+        while queue:
+            node = queue.popleft()
+            for neighbor in adjacency[node]:
+                if dist[neighbor] < 0:
+                    dist[neighbor] = dist[node] + 1
+                    queue.append(neighbor)
+        return dist
+
+    def shortest_path_indices(self, source, target, blocked_nodes=(), blocked_edges=()):
+        """BFS 最短 hop 路徑（index 序列），可排除部分節點與 link；不可達回傳 None"""
+        return bfs_path(self.adjacency, source, target, blocked_nodes, blocked_edges)
+
+    def has_path(self, source_id, target_id):
+        if source_id not in self.id_to_index or target_id not in self.id_to_index:
+            return False
+        source, target = self.id_to_index[source_id], self.id_to_index[target_id]
+        # 建立路由表是 all-pairs 的計算量，只有已經建好時才查表
+        if self.routing is not None:
+            return self.routing.hops[source, target] >= 0
+        return self.shortest_path_indices(source, target) is not None
+
+    def routing_table(self):
+        """
+        目前拓樸的 RoutingTable：依序取用物件上的快取、行程內的 routing_tables（相同 link 集合共用）、
+        routing_dir 中的檔案，都沒有時才以 bit-parallel BFS 建立（有 routing_dir 且檔案不存在時一併寫入）。
+        讀取檔案時更新 mtime，寫入後以 evict_routing_files 限制目錄的總大小
+        """
+        if self.routing is None:
+            n = len(self.sat_ids)
+            keys = self.edge_keys()
+            key = routing_key(n, keys)
+            path = os.path.join(self.routing_dir, f"{key}.npy") if self.routing_dir is not None else None
+            table = routing_tables.get(key)
+            if table is None and path is not None:
+                table = RoutingTable.load(path)
+                if table is not None:
+                    os.utime(path)
+            if table is None:
+                table = RoutingTable.build(n, keys // n, keys % n)
+            if path is not None and not os.path.exists(path):
+                table.save(path)
+                evict_routing_files(self.routing_dir, os.path.basename(path))
+            remember_routing_table(key, table)
+            self.routing = table
+        return self.routing
+
+    def within_detour(self, source_ids, target_ids, max_hops):
+        """
+        經過後比起點集合到終點集合的最短路徑至多多走 max_hops 跳的衛星編號（RoutingTable.detour，查表），
+        起點或終點都不在拓樸中時回傳空串列
+        """
+        sources, targets = self.indices_of(source_ids), self.indices_of(target_ids)
+        sources, targets = sources[sources >= 0], targets[targets >= 0]
+        if not len(sources) or not len(targets):
+            return []
+        detour = self.routing_table().detour(sources, targets)
+        return self.ids_of(np.flatnonzero((detour >= 0) & (detour <= max_hops)))
+
+    def detour_route(self, source_ids, target_ids, sat_id):
+        """經過 sat_id 的最短路徑（離 sat_id 最近的起點 -> sat_id -> 最近的終點，沿 next-hop 表走），不可達回傳 None"""
+        sources, targets = self.indices_of(source_ids), self.indices_of(target_ids)
+        route = self.routing_table().route_via(sources[sources >= 0], targets[targets >= 0], self.id_to_index[sat_id])
+        return self.ids_of(route) if route is not None else None
+
+    def latency_table(self):
+        """每顆衛星的 {鄰居 index: link 延遲 ms}（第一次使用時由 CSR 的距離計算）"""
+        if self.latency is None:
+            latency = link_latency_ms(self.weights.astype(np.float64)).tolist()
+            indices = self.indices.tolist()
+            indptr = self.indptr.tolist()
+            self.latency = [dict(zip(indices[indptr[i]:indptr[i + 1]], latency[indptr[i]:indptr[i + 1]])) for i in range(len(self.sat_ids))]
+        return self.latency
+
+    def link_distance(self, a, b):
+        """index a 與 b 之間 link 的距離 (km)，沒有 link 時回傳 None（在 a 的鄰居中二分搜尋，不必建立延遲表）"""
+        start, end = self.indptr[a], self.indptr[a + 1]
+        position = start + np.searchsorted(self.indices[start:end], b)
+        return int(self.weights[position]) if position < end and self.indices[position] == b else None
+
+    def path_latency(self, path_ids):
+        """路徑的端到端延遲 (ms)；路徑中有 link 不存在於此拓樸時回傳 None"""
+        path = self.indices_of(path_ids).tolist()
+        total = 0.0
+        for a, b in zip(path, path[1:]):
+            distance = self.link_distance(a, b) if a >= 0 and b >= 0 else None
+            if distance is None:
+                return None
+            total += link_latency_ms(float(distance))
+        return total
+
+    def floyd_medium(self, source):
+        """
+        從 source 出發的 BFS hop 數與 satellite::getConstellationHopCountRecordMedium 的 medium[source][*]：
+        Floyd-Warshall 依 index 由小到大嘗試中繼點、只在更短時更新，medium 即所有最短路徑中「最大的中繼點 index」的最小值
+        （沒有中繼點為 -1），依 BFS 層次由前一層推得。回傳 (dist, medium)，不可達的 dist 為 -1
+        """
+        n = len(self.sat_ids)
+        dist, medium = [-1] * n, [n] * n
+        dist[source], medium[source] = 0, -1
+        queue = deque([source])
+        adjacency = self.adjacency
+        while queue:
+            node = queue.popleft()
+            relay = -1 if node == source else max(medium[node], node)
+            for neighbor in adjacency[node]:
+                if dist[neighbor] < 0:
+                    dist[neighbor] = dist[node] + 1
+                    queue.append(neighbor)
+                if dist[neighbor] == dist[node] + 1 and relay < medium[neighbor]:
+                    medium[neighbor] = relay
+        return dist, medium
+
+    def floyd_path(self, source, target, rows=None):
+        """
+        與 satellite::getPath 相同的最短 hop 路徑（index 序列），不可達回傳 None；
+        rows 為 {起點 index: floyd_medium(起點)} 的快取，同一個拓樸的多次查詢可以共用
+        """
+        rows = {} if rows is None else rows
+
+        def medium(a, b):
+            if a not in rows:
+                rows[a] = self.floyd_medium(a)
+            return rows[a][1][b]
+
+        if source == target:
+            return [source, target]
+        if medium(source, target) == len(self.sat_ids):
+            return None
+        path = [source]
+        # 與 find_path 相同的遞迴：先走 source -> 中繼點，再走中繼點 -> target
+        stack = [(source, target)]
+        while stack:
+            a, b = stack.pop()
+            relay = medium(a, b)
+            if relay < 0:
+                path.append(b)
+                continue
+            stack.append((relay, b))
+            stack.append((a, relay))
+        return path
+
+    def k_shortest_paths(self, source_id, target_id, k, metric="hop"):
+        """Yen's algorithm：依 metric（"hop" / "latency"）由短到長回傳至多 k 條 simple path（衛星編號序列）"""
+        return self.k_shortest_paths_multi([source_id], [target_id], k, metric)
+
+    def k_shortest_paths_multi(self, source_ids, target_ids, k, metric="hop"):
+        """
+        多起點 / 多終點的 k-shortest simple paths：回傳所有 (起點, 終點) 組合中最短的至多 k 條路徑，
+        不在拓樸中的衛星會被忽略
+        """
+        sources = sorted({self.id_to_index[sat_id] for sat_id in source_ids if sat_id in self.id_to_index})
+        targets = sorted({self.id_to_index[sat_id] for sat_id in target_ids if sat_id in self.id_to_index})
+        if not sources or not targets or k <= 0:
+            return []
+        return [[self.sat_ids[i] for i in path] for path in self.search_paths(sources, targets, k, metric)]
+
+    def search_paths(self, sources, targets, k, metric="hop"):
+        """
+        在 CSR 鄰接串列外加虛擬的 super-source（連到所有起點）與 super-sink（所有終點連到它），
+        以一次 Yen's algorithm 取得全域前 k 短的路徑，所有組合共用同一次搜尋（回傳 index 序列）；
+        metric 為 "latency" 時虛擬 link 的延遲為 0
+        """
+        n = len(self.sat_ids)
+        super_source, super_sink = n, n + 1
+        if metric == "latency":
+            graph = list(self.latency_table()) + [dict.fromkeys(sources, 0.0), {}]
+            for target in targets:
+                graph[target] = dict(graph[target])
+                graph[target][super_sink] = 0.0
+        else:
+            graph = list(self.adjacency) + [sources, []]
+            for target in targets:
+                graph[target] = list(graph[target]) + [super_sink]
+        return [path[1:-1] for path in yen_paths(graph, super_source, super_sink, k, weighted=metric == "latency")]
+
+    def to_networkx(self):
+        """轉成 NetworkX 圖（只在需要 NetworkX 的演算法時使用），weight 為 1 以 hop 數計算"""
+        import networkx as nx
+        G = nx.Graph()
+        G.add_nodes_from(self.sat_ids)
+        n = len(self.sat_ids)
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        for i, j, distance in zip(rows.tolist(), self.indices.tolist(), self.weights.tolist()):
+            if i < j:
+                G.add_edge(self.sat_ids[i], self.sat_ids[j], weight=1, distance=distance)
+        return G
+
+
+class IncrementalTopology(Topology):
+    """
+    連續輪次共用的拓樸：update() 與上一個 frame 比對 link（edge key 差集），只加入新增、移除消失的 link，
+    並保留不受影響的 k-shortest 路徑查詢結果。
+    快取的 (起點集合, 終點集合, k) 結果在下列情況才重新計算：
+    - 移除的 link 在快取的某條路徑上
+    - 新增的 link (a, b) 可能形成不長於第 k 條路徑的新路徑：dist(起點集合, a) + 1 + dist(b, 終點集合) <= 第 k 條路徑的 hop 數
+      （dist 為新拓樸上的 BFS hop 數，是經過該 link 的路徑長度下界）；快取不足 k 條時任何可達的新 link 都會重算
+    其餘路徑在新拓樸中仍存在、且不會有更短的路徑出現，因此結果與重新計算相同。
+    metric 為 "latency" 的查詢在任何 link 新增、移除或距離改變時都重新計算（衛星移動時距離幾乎每個 frame 都會變）。
+    衛星編號需固定（同一個 TLE 的每個 frame 都相同）。
+    """
+
+    def __init__(self, sat_ids):
+        self.sat_ids = list(sat_ids)
+        self.id_to_index = {sat_id: i for i, sat_id in enumerate(self.sat_ids)}
+        self.adjacency = [set() for _ in self.sat_ids]
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.distance = np.zeros(0, dtype=np.int32)
+        self.latency = None
+        self.routing = None
+        self.routing_dir = None
+        self.path_cache = {}
+        self.frames = 0
+        self.stats = {"added": 0, "removed": 0, "reused": 0, "recomputed": 0}
+
+    def update(self, u, v, distance):
+        """套用新 frame 的 link（u / v 為 sat_ids 的 index，每條 link 一次），回傳 (新增數, 移除數)"""
+        n = len(self.sat_ids)
+        u = np.asarray(u, dtype=np.int64)
+        v = np.asarray(v, dtype=np.int64)
+        keys = np.minimum(u, v) * n + np.maximum(u, v)
+        order = np.argsort(keys)
+        keys, distance = keys[order], np.asarray(distance, dtype=np.int32)[order]
+
+        added = np.setdiff1d(keys, self.keys, assume_unique=True)
+        removed = np.setdiff1d(self.keys, keys, assume_unique=True)
+        changed = len(added) or len(removed) or not np.array_equal(distance, self.distance)
+        for key in removed.tolist():
+            a, b = divmod(key, n)
+            self.adjacency[a].discard(b)
+            self.adjacency[b].discard(a)
+        for key in added.tolist():
+            a, b = divmod(key, n)
+            self.adjacency[a].add(b)
+            self.adjacency[b].add(a)
+        self.keys, self.distance = keys, distance
+        # 第一個 frame 的 link 全部為新增，不計入變動量
+        if self.frames:
+            self.stats["added"] += len(added)
+            self.stats["removed"] += len(removed)
+        self.frames += 1
+
+        if len(added) or len(removed):
+            self.routing = None
+        if changed:
+            self.latency = None
+            self.invalidate(added.tolist(), set(removed.tolist()))
+        return len(added), len(removed)
+
+    def invalidate(self, added, removed):
+        n = len(self.sat_ids)
+        added_pairs = [divmod(key, n) for key in added]
+        for query, (paths, used_keys) in list(self.path_cache.items()):
+            sources, targets, k, metric = query
+            # latency 的路徑排序取決於 ISL 距離，距離一改變就必須重新計算
+            if metric == "latency" or used_keys & removed:
+                del self.path_cache[query]
+                continue
+            if not added_pairs:
+                continue
+            from_source, from_target = self.bfs_distances(sources), self.bfs_distances(targets)
+            # 路徑以節點數計，經過新 link 的路徑至少有 hops + 2 個節點
+            bound = len(paths[-1]) if len(paths) == k else None
+            for a, b in added_pairs:
+                hops = [from_source[x] + 1 + from_target[y] for x, y in ((a, b), (b, a)) if from_source[x] >= 0 and from_target[y] >= 0]
+                if hops and (bound is None or min(hops) + 1 <= bound):
+                    del self.path_cache[query]
+                    break
+
+    def number_of_edges(self):
+        return len(self.keys)
+
+    def edge_keys(self):
+        return self.keys
+
+    def nbytes(self):
+        return self.keys.nbytes + self.distance.nbytes
+
+    def link_distance(self, a, b):
+        n = len(self.sat_ids)
+        key = min(a, b) * n + max(a, b)
+        position = np.searchsorted(self.keys, key)
+        return int(self.distance[position]) if position < len(self.keys) and self.keys[position] == key else None
+
+    def latency_table(self):
+        if self.latency is None:
+            n = len(self.sat_ids)
+            self.latency = [{} for _ in self.sat_ids]
+            for key, latency in zip(self.keys.tolist(), link_latency_ms(self.distance.astype(np.float64)).tolist()):
+                a, b = divmod(key, n)
+                self.latency[a][b] = latency
+                self.latency[b][a] = latency
+        return self.latency
+
+    def search_paths(self, sources, targets, k, metric="hop"):
+        query = (tuple(sources), tuple(targets), k, metric)
+        cached = self.path_cache.get(query)
+        if cached is not None:
+            self.stats["reused"] += 1
+            return cached[0]
+
+        self.stats["recomputed"] += 1
+        paths = super().search_paths(sources, targets, k, metric)
+        n = len(self.sat_ids)
+        used_keys = {min(a, b) * n + max(a, b) for path in paths for a, b in zip(path, path[1:])}
+        self.path_cache[query] = (paths, used_keys)
+        return paths
+
+    def snapshot(self):
+        """目前拓樸的 CSR 複本"""
+        n = len(self.sat_ids)
+        return Topology.from_edges(self.sat_ids, self.keys // n, self.keys % n, self.distance)
+
+    def to_networkx(self):
+        return self.snapshot().to_networkx()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+topology_benchmark.py
+大型星群下稀疏拓樸（CSR）的記憶體與每輪計算量：python3 topology_benchmark.py [衛星數 ...]（預設 100 1000 5000）
+
+以 propagator.Constellation.walker 產生合成的 Walker 星群，模擬 VnfMigration 每一輪的工作：
+- link：propagator 計算該時刻的星群連線
+- cover：兩個地面站可見的衛星
+- update：IncrementalTopology 只套用新增 / 移除的 link
+- paths：起點衛星集合到終點衛星集合的 k-shortest 路徑（ROUTING_PARAMS["metric"]）與每條路徑的延遲
+- hop：兩地面站之間所有 (起點衛星, 終點衛星) 的 Floyd-Warshall 相同路徑（printStationHopcountPath）
+- routing：最後一輪拓樸的全對 hop 數 / next-hop 表（RoutingTable，只建一次）
+記憶體為 CSR 陣列的大小，並與 N × N int32 鄰接矩陣比較（不會實際建立）。
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import propagator
+from policy_config import ROUTING_PARAMS
+from topology import IncrementalTopology, RoutingTable, Topology
+
+GREEN = '\033[92m'
+NC = '\033[0m'  # No Color
+
+# 衛星數 -> (軌道數, 每軌衛星數)；其他數量取接近正方形的排列
+WALKER_SHAPES = {100: (10, 10), 1000: (25, 40), 5000: (50, 100)}
+WALKER_ALTITUDE = 550.0     # km
+WALKER_INCLINATION = 53.0   # 度
+# 縮小可接受的方位角誤差，讓跨軌道 link 隨衛星移動斷開 / 建立
+BENCHMARK_PARAMS = {"acceptableAzimuthDif": 45}
+SOURCE_STATION = (24.9713, 121.192)
+DESTINATION_STATION = (21.3256, -157.95694)
+ROUNDS = 20
+ROUND_LENGTH = 30           # 秒
+K_PATHS = 5
+
+
+def walker_shape(count):
+    if count in WALKER_SHAPES:
+        return WALKER_SHAPES[count]
+    planes = max(1, int(round(np.sqrt(count))))
+    return planes, max(1, count // planes)
+
+
+def benchmark(count):
+    planes, per_plane = walker_shape(count)
+    constellation = propagator.Constellation.walker(planes, per_plane, WALKER_ALTITUDE, WALKER_INCLINATION, BENCHMARK_PARAMS)
+    n = len(constellation.sat_ids)
+    times = list(range(0, ROUNDS * ROUND_LENGTH, ROUND_LENGTH))
+    altitude = constellation.table["stationAltitude"]
+    G = IncrementalTopology(constellation.sat_ids)
+    cost = dict.fromkeys(["link", "cover", "update", "paths", "hop"], 0.0)
+    churn = links = 0
+
+    series = constellation.state_series(times, batch=1)
+    for r, seconds in enumerate(times):
+        start = time.perf_counter()
+        _, u, v, distance = next(series)
+        cost["link"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        sources = constellation.cover_sats(*SOURCE_STATION, [seconds], altitude)[0]
+        targets = constellation.cover_sats(*DESTINATION_STATION, [seconds], altitude)[0]
+        cost["cover"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        added, removed = G.update(u, v, distance)
+        cost["update"] += time.perf_counter() - start
+        churn += (added + removed) if r else 0
+        links += G.number_of_edges()
+
+        start = time.perf_counter()
+        found = G.k_shortest_paths_multi(sources, targets, K_PATHS, ROUTING_PARAMS["metric"])
+        for path in found:
+            G.path_latency(path)
+        cost["paths"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot = G.snapshot()
+        rows = {}
+        for a in snapshot.indices_of(sources).tolist():
+            for b in snapshot.indices_of(targets).tolist():
+                snapshot.floyd_path(a, b, rows)
+        cost["hop"] += time.perf_counter() - start
+
+    csr = Topology.from_edges(constellation.sat_ids, u, v, distance)
+    start = time.perf_counter()
+    routing = RoutingTable.build(n, u, v)
+    routing_ms = (time.perf_counter() - start) * 1000
+    return {
+        "sats": n,
+        "shape": f"{planes}x{per_plane}",
+        "links": links / len(times),
+        "churn": churn / max(1, len(times) - 1),
+        "csr_kb": csr.nbytes() / 1024,
+        "dense_kb": n * n * 4 / 1024,
+        "ms": {name: value * 1000 / len(times) for name, value in cost.items()},
+        "routing_ms": routing_ms,
+        "routing_mb": routing.nbytes() / 1024 / 1024,
+    }
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000]
+    print(f"{GREEN}合成 Walker 星群（{WALKER_ALTITUDE:.0f} km / {WALKER_INCLINATION:.0f} 度），{ROUNDS} 輪、每輪 {ROUND_LENGTH} 秒，k = {K_PATHS}，metric = {ROUTING_PARAMS['metric']}{NC}")
+    print(f"{'衛星數':>6} {'排列':>7} {'link':>7} {'變動':>6} {'CSR KB':>9} {'N×N KB':>11} "
+          f"{'link ms':>8} {'cover ms':>9} {'update ms':>10} {'paths ms':>9} {'hop ms':>8} {'routing ms':>11} {'路由表 MB':>9}")
+    for count in counts:
+        result = benchmark(count)
+        ms = result["ms"]
+        print(f"{result['sats']:>9} {result['shape']:>9} {result['links']:>7.0f} {result['churn']:>8.1f} "
+              f"{result['csr_kb']:>9.1f} {result['dense_kb']:>11.1f} {ms['link']:>8.2f} {ms['cover']:>9.2f} "
+              f"{ms['update']:>10.2f} {ms['paths']:>9.2f} {ms['hop']:>8.2f} "
+              f"{result['routing_ms']:>11.1f} {result['routing_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+topology_store.py
+星群拓樸的時間序列封存檔 (topology archive)
+
+給定 TLE 檔與 ISL 參數時，某一秒的星群連線狀態是固定的，因此一天 (86400 秒) 依 step 秒取樣，
+每個時間點 (frame) 的 link 以 CSR 方式存成二進位陣列：
+    frame_ptr[f] ~ frame_ptr[f+1]  為第 f 個 frame 的 link 範圍 (int64)
+    edges_u / edges_v              為 link 兩端衛星在 sat_ids 中的 index (int32)
+    distance                       為 link 距離 km (int32)
+陣列以 np.memmap 讀取，任一時間點都是 O(1) 取得，不必解析文字檔。
+各 frame 的 all-pairs 路由表（topology.RoutingTable）第一次用到時才建立，存在 routing/<link 集合的 digest>.npy，
+link 集合相同的 frame 共用同一份；目錄總大小以 TOPOLOGY_PARAMS["routing_disk_mb"] 為上限（LRU）。
+封存檔以 (TLE 檔內容、closeLink 檔內容、ISL / PAT 參數、step) 的 hash 命名，參數或 TLE 改變時自動重建。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import sattrack_runner
+from policy_config import TOPOLOGY_PARAMS
+from topology import Topology
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topology_archive')
+DAY_SECONDS = 86400
+# 影響星群連線狀態的參數（地面站、輸出檔等參數不影響拓樸）
+TOPOLOGY_KEYS = (
+    "TLE_inputFileName", "closeLinksFileName",
+    "ISLfrontAngle", "ISLrightAngle", "ISLbackAngle", "ISLleftAngle",
+    "acceptableAzimuthDif", "acceptableElevationDif", "acceptableRange", "PAT_time",
+)
+ARRAYS = {"frame_ptr": np.int64, "edges_u": np.int32, "edges_v": np.int32, "distance": np.int32}
+
+GREEN = '\033[38;5;82m'
+NC = '\033[0m'  # No Color
+
+
+def archive_key(step, directory=sattrack_runner.SATTRACK_DIR):
+    """以範本中的拓樸參數、TLE / closeLink 檔內容與 step 產生封存檔名稱"""
+    table = sattrack_runner.parse_parameters(sattrack_runner.render_parameters({}, directory))
+    material = {
+        "parameters": {key: table.get(key) for key in TOPOLOGY_KEYS},
+        "tle": sattrack_runner.file_digest(os.path.join(directory, table.get('TLE_inputFileName', ''))),
+        "close_links": sattrack_runner.file_digest(os.path.join(directory, table.get('closeLinksFileName', ''))),
+        "step": step,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode()).hexdigest()[:16], material
+
+
+class TopologyStore:
+    """
+    一天的星群拓樸封存檔。第一次使用（或 TLE / ISL 參數改變）時以 propagator（或 printConstellationStateSeries）
+    產生並寫入 ARCHIVE_DIR/<key>/，之後只以 memmap 讀取。
+    時間不在取樣點上時取不超過該時間的最近 frame（time 先對 86400 取餘數）。
+    """
+
+    def __init__(self, step=None, directory=ARCHIVE_DIR, output=True):
+        self.step = TOPOLOGY_PARAMS["step"] if step is None else step
+        self.key, self.material = archive_key(self.step)
+        self.path = os.path.join(directory, self.key)
+        self.routing_dir = os.path.join(self.path, 'routing')
+        self.output = output
+        if not os.path.exists(os.path.join(self.path, 'meta.json')):
+            self.build()
+        self.load()
+
+    def build(self):
+        """依序計算每個 frame（frames()），結果直接附加到二進位檔"""
+        times = list(range(0, DAY_SECONDS, self.step))
+        chunk = TOPOLOGY_PARAMS["build_chunk"]
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        if self.output:
+            print(f"{GREEN}建立星群拓樸封存檔（{len(times)} 個時間點，每 {self.step} 秒一個）中...{NC}")
+
+        files = {name: open(os.path.join(tmp_path, f"{name}.bin"), 'wb') for name in ARRAYS}
+        sat_ids = None
+        edge_count = 0
+        try:
+            files["frame_ptr"].write(np.zeros(1, dtype=np.int64).tobytes())
+            for done, (ids, u, v, distance) in enumerate(self.frames(times), 1):
+                sat_ids = ids
+                files["edges_u"].write(np.asarray(u, dtype=np.int32).tobytes())
+                files["edges_v"].write(np.asarray(v, dtype=np.int32).tobytes())
+                files["distance"].write(np.asarray(distance, dtype=np.int32).tobytes())
+                edge_count += len(u)
+                files["frame_ptr"].write(np.array([edge_count], dtype=np.int64).tobytes())
+                if self.output and (done % chunk == 0 or done == len(times)):
+                    print(f"  已完成 {done} / {len(times)} 個時間點")
+        finally:
+            for f in files.values():
+                f.close()
+
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({"step": self.step, "frames": len(times), "sat_ids": sat_ids or [], "material": self.material}, f, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp_path, self.path)
+
+    def frames(self, times):
+        """
+        依時間順序 yield (sat_ids, u, v, distance)，u / v 為 sat_ids 的 index。
+        可以在行程內計算時（propagator）直接以 NumPy 計算，否則分批執行 sattrack，
+        每批 TOPOLOGY_PARAMS["build_chunk"] 個時間點，所有批次共用同一個專用的模擬器工作目錄
+        """
+        constellation = sattrack_runner.shared_constellation()
+        if constellation is not None:
+            for _, u, v, distance in constellation.state_series(times):
+                yield constellation.sat_ids, u, v, distance
+            return
+
+        chunk = TOPOLOGY_PARAMS["build_chunk"]
+        with sattrack_runner.workspace() as directory:
+            for start in range(0, len(times), chunk):
+                series = sattrack_runner.constellation_state_series(times[start:start + chunk], 'topology_series.txt', 'topology_seriesOutput.txt', directory)
+                for _, ids, edges in series:
+                    index = {sat_id: i for i, sat_id in enumerate(ids)}
+                    frame = np.array(edges, dtype=np.int64).reshape(-1, 3)
+                    yield ids, [index[a] for a in frame[:, 0].tolist()], [index[b] for b in frame[:, 1].tolist()], frame[:, 2]
+
+    def load(self):
+        with open(os.path.join(self.path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        self.sat_ids = meta["sat_ids"]
+        self.frames = meta["frames"]
+        self.id_to_index = {sat_id: i for i, sat_id in enumerate(self.sat_ids)}
+        for name, dtype in ARRAYS.items():
+            path = os.path.join(self.path, f"{name}.bin")
+            # 空陣列無法 memmap
+            array = np.memmap(path, dtype=dtype, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=dtype)
+            setattr(self, name, array)
+
+    def frame_index(self, seconds):
+        return (int(seconds) % DAY_SECONDS) // self.step
+
+    def frame_time(self, seconds):
+        """實際使用的取樣時間點"""
+        return self.frame_index(seconds) * self.step
+
+    def edges(self, seconds):
+        """回傳該時間點的 (edges_u, edges_v, distance)，u / v 為 sat_ids 的 index（memmap 上的 view）"""
+        f = self.frame_index(seconds)
+        begin, end = self.frame_ptr[f], self.frame_ptr[f + 1]
+        return self.edges_u[begin:end], self.edges_v[begin:end], self.distance[begin:end]
+
+    def edge_list(self, seconds):
+        """回傳該時間點的 [(satId1, satId2, 距離km)]"""
+        u, v, distance = self.edges(seconds)
+        ids = np.asarray(self.sat_ids)
+        return list(zip(ids[u].tolist(), ids[v].tolist(), distance.tolist()))
+
+    def topology(self, seconds, id_type=int):
+        """該時間點的 CSR 拓樸（Topology），id_type 為衛星編號的型別；路由表快取在封存檔目錄中"""
+        topology = Topology.from_edges([id_type(sat_id) for sat_id in self.sat_ids], *self.edges(seconds))
+        topology.routing_dir = self.routing_dir
+        return topology
+
+
+def topology_at(seconds, id_type=int, output=True):
+    """
+    取得某一秒的星群拓樸：TOPOLOGY_PARAMS["use_archive"] 為 True 時從封存檔讀取，
+    否則計算該時刻的拓樸（propagator，或執行一次 sattrack 的 printConstellationStateSeries）
+    """
+    if TOPOLOGY_PARAMS["use_archive"]:
+        return TopologyStore(output=output).topology(seconds, id_type)
+    for _, sat_ids, u, v, distance in sattrack_runner.constellation_index_series([seconds]):
+        return Topology.from_edges([id_type(sat_id) for sat_id in sat_ids], u, v, distance)
+    return None
+
+
+if __name__ == "__main__":
+    # 預先建立（或確認）目前參數下的封存檔：python3 topology_store.py
+    store = TopologyStore()
+    print(f"{GREEN}封存檔：{store.path}（{store.frames} 個時間點，{len(store.edges_u)} 條 link）{NC}")